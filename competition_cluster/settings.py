@@ -29,7 +29,8 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Drop-in for django.contrib.auth's AuthenticationMiddleware with a per-process user cache
+    'exams.auth.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -42,8 +43,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')], # For project-level templates
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept per worker (and pre-compiled by exams/startup.py).
+            # Listed explicitly instead of APP_DIRS so it holds in DEBUG on older Django too.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -86,9 +94,43 @@ DATABASES = {
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
         },
+        # Persistent connections: the request thread and each thread exams.asyncdb.gather()
+        # runs queries on keep theirs instead of reconnecting for every query
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# --- READ REPLICAS (see exams/replicas.py) ---
+# Add replica connections to DATABASES and list their aliases here to move read-only pages,
+# exports and analytics jobs off the primary. Empty = everything uses 'default'.
+DATABASE_ROUTERS = ['exams.replicas.ReplicaRouter']
+EXAMS_READ_REPLICAS = []
+# Seconds a user stays on the primary after submitting (read-your-writes)
+EXAMS_REPLICA_PIN_SECONDS = 15
+
+# --- LIVE EXAM WAITING ROOM (see exams/waitingroom.py) ---
+# Cache holding queue positions; must be shared across workers (Redis/memcached) in production
+EXAMS_WAITING_ROOM_CACHE = 'default'
+
+# --- WORKER START-UP (see exams/startup.py) ---
+# Warm URLs, templates, connections and catalog data before a new worker serves traffic
+EXAMS_WARM_WORKER = True
+
+# --- HOT-KEY CACHING (see exams/hotcache.py) ---
+# Expiry of hot entries is shortened by up to this fraction so they do not expire together
+EXAMS_CACHE_JITTER = 0.1
+# Threads per worker refreshing stale entries in the background
+EXAMS_CACHE_REFRESH_WORKERS = 2
+
+# --- SESSIONS AND AUTHENTICATED USERS (see exams/sessions.py, exams/auth.py) ---
+# Sessions live in the cache (SESSION_CACHE_ALIAS, which must be shared across workers in
+# production) and are written to the database in batches
+SESSION_ENGINE = 'exams.sessions'
+EXAMS_SESSION_FLUSH_SECONDS = 10
+# Seconds a worker reuses a resolved user (retired early on password/permission changes)
+EXAMS_USER_CACHE_SECONDS = 30
+
 # --- PASSWORD VALIDATION ---
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'competition_cluster.settings')
 
 application = get_wsgi_application()
+
+# Pay first-request costs (URLconf, templates, connections, catalog data) before serving
+from exams import startup  # noqa: E402
+
+startup.warm_worker()
@@ -1,8 +1,18 @@
 # FILE: exams/admin.py
 
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path
 # Ensure all models are imported correctly
 from .models import ExamCategory, MockTest, Testimonial, Question, Option, TestResult, UserAnswer, Subject 
+from .admin_pagination import HighVolumeAdminMixin
+from . import assembly, similarity
+
+# Questions shown per page of the Mock Test editor (a 180-question inline is too heavy to render)
+QUESTIONS_PER_ADMIN_PAGE = 20
 
 # This inline allows you to add Options directly when editing a Question.
 class OptionInline(admin.TabularInline):
@@ -17,7 +27,26 @@ class QuestionInline(admin.StackedInline):
     inlines = [OptionInline] 
     extra = 1 # Provides 1 empty slot for a new question.
     # Provide code with comments: Fields displayed in the Question admin form
-    fields = ('subject', 'text', 'difficulty', 'marks', 'negative_marks', 'solution')
+    fields = ('subject', 'text', 'question_type', 'difficulty', 'marks', 'negative_marks', 'partial_marks',
+              'answer_min', 'answer_max', 'solution')
+    autocomplete_fields = ('subject',)
+
+    def get_queryset(self, request):
+        # Provide code with comments: Only one page (?qpage=N) of the test's questions is edited at a time
+        queryset = super().get_queryset(request)
+        object_id = request.resolver_match.kwargs.get('object_id') if request.resolver_match else None
+        if object_id is None:
+            return queryset
+        offset = (_question_page(request) - 1) * QUESTIONS_PER_ADMIN_PAGE
+        page_ids = list(Question.objects.filter(mock_test_id=object_id).order_by('pk')
+                        .values_list('pk', flat=True)[offset:offset + QUESTIONS_PER_ADMIN_PAGE])
+        return queryset.filter(pk__in=page_ids)
+
+def _question_page(request):
+    try:
+        return max(1, int(request.GET.get('qpage', 1)))
+    except ValueError:
+        return 1
 
 @admin.register(ExamCategory)
 class ExamCategoryAdmin(admin.ModelAdmin):
@@ -32,11 +61,103 @@ class ExamCategoryAdmin(admin.ModelAdmin):
 
 @admin.register(MockTest)
 class MockTestAdmin(admin.ModelAdmin):
-    list_display = ('title', 'category', 'question_count', 'is_free', 'is_new')
+    list_display = ('title', 'category', 'question_count', 'is_free', 'is_new', 'live_starts_at', 'admission_rate')
     list_filter = ('category', 'is_free', 'is_new')
     search_fields = ('title',)
     # Provide code with comments: Adds the powerful Question editor to this page.
     inlines = [QuestionInline]
+    actions = ['export_results_csv', 'export_results_wide_csv', 'assemble_similar_test']
+
+    @admin.action(description="Export results of selected tests (CSV, one row per answer)")
+    def export_results_csv(self, request, queryset):
+        return _export_response(list(queryset.values_list('pk', flat=True)), layout='long')
+
+    @admin.action(description="Export results of ONE selected test (CSV, one column per question)")
+    def export_results_wide_csv(self, request, queryset):
+        test_ids = list(queryset.values_list('pk', flat=True))
+        if len(test_ids) != 1:
+            self.message_user(request, "Select exactly one test for the per-question layout.", messages.ERROR)
+            return None
+        return _export_response(test_ids, layout='wide')
+
+    @admin.action(description="Assemble a new test with the same subject/difficulty mix (unseen questions)")
+    def assemble_similar_test(self, request, queryset):
+        # Provide code with comments: Samples the pool via exams.assembly, one new test per selected test
+        for mock_test in queryset.select_related('category'):
+            try:
+                new_test = assembly.build_mock_test(
+                    f"{mock_test.title} (new set)", mock_test.category,
+                    assembly.quotas_like(mock_test.pk), mock_test.time_minutes,
+                )
+            except assembly.AssemblyError as e:
+                self.message_user(request, f"{mock_test.title}: {e}", messages.ERROR)
+                continue
+            self.message_user(request, f"Created '{new_test.title}' with {new_test.question_count} questions.", messages.SUCCESS)
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        # Provide code with comments: Page links for the paginated Question editor
+        question_total = Question.objects.filter(mock_test_id=object_id).count()
+        page_count = max(1, -(-question_total // QUESTIONS_PER_ADMIN_PAGE))
+        extra_context = {
+            **(extra_context or {}),
+            'question_page': _question_page(request),
+            'question_pages': range(1, page_count + 1),
+        }
+        return super().change_view(request, object_id, form_url, extra_context)
+
+def _export_response(test_ids, layout):
+    # Provide code with comments: Streams straight from exams.exports, no temporary file
+    # (imported here so the admin does not load it at worker start-up)
+    from . import exports
+
+    stream = exports.stream_export(
+        exports.filter_results(test_ids=test_ids), fmt='csv', layout=layout,
+        test_id=test_ids[0] if len(test_ids) == 1 else None,
+    )
+    response = StreamingHttpResponse(stream, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{exports.export_filename("csv", layout, False)}"'
+    return response
+
+@admin.register(Question)
+class QuestionAdmin(HighVolumeAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'mock_test', 'subject', 'question_type', 'difficulty', 'marks')
+    list_filter = ('question_type', 'difficulty', 'subject')
+    # Provide code with comments: Prefix search can use an index, unlike the default icontains
+    search_fields = ('=id', '^mock_test__title')
+    list_select_related = ('mock_test__category', 'subject')
+    autocomplete_fields = ('mock_test', 'subject')
+    raw_id_fields = ('correct_option', 'correct_options')
+    inlines = [OptionInline]
+
+    def get_urls(self):
+        # Provide code with comments: Near-duplicate report linked from the change form
+        return [
+            path('<path:object_id>/similar/', self.admin_site.admin_view(self.similar_view), name='exams_question_similar'),
+        ] + super().get_urls()
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Provide code with comments: Options are saved by now, so the fingerprint sees the final text
+        matches = similarity.check_new_questions([form.instance.pk])
+        if matches:
+            similar_ids = ', '.join(f"#{match.similar_id}" for match in matches)
+            self.message_user(request, f"Possible near-duplicate of question {similar_ids}.", messages.WARNING)
+
+    def similar_view(self, request, object_id):
+        question = get_object_or_404(Question.objects.select_related('mock_test'), pk=object_id)
+        if not self.has_view_permission(request, question):
+            raise PermissionDenied
+        matches = similarity.find_similar(question.pk)
+        similar = Question.objects.select_related('mock_test').in_bulk([match.similar_id for match in matches])
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'original': question,
+            'title': f"Near-duplicates of question #{question.pk}",
+            'matches': [(similar[match.similar_id], match.score) for match in matches if match.similar_id in similar],
+            'threshold': similarity.THRESHOLD,
+        }
+        return TemplateResponse(request, 'admin/exams/question/similar_questions.html', context)
 
 @admin.register(Testimonial)
 class TestimonialAdmin(admin.ModelAdmin):
@@ -45,18 +166,23 @@ class TestimonialAdmin(admin.ModelAdmin):
 
 # This is the new, enhanced admin for your Test Results.
 @admin.register(TestResult)
-class TestResultAdmin(admin.ModelAdmin):
+class TestResultAdmin(HighVolumeAdminMixin, admin.ModelAdmin):
     # Defines the columns shown in the list view.
     list_display = ('user', 'mock_test', 'score', 'percentage_display', 'end_time')
     
-    # Adds a filter sidebar for these fields.
-    list_filter = ('mock_test', 'user')
+    # Adds a filter sidebar for these fields. Filtering by user is done via search:
+    # a user filter would list every account in the sidebar.
+    list_filter = ('mock_test',)
     
-    # Adds a search bar that searches these fields.
-    search_fields = ('user__username', 'mock_test__title')
+    # Adds a search bar that searches these fields (exact/prefix matches stay indexable).
+    search_fields = ('=user__username', '^mock_test__title')
     
     # An optimization for faster page loading.
-    list_select_related = ('user', 'mock_test')
+    list_select_related = ('user', 'mock_test__category')
+
+    # Provide code with comments: Lookup widgets instead of <select>s listing every user/test
+    raw_id_fields = ('user',)
+    autocomplete_fields = ('mock_test',)
 
     # This is a custom method to display the percentage in the admin list.
     def percentage_display(self, obj):
@@ -70,5 +196,15 @@ class TestResultAdmin(admin.ModelAdmin):
 
 
 # Register the remaining models to make them visible in the admin.
-admin.site.register(Subject)
-admin.site.register(UserAnswer)
\ No newline at end of file
+@admin.register(Subject)
+class SubjectAdmin(admin.ModelAdmin):
+    search_fields = ('name',)
+
+@admin.register(UserAnswer)
+class UserAnswerAdmin(HighVolumeAdminMixin, admin.ModelAdmin):
+    # Provide code with comments: IDs only, so the list never joins questions/options for __str__
+    list_display = ('id', 'test_result_id', 'question_id', 'selected_option_id', 'is_correct', 'time_spent')
+    list_filter = ('is_correct',)
+    search_fields = ('=test_result__id',)
+    # Provide code with comments: The default form renders <select>s of every Question, Option and TestResult
+    raw_id_fields = ('test_result', 'question', 'selected_option')
\ No newline at end of file
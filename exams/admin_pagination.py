@@ -0,0 +1,118 @@
+# FILE: exams/admin_pagination.py
+
+"""
+Admin changelist helpers for tables with tens of millions of rows.
+
+- EstimatedCountPaginator replaces COUNT(*) with the database's table statistics for
+  unfiltered lists and a capped count for filtered ones.
+- KeysetChangeList pages by primary key ("older than #<id>") when the list is in its
+  default newest-first order, so every page is an index range scan instead of a deep
+  OFFSET. Sorting by a column falls back to regular pagination.
+- HighVolumeAdminMixin wires both into a ModelAdmin.
+"""
+
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR, SEARCH_VAR
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+CURSOR_VAR = 'cursor'
+# Filtered lists are counted up to this many rows, then shown as "at least N"
+COUNT_CAP = 10000
+# Below this size an exact COUNT(*) is cheap enough to be worth the accuracy
+EXACT_COUNT_THRESHOLD = 100000
+
+
+def estimate_row_count(model, using='default'):
+    """Returns the planner's row estimate for a model's table, or None if unavailable."""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'mysql':
+        sql = "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+    elif connection.vendor == 'postgresql':
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count never scans a large table. After `count` is read, `count_estimated`
+    or `count_capped` tells whether it is a statistics estimate or a lower bound.
+    """
+    count_estimated = False
+    count_capped = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > EXACT_COUNT_THRESHOLD:
+                self.count_estimated = True
+                return estimate
+        # Filtered (or small) lists: count at most COUNT_CAP rows
+        count = queryset[:COUNT_CAP].count()
+        self.count_capped = count >= COUNT_CAP
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList that seeks by primary key instead of OFFSET in the default ordering."""
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_results(self, request):
+        self.cursor = None
+        self.next_cursor = None
+        self.keyset = ORDER_VAR not in request.GET and not request.GET.get(SEARCH_VAR)
+        if not self.keyset:
+            return super().get_results(request)
+
+        try:
+            self.cursor = int(request.GET.get(CURSOR_VAR) or 0) or None
+        except ValueError:
+            self.cursor = None
+
+        queryset = self.queryset.order_by('-pk')
+        if self.cursor is not None:
+            queryset = queryset.filter(pk__lt=self.cursor)
+        rows = list(queryset[:self.list_per_page + 1])
+        if len(rows) > self.list_per_page:
+            rows = rows[:self.list_per_page]
+            self.next_cursor = rows[-1].pk
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = paginator.count
+        self.result_count_estimated = paginator.count_estimated
+        self.result_count_capped = paginator.count_capped
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = self.next_cursor is not None or self.cursor is not None
+        self.paginator = paginator
+
+    def first_page_url(self):
+        return self.get_query_string(remove=[CURSOR_VAR])
+
+    def next_page_url(self):
+        return self.get_query_string({CURSOR_VAR: self.next_cursor})
+
+
+class HighVolumeAdminMixin:
+    """ModelAdmin mixin: estimated counts, keyset pages, no full-table count for the header."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/exams/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class ExamsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'exams'
+
+    def ready(self):
+        # Catalog writes retire the anonymous page cache (see exams/pagecache.py)
+        from . import pagecache
+        pagecache.connect_signals()
+        # Edited tests and questions drop their pre-warmed payload and cached answer key (see exams/warmup.py)
+        from . import warmup
+        warmup.connect_signals()
+        # Buffered session writes are flushed after requests; user/permission changes retire cached users
+        # (see exams/sessions.py, exams/auth.py)
+        from . import auth, sessions
+        sessions.connect_signals()
+        auth.connect_signals()
+        # Question edits and removals retire cached attempt vectors and comparisons (see exams/comparison.py)
+        from . import comparison
+        comparison.connect_signals()
@@ -0,0 +1,218 @@
+# FILE: exams/assembly.py
+
+"""
+Assembles new MockTests from the existing question pool by subject/difficulty quotas.
+
+Selection never runs ORDER BY RAND() over Question. The pool is kept as a precomputed
+index {(subject_id, difficulty): [question IDs]} built from one narrow query and cached;
+assembling a paper removes the IDs the target cohort has recently seen and samples each
+quota in memory with random.sample. Only then are the chosen questions (and their options)
+copied into the new test in a few bulk queries.
+
+A Question belongs to exactly one MockTest, so the new test gets copies that point back at
+their original through `source_question`. The pool holds originals only, so copies are
+never resampled and "recently seen" is tracked per original.
+"""
+
+import random
+import re
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import MockTest, Option, Question, Subject, TestResult
+
+POOL_CACHE_KEY = 'exams:assembly:pool'
+POOL_CACHE_SECONDS = 10 * 60
+DEFAULT_RECENT_DAYS = 90
+
+DIFFICULTY_CODES = {code: code for code, _ in Question.DIFFICULTY_CHOICES}
+DIFFICULTY_CODES.update({label.lower(): code for code, label in Question.DIFFICULTY_CHOICES})
+
+QUOTA_RE = re.compile(r'^\s*(\d+)\s+(.+?)\s*/\s*(\w+)\s*$')
+
+
+class AssemblyError(ValueError):
+    """Raised for malformed quotas or a pool too small to satisfy them."""
+
+
+class Quota:
+    """One section of the paper: `count` questions of a subject at a difficulty."""
+
+    def __init__(self, count, subject_id, difficulty, label=''):
+        self.count = count
+        self.subject_id = subject_id
+        self.difficulty = difficulty
+        self.label = label
+
+    @property
+    def bucket(self):
+        return (self.subject_id, self.difficulty)
+
+    def __str__(self):
+        return f"{self.count} {self.label}"
+
+
+def parse_quotas(raw):
+    """
+    Parses "25 Physics/Medium, 10 Chemistry/Hard" (difficulty by name or E/M/H code) into
+    Quota objects, resolving every subject name in one query.
+    """
+    parsed = []
+    for part in filter(None, (chunk.strip() for chunk in raw.split(','))):
+        match = QUOTA_RE.match(part)
+        if not match:
+            raise AssemblyError(f"Cannot read quota '{part}'; expected e.g. '25 Physics/Medium'.")
+        count, subject_name, difficulty = match.groups()
+        code = DIFFICULTY_CODES.get(difficulty.lower()) or DIFFICULTY_CODES.get(difficulty.upper())
+        if code is None:
+            raise AssemblyError(f"Unknown difficulty '{difficulty}' in '{part}'.")
+        parsed.append((int(count), subject_name, code, part))
+
+    subjects = {name.lower(): pk for pk, name in Subject.objects.values_list('pk', 'name')}
+    quotas = []
+    for count, subject_name, code, part in parsed:
+        subject_id = subjects.get(subject_name.lower())
+        if subject_id is None:
+            raise AssemblyError(f"Unknown subject '{subject_name}' in '{part}'.")
+        quotas.append(Quota(count, subject_id, code, label=f"{subject_name}/{code}"))
+    if not quotas:
+        raise AssemblyError("No quotas given.")
+    return quotas
+
+
+def quotas_like(mock_test_id):
+    """Quotas reproducing an existing test's subject/difficulty mix (one GROUP BY)."""
+    rows = Question.objects.filter(mock_test_id=mock_test_id, subject__isnull=False) \
+        .values('subject_id', 'subject__name', 'difficulty').annotate(n=Count('id')).order_by('subject__name', 'difficulty')
+    return [
+        Quota(row['n'], row['subject_id'], row['difficulty'], label=f"{row['subject__name']}/{row['difficulty']}")
+        for row in rows
+    ]
+
+
+# =========================================================================
+# POOL INDEX
+# =========================================================================
+
+def pool_index(refresh=False):
+    """{(subject_id, difficulty): [original question IDs]}, cached for POOL_CACHE_SECONDS."""
+    index = None if refresh else cache.get(POOL_CACHE_KEY)
+    if index is None:
+        index = {}
+        # Copies carry a single correct option only, so the pool holds single correct questions
+        rows = Question.objects.filter(source_question__isnull=True, subject__isnull=False, correct_option__isnull=False,
+                                       question_type=Question.TYPE_SINGLE) \
+            .values_list('subject_id', 'difficulty', 'id')
+        for subject_id, difficulty, q_id in rows:
+            index.setdefault((subject_id, difficulty), []).append(q_id)
+        cache.set(POOL_CACHE_KEY, index, POOL_CACHE_SECONDS)
+    return index
+
+
+def recently_seen(category_id, days=DEFAULT_RECENT_DAYS):
+    """
+    Original question IDs that appeared in any test of the category attempted in the last
+    `days` days: the target cohort has likely seen them.
+    """
+    since = timezone.now() - timedelta(days=days)
+    test_ids = TestResult.objects.filter(mock_test__category_id=category_id, end_time__gte=since) \
+        .values_list('mock_test_id', flat=True).distinct()
+    return set(
+        Question.objects.filter(mock_test_id__in=list(test_ids))
+        .annotate(original_id=Coalesce(F('source_question_id'), F('id')))
+        .values_list('original_id', flat=True)
+    )
+
+
+def select_questions(quotas, exclude=(), rng=random):
+    """
+    Samples question IDs per quota from the pool index, never using an excluded ID or the
+    same question in two sections. Returns a list of ID lists, one per quota.
+    """
+    index = pool_index()
+    exclude = set(exclude)
+    needed = {}
+    for quota in quotas:
+        needed[quota.bucket] = needed.get(quota.bucket, 0) + quota.count
+
+    drawn = {}
+    for bucket, count in needed.items():
+        candidates = [q_id for q_id in index.get(bucket, ()) if q_id not in exclude]
+        if len(candidates) < count:
+            labels = ', '.join(quota.label for quota in quotas if quota.bucket == bucket)
+            raise AssemblyError(f"Only {len(candidates)} unseen questions for {labels}; {count} needed.")
+        drawn[bucket] = rng.sample(candidates, count)
+
+    # Quotas sharing a bucket take consecutive slices of one sample, so sections never overlap
+    sections = []
+    for quota in quotas:
+        sections.append(drawn[quota.bucket][:quota.count])
+        drawn[quota.bucket] = drawn[quota.bucket][quota.count:]
+    return sections
+
+
+# =========================================================================
+# BUILDING THE TEST
+# =========================================================================
+
+@transaction.atomic
+def build_mock_test(title, category, quotas, time_minutes, avoid_recent_days=DEFAULT_RECENT_DAYS, rng=random):
+    """Creates a MockTest filled with copies of sampled pool questions. Returns the test."""
+    exclude = recently_seen(category.pk, avoid_recent_days) if avoid_recent_days else ()
+    question_ids = [q_id for section in select_questions(quotas, exclude, rng) for q_id in section]
+    sources = Question.objects.in_bulk(question_ids)
+    if len(sources) < len(question_ids):
+        # Questions deleted since the pool index was cached: rebuild it and sample again
+        pool_index(refresh=True)
+        question_ids = [q_id for section in select_questions(quotas, exclude, rng) for q_id in section]
+        sources = Question.objects.in_bulk(question_ids)
+        if len(sources) < len(question_ids):
+            raise AssemblyError("The question pool changed while the test was being assembled; try again.")
+
+    max_marks = sum(sources[q_id].marks for q_id in question_ids)
+    mock_test = MockTest.objects.create(
+        category=category, title=title, question_count=len(question_ids),
+        max_marks=int(max_marks), time_minutes=time_minutes, is_new=True,
+    )
+    _copy_questions(mock_test, [sources[q_id] for q_id in question_ids])
+    return mock_test
+
+
+def _copy_questions(mock_test, sources):
+    """
+    Copies questions and options in four bulk queries. IDs are re-read after each insert
+    because MySQL's bulk_create does not return primary keys.
+    """
+    Question.objects.bulk_create([
+        Question(mock_test=mock_test, subject_id=q.subject_id, text=q.text, difficulty=q.difficulty, marks=q.marks,
+                 negative_marks=q.negative_marks, solution=q.solution, source_question_id=q.pk,
+                 text_html=q.text_html, solution_html=q.solution_html, render_version=q.render_version)
+        for q in sources
+    ])
+    copy_of = dict(Question.objects.filter(mock_test=mock_test).values_list('source_question_id', 'id'))
+
+    source_options = {}
+    for option in Option.objects.filter(question_id__in=copy_of).order_by('pk'):
+        source_options.setdefault(option.question_id, []).append(option)
+    Option.objects.bulk_create([
+        Option(question_id=copy_of[source_id], text=option.text, text_html=option.text_html)
+        for source_id, options in source_options.items() for option in options
+    ])
+    new_options = {}
+    for option_id, question_id in Option.objects.filter(question__mock_test=mock_test).order_by('pk') \
+            .values_list('id', 'question_id'):
+        new_options.setdefault(question_id, []).append(option_id)
+
+    # Options were inserted in source order, so the correct option keeps its position
+    copies = []
+    for source in sources:
+        options = source_options.get(source.pk, [])
+        position = next((i for i, option in enumerate(options) if option.pk == source.correct_option_id), None)
+        if position is not None:
+            copies.append(Question(pk=copy_of[source.pk], correct_option_id=new_options[copy_of[source.pk]][position]))
+    Question.objects.bulk_update(copies, ['correct_option'])
@@ -0,0 +1,48 @@
+# FILE: exams/asyncdb.py
+
+"""
+Helpers for the async read views.
+
+Django's async ORM methods (aget, afirst, async for, ...) run their query on the request's
+single thread-sensitive executor, so awaiting several of them with asyncio.gather still
+executes them one after another. gather() below runs independent *sync* query callables
+on the loop's thread pool instead; each thread uses its own database connection, so the
+queries overlap on the server. The pool threads are long-lived and keep their connections
+for CONN_MAX_AGE (see DATABASES in settings), so a gathered query does not pay a connect.
+Only use it for reads that do not need to see each other's writes or share a transaction.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.shortcuts import render
+
+
+async def gather(*funcs):
+    """Runs independent sync query callables concurrently; returns their results in order."""
+    return await asyncio.gather(*(sync_to_async(_run, thread_sensitive=False)(func) for func in funcs))
+
+
+def _run(func):
+    try:
+        return func()
+    finally:
+        # Pool threads live outside the request cycle, so apply CONN_MAX_AGE here: the
+        # connection is kept for the thread's next query unless it is too old or broken
+        close_old_connections()
+
+
+async def arender(request, template_name, context):
+    """
+    render() for async views. Templates may still touch request.user and the context
+    processors' querysets, which must not run on the event loop, so rendering is moved off it.
+    """
+    return await sync_to_async(render)(request, template_name, context)
+
+
+def evaluated_page(paginator, number):
+    """paginator.get_page() with its object list fetched, for use inside sync_to_async."""
+    page = paginator.get_page(number)
+    page.object_list = list(page.object_list)
+    return page
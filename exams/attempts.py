@@ -0,0 +1,113 @@
+# FILE: exams/attempts.py
+
+"""
+Server-side attempt sessions with batched autosave.
+
+The live test page sends small answer diffs (only the questions that changed since the
+last save) every few seconds. Each diff is appended as one AttemptLogEntry row, which
+never contends with other writers. Every COMPACT_EVERY diffs, and always before grading,
+the log is folded into AttemptSession.answers and the folded entries are deleted.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import AttemptSession, AttemptLogEntry
+
+COMPACT_EVERY = getattr(settings, 'EXAMS_ATTEMPT_COMPACT_EVERY', 10)
+# Extra minutes past the test duration before an unfinished session is abandoned
+SESSION_GRACE_MINUTES = getattr(settings, 'EXAMS_ATTEMPT_GRACE_MINUTES', 15)
+
+
+def get_or_start_session(user, mock_test):
+    """Resumes the user's unexpired active session for a test, or starts a new one."""
+    cutoff = timezone.now() - timedelta(minutes=mock_test.time_minutes + SESSION_GRACE_MINUTES)
+    session = AttemptSession.objects.filter(
+        user=user, mock_test=mock_test, status=AttemptSession.STATUS_ACTIVE, started_at__gte=cutoff,
+    ).order_by('-started_at').first()
+    if session is None:
+        session = AttemptSession.objects.create(user=user, mock_test=mock_test)
+    return session
+
+
+def append_diff(session, seq, changes):
+    """
+    Appends one batch of changes to the session log. Replayed sequence numbers (client
+    retries) are ignored. Returns True if the entry was new.
+    """
+    if seq <= session.compacted_seq:
+        return False
+    changes = [_normalize_change(change) for change in changes]
+    try:
+        with transaction.atomic():
+            AttemptLogEntry.objects.create(session=session, seq=seq, changes=changes)
+    except IntegrityError:
+        return False
+    if seq % COMPACT_EVERY == 0:
+        compact(session)
+    return True
+
+
+def last_seq(session):
+    """The highest sequence number stored for the session, compacted or still in the log."""
+    logged = AttemptLogEntry.objects.filter(session=session).aggregate(seq=Max('seq'))['seq']
+    return max(session.compacted_seq, logged or 0)
+
+
+@transaction.atomic
+def compact(session):
+    """Folds pending log entries into the session snapshot and drops them."""
+    session = AttemptSession.objects.select_for_update().get(pk=session.pk)
+    entries = list(
+        AttemptLogEntry.objects.filter(session=session, seq__gt=session.compacted_seq)
+        .order_by('seq').values_list('seq', 'changes')
+    )
+    if entries:
+        answers = dict(session.answers)
+        for _, changes in entries:
+            for change in changes:
+                entry = [change['selected_option_id'], change['time_spent']]
+                # Multiple correct / numerical questions carry their response as a third element
+                if 'selected_option_ids' in change:
+                    entry.append(change['selected_option_ids'])
+                elif 'numerical_answer' in change:
+                    entry.append(change['numerical_answer'])
+                answers[str(change['question_id'])] = entry
+        session.answers = answers
+        session.compacted_seq = entries[-1][0]
+        session.compacted_at = timezone.now()
+        session.save(update_fields=['answers', 'compacted_seq', 'compacted_at'])
+    AttemptLogEntry.objects.filter(session=session, seq__lte=session.compacted_seq).delete()
+    return session
+
+
+def session_answers(session):
+    """Returns the compacted answers in the same shape submit_test_view accepts from the client."""
+    answers = []
+    for q_id, (selected_option_id, time_spent, *response) in session.answers.items():
+        answer = {'question_id': int(q_id), 'selected_option_id': selected_option_id, 'time_spent': time_spent}
+        if response:
+            answer['selected_option_ids' if isinstance(response[0], list) else 'numerical_answer'] = response[0]
+        answers.append(answer)
+    return answers
+
+
+def _normalize_change(change):
+    selected_option_id = change.get('selected_option_id')
+    if selected_option_id in (None, '', 'null'):
+        selected_option_id = None
+    normalized = {
+        'question_id': int(change['question_id']),
+        'selected_option_id': int(selected_option_id) if selected_option_id is not None else None,
+        'time_spent': max(0, int(change.get('time_spent') or 0)),
+    }
+    if change.get('selected_option_ids') is not None:
+        normalized['selected_option_ids'] = [int(option_id) for option_id in change['selected_option_ids']]
+    elif 'numerical_answer' in change:
+        numerical_answer = change['numerical_answer']
+        normalized['numerical_answer'] = None if numerical_answer in (None, '') else str(numerical_answer)[:32]
+    return normalized
@@ -0,0 +1,200 @@
+# FILE: exams/auth.py
+
+"""
+Authenticated-user fast path (replaces django.contrib.auth's AuthenticationMiddleware).
+
+Almost every view is @login_required, so Django fetches the user row on every request.
+CachedAuthenticationMiddleware keeps the resolved user in a small per-process cache keyed
+by session key for EXAMS_USER_CACHE_SECONDS, and hands each request its own copy of it.
+
+An entry is only used while the user's version in the shared cache is unchanged. The
+version is bumped when the user is saved or deleted (password change, is_active/is_staff
+flags) or their groups or permissions change; a change to a group's permissions bumps a
+global version that retires every entry. The session's auth hash is still checked against
+the cached user on every hit, exactly as django.contrib.auth.get_user() does. Writes that
+bypass signals (QuerySet.update()) are picked up when the entry expires.
+
+Together with the cache-first session store (exams/sessions.py) a logged-in request
+usually resolves session and user without a query. stats() reports what this saves in the
+current process; `manage.py benchmark_auth` measures queries per request both ways.
+"""
+
+import copy
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from . import sessions
+
+USER_CACHE_SECONDS = getattr(settings, 'EXAMS_USER_CACHE_SECONDS', 30)
+# Entries kept per process; expired entries are pruned when the cache grows past this
+MAX_CACHED_USERS = 10000
+
+GLOBAL_VERSION_KEY = 'exams:auth:version'
+USER_VERSION_KEY = 'exams:auth:version:{}'
+
+_lock = threading.Lock()
+_users = {}  # session_key -> (expires, user_id, backend_path, versions, user)
+# Process-local counters: requests through the middleware, user cache hits and misses
+counts = {'requests': 0, 'hits': 0, 'misses': 0}
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        # Checks that SessionMiddleware runs first, then swaps in the cached resolvers
+        super().process_request(request)
+        counts['requests'] += 1
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = partial(auser, request)
+
+
+def get_user(request):
+    """django.contrib.auth.middleware.get_user() through the per-process user cache."""
+    if not hasattr(request, '_cached_user'):
+        session = request.session
+        credentials = (session.get(SESSION_KEY), session.get(BACKEND_SESSION_KEY), session.get(HASH_SESSION_KEY))
+        versions = _versions(credentials[0]) if credentials[0] is not None else None
+        user = _cached(session.session_key, credentials, versions)
+        if user is None:
+            user = auth.get_user(request)
+            _remember(request.session.session_key, credentials, versions, user)
+        request._cached_user = user
+    return request._cached_user
+
+
+async def auser(request):
+    """django.contrib.auth.middleware.auser() through the per-process user cache."""
+    if not hasattr(request, '_acached_user'):
+        session = request.session
+        credentials = (await session.aget(SESSION_KEY), await session.aget(BACKEND_SESSION_KEY),
+                       await session.aget(HASH_SESSION_KEY))
+        versions = await _aversions(credentials[0]) if credentials[0] is not None else None
+        user = _cached(session.session_key, credentials, versions)
+        if user is None:
+            user = await auth.aget_user(request)
+            _remember(request.session.session_key, credentials, versions, user)
+        request._acached_user = user
+    return request._acached_user
+
+
+def _cached(session_key, credentials, versions):
+    user_id, backend_path, session_hash = credentials
+    entry = _users.get(session_key) if user_id is not None else None
+    if (entry is None or entry[0] < time.monotonic() or entry[1:4] != (str(user_id), backend_path, versions)
+            or not session_hash or not constant_time_compare(session_hash, entry[4].get_session_auth_hash())):
+        counts['misses'] += user_id is not None
+        return None
+    counts['hits'] += 1
+    # Each request gets its own instance: views may set attributes or cache permissions on it
+    return copy.copy(entry[4])
+
+
+def _remember(session_key, credentials, versions, user):
+    # Only verified logins: auth.get_user() returns AnonymousUser for a bad hash and flushes
+    # the session, which changes its key
+    if not user.is_authenticated or session_key is None or versions is None or str(user.pk) != str(credentials[0]):
+        return
+    now = time.monotonic()
+    with _lock:
+        if len(_users) >= MAX_CACHED_USERS:
+            for key in [key for key, entry in _users.items() if entry[0] < now]:
+                del _users[key]
+            if len(_users) >= MAX_CACHED_USERS:
+                _users.clear()
+        _users[session_key] = (now + USER_CACHE_SECONDS, str(user.pk), credentials[1], versions, copy.copy(user))
+
+
+# =========================================================================
+# Invalidation
+# =========================================================================
+
+def _versions(user_id):
+    # Read before the user is fetched: a change made in between retires the new entry
+    found = cache.get_many([GLOBAL_VERSION_KEY, USER_VERSION_KEY.format(user_id)])
+    return (found.get(GLOBAL_VERSION_KEY, 0), found.get(USER_VERSION_KEY.format(user_id), 0))
+
+
+async def _aversions(user_id):
+    found = await cache.aget_many([GLOBAL_VERSION_KEY, USER_VERSION_KEY.format(user_id)])
+    return (found.get(GLOBAL_VERSION_KEY, 0), found.get(USER_VERSION_KEY.format(user_id), 0))
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Never expires: a version falling back to 0 could revive an entry cached at 0
+        cache.set(key, 1, None)
+
+
+def bump_user(user_id):
+    """Retires every process's cached copy of one user."""
+    _bump(USER_VERSION_KEY.format(user_id))
+
+
+def _user_changed(sender, instance, **kwargs):
+    bump_user(instance.pk)
+
+
+def _user_relations_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_user(instance.pk)
+    elif pk_set:
+        # Changed from the group/permission side: bump each affected user
+        for user_id in pk_set:
+            bump_user(user_id)
+    else:
+        _bump(GLOBAL_VERSION_KEY)
+
+
+def _everyone_changed(action=None, **kwargs):
+    if action and not action.startswith('post_'):
+        return
+    _bump(GLOBAL_VERSION_KEY)
+
+
+def connect_signals():
+    """Called from ExamsConfig.ready(): user, group and permission changes retire cached users."""
+    User = get_user_model()
+    post_save.connect(_user_changed, sender=User, dispatch_uid='exams_auth_user_saved')
+    post_delete.connect(_user_changed, sender=User, dispatch_uid='exams_auth_user_deleted')
+    for through in (User.groups.through, User.user_permissions.through):
+        m2m_changed.connect(_user_relations_changed, sender=through, dispatch_uid=f'exams_auth_{through.__name__}')
+    # A group's permissions apply to all its members: retire everyone
+    m2m_changed.connect(_everyone_changed, sender=Group.permissions.through, dispatch_uid='exams_auth_group_perms')
+    post_delete.connect(_everyone_changed, sender=Group, dispatch_uid='exams_auth_group_deleted')
+
+
+# =========================================================================
+# Metrics
+# =========================================================================
+
+def stats():
+    """
+    Queries saved in this process since start-up: user cache hits (one user SELECT each),
+    session loads served by the cache (one session SELECT each) and session saves folded
+    into bulk flushes (one UPDATE each).
+    """
+    session_counts = dict(sessions.counts)
+    saved = {
+        'user': counts['hits'],
+        'session_load': session_counts['loads'] - session_counts['db_loads'],
+        'session_save': max(0, session_counts['buffered_saves'] - session_counts['db_writes'] - sessions.pending_count()),
+    }
+    total = sum(saved.values())
+    return {
+        **counts, **session_counts, 'saved': saved, 'queries_saved': total,
+        'queries_saved_per_request': total / counts['requests'] if counts['requests'] else 0.0,
+    }
@@ -0,0 +1,217 @@
+# FILE: exams/cohort.py
+
+"""
+Per-test, per-subject cohort statistics maintained incrementally.
+
+Every submitted result is folded into CohortStat rows (one per subject of the test plus a
+whole-test row with subject NULL) by an outbox handler, after the submission commits.
+Each row keeps sums for means, the top score, and a score histogram that serves as a
+mergeable quantile sketch: two sketches merge by adding their bins, so batches, backfills
+and shards combine exactly. results_view reads every row for a test in one query.
+"""
+
+from .models import CohortStat, Question, TestResult, UserAnswer
+
+# Histogram of score percentage: bins of SKETCH_BIN_WIDTH % from SKETCH_MIN % to 100 %.
+# Negative marking can push a subject below zero, hence the negative floor.
+SKETCH_MIN = -50
+SKETCH_BIN_WIDTH = 1
+SKETCH_BINS = (100 - SKETCH_MIN) // SKETCH_BIN_WIDTH + 1
+
+OVERALL = None  # subject key of the whole-test row
+
+
+def empty_sketch():
+    return [0] * SKETCH_BINS
+
+
+def sketch_add(sketch, percentage):
+    clamped = min(100.0, max(float(SKETCH_MIN), percentage))
+    sketch[int((clamped - SKETCH_MIN) // SKETCH_BIN_WIDTH)] += 1
+
+
+def sketch_merge(left, right):
+    return [a + b for a, b in zip(left or empty_sketch(), right or empty_sketch())]
+
+
+def sketch_quantile(sketch, q):
+    """Approximate q-quantile (0..1) of the score percentage, at bin resolution."""
+    total = sum(sketch or ())
+    if not total:
+        return None
+    target = q * total
+    seen = 0
+    for index, count in enumerate(sketch):
+        seen += count
+        if seen >= target and count:
+            return SKETCH_MIN + (index + 0.5) * SKETCH_BIN_WIDTH
+    return 100.0
+
+
+def apply_results(result_ids):
+    """
+    Folds the given results into their tests' cohort stats. Must run inside a transaction:
+    the test's CohortStat rows are locked so concurrent dispatchers serialize per test
+    (the MockTest row, which the attempt counters update, is never locked here).
+    """
+    if not result_ids:
+        return
+    results = dict(TestResult.objects.filter(pk__in=result_ids).values_list('pk', 'mock_test_id'))
+    tests = {}
+    for result_id, test_id in results.items():
+        tests.setdefault(test_id, []).append(result_id)
+
+    for test_id in sorted(tests):
+        per_subject = _attempt_subject_totals(test_id, tests[test_id])
+        _merge_into_stats(test_id, per_subject)
+
+
+def _attempt_subject_totals(test_id, result_ids):
+    """
+    Returns {subject_id: {'max_marks', 'attempts': [(score, correct, incorrect, time)]}},
+    including the OVERALL key, for the given results of one test. Two queries.
+    """
+    subject_marks, totals = result_subject_totals(test_id, result_ids)
+    per_subject = {
+        subject_id: {'max_marks': max_marks, 'attempts': []} for subject_id, max_marks in subject_marks.items()
+    }
+    for subjects in totals.values():
+        for subject_id, attempt in subjects.items():
+            per_subject[subject_id]['attempts'].append(attempt)
+    return per_subject
+
+
+def result_subject_totals(test_id, result_ids):
+    """
+    Returns ({subject_id: max_marks}, {result_id: {subject_id: (score, correct, incorrect, time)}}),
+    both including the OVERALL key, for the given results of one test. Two queries.
+    """
+    subject_marks = {OVERALL: 0.0}
+    question_info = {}  # question_id -> subject_id
+    for q_id, subject_id, marks in Question.objects.filter(mock_test_id=test_id) \
+            .values_list('id', 'subject_id', 'marks'):
+        question_info[q_id] = subject_id
+        subject_marks[OVERALL] += float(marks or 0)
+        if subject_id is not None:
+            subject_marks[subject_id] = subject_marks.get(subject_id, 0.0) + float(marks or 0)
+
+    # {result_id: {subject_id: [score, correct, incorrect, time]}}
+    totals = {result_id: {subject_id: [0.0, 0, 0, 0] for subject_id in subject_marks} for result_id in result_ids}
+    answers = UserAnswer.objects.filter(test_result_id__in=result_ids).values_list(
+        'test_result_id', 'question_id', 'selected_option_id', 'response', 'is_correct', 'marks_awarded', 'time_spent',
+    )
+    for result_id, q_id, selected_option_id, response, is_correct, marks_awarded, time_spent in answers:
+        if q_id not in question_info:
+            continue
+        subject_id = question_info[q_id]
+        keys = (OVERALL, subject_id) if subject_id is not None else (OVERALL,)
+        attempted = selected_option_id is not None or response != ''
+        for key in keys:
+            bucket = totals[result_id][key]
+            bucket[3] += time_spent
+            # marks_awarded already carries partial and negative marking (see exams/grading.py)
+            bucket[0] += marks_awarded
+            if is_correct:
+                bucket[1] += 1
+            elif attempted:
+                bucket[2] += 1
+
+    for subjects in totals.values():
+        # The whole-test score is floored like TestResult.score
+        subjects[OVERALL][0] = max(0.0, subjects[OVERALL][0])
+        for subject_id, bucket in subjects.items():
+            subjects[subject_id] = tuple(bucket)
+    return subject_marks, totals
+
+
+def _merge_into_stats(test_id, per_subject):
+    # Create missing rows first so that locking the test's rows covers every row merged into
+    known = set(CohortStat.objects.filter(mock_test_id=test_id).values_list('subject_id', flat=True))
+    CohortStat.objects.bulk_create(
+        [CohortStat(mock_test_id=test_id, subject_id=subject_id, score_sketch=empty_sketch())
+         for subject_id in per_subject if subject_id not in known],
+        ignore_conflicts=True,
+    )
+    stats = list(CohortStat.objects.select_for_update().filter(mock_test_id=test_id).order_by('pk'))
+    existing = {}
+    for stat in stats:
+        if stat.subject_id in existing:
+            # The unique constraint does not cover the NULL-subject row, so two first
+            # dispatchers can each create one; fold the later one into the earlier
+            _absorb(existing[stat.subject_id], stat)
+        else:
+            existing[stat.subject_id] = stat
+
+    to_create, to_update = [], []
+    for subject_id, data in per_subject.items():
+        stat = existing.get(subject_id)
+        if stat is None:
+            stat = CohortStat(mock_test_id=test_id, subject_id=subject_id, score_sketch=empty_sketch())
+            to_create.append(stat)
+        else:
+            to_update.append(stat)
+        stat.max_marks = data['max_marks']
+        sketch = list(stat.score_sketch or empty_sketch())
+        for score, correct, incorrect, time_spent in data['attempts']:
+            stat.attempts += 1
+            stat.score_sum += score
+            stat.top_score = score if stat.top_score is None else max(stat.top_score, score)
+            stat.correct_sum += correct
+            stat.incorrect_sum += incorrect
+            stat.time_sum += time_spent
+            if data['max_marks'] > 0:
+                sketch_add(sketch, score * 100.0 / data['max_marks'])
+        stat.score_sketch = sketch
+
+    CohortStat.objects.bulk_create(to_create)
+    CohortStat.objects.bulk_update(to_update, [
+        'attempts', 'score_sum', 'top_score', 'max_marks', 'correct_sum', 'incorrect_sum', 'time_sum', 'score_sketch',
+    ])
+
+
+def _absorb(stat, duplicate):
+    """Adds a duplicate row's aggregates to `stat` (saved by the caller) and deletes it."""
+    stat.attempts += duplicate.attempts
+    stat.score_sum += duplicate.score_sum
+    if duplicate.top_score is not None:
+        stat.top_score = duplicate.top_score if stat.top_score is None else max(stat.top_score, duplicate.top_score)
+    stat.max_marks = max(stat.max_marks, duplicate.max_marks)
+    stat.correct_sum += duplicate.correct_sum
+    stat.incorrect_sum += duplicate.incorrect_sum
+    stat.time_sum += duplicate.time_sum
+    stat.score_sketch = sketch_merge(stat.score_sketch, duplicate.score_sketch)
+    duplicate.delete()
+
+
+def comparison_for(mock_test_id):
+    """
+    Returns {subject_id (None = whole test): {...}} with mean/top/accuracy/time figures and
+    median/p90 percentages, from one query.
+    """
+    comparison = {}
+    for stat in CohortStat.objects.filter(mock_test_id=mock_test_id):
+        answered = stat.correct_sum + stat.incorrect_sum
+        comparison[stat.subject_id] = {
+            'attempts': stat.attempts,
+            'mean_score': stat.score_sum / stat.attempts if stat.attempts else 0.0,
+            'top_score': stat.top_score or 0.0,
+            'max_marks': stat.max_marks,
+            'accuracy': stat.correct_sum * 100.0 / answered if answered else 0.0,
+            'mean_time': stat.time_sum / stat.attempts if stat.attempts else 0.0,
+            'median_percentage': sketch_quantile(stat.score_sketch, 0.5),
+            'p90_percentage': sketch_quantile(stat.score_sketch, 0.9),
+        }
+    return comparison
+
+
+def rebuild(test_id, chunk_size=2000):
+    """Recomputes a test's stats from scratch (backfill), walking results in keyset chunks."""
+    CohortStat.objects.filter(mock_test_id=test_id).delete()
+    last_pk = 0
+    results = TestResult.objects.filter(mock_test_id=test_id).order_by('pk').values_list('pk', flat=True)
+    while True:
+        chunk = list(results.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        _merge_into_stats(test_id, _attempt_subject_totals(test_id, chunk))
+        last_pk = chunk[-1]
@@ -0,0 +1,193 @@
+# FILE: exams/comparison.py
+
+"""
+Attempt-to-attempt comparison for retakes of the same test.
+
+Each attempt is reduced to a compact vector over the test's questions in question order
+(the order of the live test): one status byte per question (unattempted / correct / wrong)
+followed by the marks awarded (float32) and seconds spent (uint32) per question. A vector
+is built from the attempt's own UserAnswer rows (one query, no join) and cached; comparing
+two attempts is a single pass over two vectors in memory, and the result is cached per pair.
+
+Everything is keyed under a per-test version, bumped when a question is added, edited or
+removed and when the test is regraded (regrade_results), so a stale layout or grade is
+never diffed. Stored answers do not otherwise change after submission.
+"""
+
+from array import array
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from .models import Question, Subject, UserAnswer
+
+UNATTEMPTED, CORRECT, WRONG = 0, 1, 2
+STATUS_NAMES = {UNATTEMPTED: 'unattempted', CORRECT: 'correct', WRONG: 'wrong'}
+
+CACHE_SECONDS = 24 * 60 * 60
+# Questions listed under "biggest time shifts"
+TIME_SHIFTS = 5
+
+
+def compare(older, newer):
+    """
+    Diff of two TestResults of the same test (older first): question numbers that became
+    correct, wrong or unattempted, unchanged counts, per-subject score/correct/time deltas
+    and the biggest per-question time shifts.
+    """
+    test_id = older.mock_test_id
+    version = _version(test_id)
+    key = f"{_prefix(test_id, version)}:pair:{older.pk}:{newer.pk}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    layout = _layout(test_id, version)
+    vectors = _vectors([older.pk, newer.pk], test_id, version, layout)
+    diff = _diff(layout, unpack(vectors[older.pk], len(layout['question_ids'])),
+                 unpack(vectors[newer.pk], len(layout['question_ids'])))
+    # The whole-test score is floored at zero, so take it from the results themselves
+    diff['score_delta'] = round(float(newer.score) - float(older.score), 2)
+    cache.set(key, diff, CACHE_SECONDS)
+    return diff
+
+
+def pack(status, marks, times):
+    return bytes(status) + array('f', marks).tobytes() + array('I', times).tobytes()
+
+
+def unpack(vector, count):
+    """(status bytes, marks array, times array) of a packed vector over `count` questions."""
+    marks_end = count + 4 * count
+    return vector[:count], array('f', vector[count:marks_end]), array('I', vector[marks_end:])
+
+
+def forget(test_id):
+    """Retires every cached vector and comparison of a test (after regrading it)."""
+    key = f"exams:compare:version:{test_id}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+# =========================================================================
+# Vectors
+# =========================================================================
+
+def _layout(test_id, version):
+    key = f"{_prefix(test_id, version)}:layout"
+    layout = cache.get(key)
+    if layout is None:
+        rows = list(Question.objects.filter(mock_test_id=test_id).order_by('pk').values_list('pk', 'subject_id'))
+        subject_ids = sorted({subject_id for _, subject_id in rows if subject_id is not None})
+        layout = {
+            'question_ids': [question_id for question_id, _ in rows],
+            'subject_ids': [subject_id for _, subject_id in rows],
+            'subject_names': dict(Subject.objects.filter(pk__in=subject_ids).values_list('pk', 'name')),
+        }
+        cache.set(key, layout, CACHE_SECONDS)
+    return layout
+
+
+def _vectors(result_ids, test_id, version, layout):
+    keys = {result_id: f"{_prefix(test_id, version)}:vector:{result_id}" for result_id in result_ids}
+    found = cache.get_many(keys.values())
+    vectors = {result_id: found[key] for result_id, key in keys.items() if key in found}
+    missing = [result_id for result_id in result_ids if result_id not in vectors]
+    if missing:
+        built = build_vectors(missing, layout['question_ids'])
+        cache.set_many({keys[result_id]: vector for result_id, vector in built.items()}, CACHE_SECONDS)
+        vectors.update(built)
+    return vectors
+
+
+def build_vectors(result_ids, question_ids):
+    """Packed vectors of the given results over question_ids, from one UserAnswer query."""
+    position = {question_id: i for i, question_id in enumerate(question_ids)}
+    count = len(question_ids)
+    columns = {result_id: (bytearray(count), [0.0] * count, [0] * count) for result_id in result_ids}
+    answers = UserAnswer.objects.filter(test_result_id__in=result_ids).values_list(
+        'test_result_id', 'question_id', 'selected_option_id', 'response', 'is_correct', 'marks_awarded', 'time_spent',
+    )
+    for result_id, question_id, selected_option_id, response, is_correct, marks_awarded, time_spent in answers:
+        i = position.get(question_id)
+        if i is None:
+            continue
+        status, marks, times = columns[result_id]
+        if is_correct:
+            status[i] = CORRECT
+        elif selected_option_id is not None or response != '':
+            status[i] = WRONG
+        marks[i] = marks_awarded
+        times[i] = time_spent
+    return {result_id: pack(*column) for result_id, column in columns.items()}
+
+
+# =========================================================================
+# Diff
+# =========================================================================
+
+def _diff(layout, before, after):
+    (status_before, marks_before, times_before), (status_after, marks_after, times_after) = before, after
+    changed = {CORRECT: [], WRONG: [], UNATTEMPTED: []}
+    unchanged = {CORRECT: 0, WRONG: 0, UNATTEMPTED: 0}
+    subjects = {}
+    shifts = []
+    for i, subject_id in enumerate(layout['subject_ids']):
+        old, new = status_before[i], status_after[i]
+        if old == new:
+            unchanged[new] += 1
+        else:
+            changed[new].append(i + 1)
+        totals = subjects.setdefault(subject_id, [0.0, 0.0, 0, 0, 0, 0])
+        totals[0] += marks_before[i]
+        totals[1] += marks_after[i]
+        totals[2] += old == CORRECT
+        totals[3] += new == CORRECT
+        totals[4] += times_before[i]
+        totals[5] += times_after[i]
+        if times_after[i] != times_before[i]:
+            shifts.append((i + 1, times_before[i], times_after[i]))
+
+    shifts.sort(key=lambda shift: (-abs(shift[2] - shift[1]), shift[0]))
+    subject_rows = [
+        {
+            'subject_id': subject_id, 'name': layout['subject_names'].get(subject_id, 'Other'),
+            'score_before': round(score_before, 2), 'score_after': round(score_after, 2),
+            'score_delta': round(score_after - score_before, 2),
+            'correct_before': correct_before, 'correct_after': correct_after,
+            'correct_delta': correct_after - correct_before,
+            'time_before': time_before, 'time_after': time_after, 'time_delta': time_after - time_before,
+        }
+        for subject_id, (score_before, score_after, correct_before, correct_after, time_before, time_after)
+        in sorted(subjects.items(), key=lambda item: (item[0] is None, layout['subject_names'].get(item[0], '')))
+    ]
+    return {
+        'questions': len(layout['question_ids']),
+        'newly_correct': changed[CORRECT],
+        'newly_wrong': changed[WRONG],
+        'newly_unattempted': changed[UNATTEMPTED],
+        'unchanged': {STATUS_NAMES[status]: count for status, count in unchanged.items()},
+        'subjects': subject_rows,
+        'time_delta': sum(row['time_delta'] for row in subject_rows),
+        'time_shifts': [{'number': number, 'before': old, 'after': new, 'delta': new - old}
+                        for number, old, new in shifts[:TIME_SHIFTS]],
+    }
+
+
+def _version(test_id):
+    return cache.get(f"exams:compare:version:{test_id}", 0)
+
+
+def _prefix(test_id, version):
+    return f"exams:compare:{test_id}:{version}"
+
+
+def _forget_question_test(sender, instance, **kwargs):
+    forget(instance.mock_test_id)
+
+
+def connect_signals():
+    """Called from ExamsConfig.ready(): adding, editing or removing a question changes the test's layout."""
+    post_save.connect(_forget_question_test, sender=Question, dispatch_uid='comparison_save_Question')
+    post_delete.connect(_forget_question_test, sender=Question, dispatch_uid='comparison_delete_Question')
@@ -1,10 +1,18 @@
+from . import hotcache, pagecache
 from .models import ExamCategory
 
 def all_categories_context(request):
     """
     Makes the list of all exam categories available to every template.
+    Cached per catalog version, so live-exam pages render without a query for the navbar;
+    after a catalog change one request reloads it while the others keep the previous list.
     """
-    all_categories = ExamCategory.objects.all().order_by('name')
+    all_categories = hotcache.get_or_compute(
+        "exams:nav_categories",
+        lambda: list(ExamCategory.objects.all().order_by('name')),
+        60 * 60,
+        version=pagecache.catalog_version(),
+    )
     return {
         'all_categories': all_categories
-    }
\ No newline at end of file
+    }
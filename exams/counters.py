@@ -0,0 +1,166 @@
+# FILE: exams/counters.py
+
+"""
+Buffered attempt counters and time-decayed popularity for MockTest.
+
+Incrementing MockTest.attempts_count on every submission would serialize the end of a live
+exam on the hottest test row. Instead, increments are accumulated in-process and written
+out periodically as ONE batched UPDATE covering every dirty test. Counts buffered in a
+worker that dies before its next flush are lost, which is acceptable for a popularity signal.
+
+Trending uses an exponentially decayed attempt count stored in log space relative to a fixed
+epoch: score = log(sum(exp(lambda * (t_i - EPOCH)))). Old attempts never need re-decaying,
+ordering by trending_score is correct at any moment, and the decayed count "right now" is
+exp(score - lambda * (now - EPOCH)).
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When, Value, F, IntegerField, Q
+from django.utils import timezone
+
+from . import pagecache
+from .models import MockTest
+
+FLUSH_INTERVAL_SECONDS = getattr(settings, 'EXAMS_COUNTER_FLUSH_SECONDS', 30)
+TRENDING_HALF_LIFE_HOURS = getattr(settings, 'EXAMS_TRENDING_HALF_LIFE_HOURS', 72)
+# A test is "popular" while its decayed attempt count stays at or above this value
+POPULAR_MIN_DECAYED_ATTEMPTS = getattr(settings, 'EXAMS_POPULAR_MIN_DECAYED_ATTEMPTS', 50)
+
+DECAY_RATE = math.log(2) / (TRENDING_HALF_LIFE_HOURS * 3600)
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+_lock = threading.Lock()
+_pending = {}  # test_id -> attempts since last flush
+_last_flush = time.monotonic()
+
+
+def increment(test_id, amount=1):
+    """Buffers attempt increments for a test; flushes if the interval has elapsed."""
+    with _lock:
+        _pending[test_id] = _pending.get(test_id, 0) + amount
+    flush_if_due()
+
+
+def flush_if_due():
+    if time.monotonic() - _last_flush >= FLUSH_INTERVAL_SECONDS:
+        flush()
+
+
+def pending_snapshot():
+    """Returns a copy of the unflushed increments (for diagnostics)."""
+    with _lock:
+        return dict(_pending)
+
+
+def flush():
+    """
+    Writes all buffered increments in one UPDATE and refreshes is_popular (also when nothing
+    is buffered: decay alone moves tests below the cutoff). Returns the number of tests updated.
+    """
+    global _last_flush
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not batch:
+        if refresh_popular_flags():
+            pagecache.bump_catalog_version()
+        return 0
+
+    now = timezone.now()
+    log_weight = _elapsed_seconds(now) * DECAY_RATE
+    try:
+        with transaction.atomic():
+            # Lock dirty rows in PK order so concurrent flushes from other workers cannot deadlock
+            current_scores = dict(
+                MockTest.objects.select_for_update().filter(pk__in=batch.keys())
+                .order_by('pk').values_list('pk', 'trending_score')
+            )
+            attempts_case = Case(
+                *[When(pk=test_id, then=Value(amount)) for test_id, amount in batch.items()],
+                default=Value(0), output_field=IntegerField(),
+            )
+            new_scores = {
+                test_id: _log_add(current_scores[test_id], math.log(amount) + log_weight)
+                for test_id, amount in batch.items() if test_id in current_scores
+            }
+            trending_case = Case(
+                *[When(pk=test_id, then=Value(score)) for test_id, score in new_scores.items()],
+                default=F('trending_score'),
+            )
+            updated = MockTest.objects.filter(pk__in=current_scores.keys()).update(
+                attempts_count=F('attempts_count') + attempts_case,
+                trending_score=trending_case,
+            )
+    except Exception:
+        # Put the counts back so the next flush retries them
+        with _lock:
+            for test_id, amount in batch.items():
+                _pending[test_id] = _pending.get(test_id, 0) + amount
+        raise
+
+    flags_changed = refresh_popular_flags(now)
+    # Cached catalog pages show the Popular badge and the trending order, so retire them when
+    # either changes. Attempt counts alone do not: the pages show them with up to
+    # PAGE_CACHE_SECONDS of lag rather than being re-rendered on every flush of a live exam.
+    if flags_changed or _trending_order_changed(current_scores, new_scores):
+        pagecache.bump_catalog_version()
+    return updated
+
+
+def refresh_popular_flags(now=None):
+    """
+    Re-derives MockTest.is_popular from the decayed counts; touches only rows that change.
+    Returns the number of rows changed.
+    """
+    cutoff = popularity_cutoff(now)
+    return (MockTest.objects.filter(is_popular=False, trending_score__gte=cutoff).update(is_popular=True)
+            + MockTest.objects.filter(is_popular=True, trending_score__lt=cutoff).update(is_popular=False))
+
+
+def _trending_order_changed(old_scores, new_scores):
+    """
+    Whether raising the given tests' scores changed the trending order. Decay shifts every
+    score equally, so only the raised tests can move: past each other, or past another test
+    whose score lies between their old and new score. A test leaving zero newly trends.
+    """
+    if not new_scores:
+        return False
+    if any(old_scores[test_id] <= 0 for test_id in new_scores):
+        return True
+    if sorted(new_scores, key=old_scores.get) != sorted(new_scores, key=new_scores.get):
+        return True
+    overtaken = Q()
+    for test_id, score in new_scores.items():
+        overtaken |= Q(trending_score__gte=old_scores[test_id], trending_score__lte=score)
+    return MockTest.objects.exclude(pk__in=new_scores.keys()).filter(overtaken).exists()
+
+
+def popularity_cutoff(now=None):
+    """The trending_score equivalent of POPULAR_MIN_DECAYED_ATTEMPTS at time `now`."""
+    return math.log(POPULAR_MIN_DECAYED_ATTEMPTS) + _elapsed_seconds(now or timezone.now()) * DECAY_RATE
+
+
+def decayed_attempts(trending_score, now=None):
+    """Converts a stored trending_score into the decayed attempt count at time `now`."""
+    if trending_score <= 0:
+        return 0.0
+    return math.exp(trending_score - _elapsed_seconds(now or timezone.now()) * DECAY_RATE)
+
+
+def _elapsed_seconds(now):
+    return (now - EPOCH).total_seconds()
+
+
+def _log_add(a, b):
+    """Numerically stable log(exp(a) + exp(b)); a score of 0 means "no attempts yet"."""
+    if a <= 0:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
@@ -0,0 +1,179 @@
+# FILE: exams/exports.py
+
+"""
+Streaming exports of TestResult + UserAnswer data for analysts.
+
+Rows are produced by generators: results are read in keyset chunks (pk > last seen, LIMIT
+CHUNK_SIZE) and the answers for each chunk are fetched in one query, so memory stays
+constant however many attempts match. Keyset chunks are used rather than .iterator()
+because MySQL's client buffers an entire result set even for .iterator(). Writers turn
+the row generator into CSV text or JSON lines (optionally gzip-compressed) incrementally,
+for StreamingHttpResponse or for a file.
+
+Layouts:
+- "long": one row per answered question (result fields repeated on each row).
+- "wide": one row per attempt with a selected-option column per question. Needs a single
+  test, because the columns are that test's questions.
+"""
+
+import csv
+import json
+import zlib
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Question, TestResult, UserAnswer
+
+CHUNK_SIZE = 2000
+
+RESULT_FIELDS = [
+    'id', 'user_id', 'user__username', 'mock_test_id', 'score', 'max_marks', 'correct_answers',
+    'incorrect_answers', 'unattempted', 'time_taken_seconds', 'start_time', 'end_time',
+]
+RESULT_COLUMNS = [
+    'result_id', 'user_id', 'username', 'test_id', 'score', 'max_marks', 'correct', 'incorrect',
+    'unattempted', 'time_taken_seconds', 'start_time', 'end_time',
+]
+ANSWER_COLUMNS = ['question_id', 'selected_option_id', 'is_correct', 'time_spent', 'response', 'marks_awarded']
+
+LAYOUTS = ('long', 'wide')
+FORMATS = ('csv', 'jsonl')
+
+
+class ExportError(ValueError):
+    """Raised for an export request that cannot be satisfied (bad filter or layout)."""
+
+
+def filter_results(test_ids=None, category_slug=None, since=None, until=None):
+    """Builds the TestResult queryset for an export; dates accept ISO date or datetime strings."""
+    queryset = TestResult.objects.all()
+    if test_ids:
+        queryset = queryset.filter(mock_test_id__in=test_ids)
+    if category_slug:
+        queryset = queryset.filter(mock_test__category__slug=category_slug)
+    if since:
+        queryset = queryset.filter(end_time__gte=_parse_bound(since))
+    if until:
+        queryset = queryset.filter(end_time__lt=_parse_bound(until))
+    return queryset
+
+
+def iter_rows(queryset, layout='long', test_id=None):
+    """Yields the header row, then data rows, for the chosen layout."""
+    if layout == 'wide':
+        question_ids = list(Question.objects.using(queryset.db).filter(mock_test_id=test_id).order_by('pk').values_list('pk', flat=True))
+        yield RESULT_COLUMNS + [f"q{q_id}" for q_id in question_ids]
+        for result, answers in _iter_results_with_answers(queryset):
+            # Multiple correct and numerical answers have no selected option; show the response
+            selected = {answer[0]: answer[1] if answer[1] is not None else answer[4] for answer in answers}
+            yield result + [selected.get(q_id, '') for q_id in question_ids]
+    else:
+        yield RESULT_COLUMNS + ANSWER_COLUMNS
+        empty_answer = [None] * len(ANSWER_COLUMNS)
+        for result, answers in _iter_results_with_answers(queryset):
+            if not answers:
+                yield result + empty_answer
+            for answer in answers:
+                yield result + list(answer)
+
+
+def _iter_results_with_answers(queryset):
+    """Yields (result_row, [answer tuples]) in result-ID order, CHUNK_SIZE results at a time."""
+    results = queryset.order_by('pk').values_list(*RESULT_FIELDS)
+    last_pk = 0
+    while True:
+        chunk = list(results.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+        if not chunk:
+            return
+        yield from _attach_answers(chunk, queryset.db)
+        last_pk = chunk[-1][0]
+
+
+def _attach_answers(chunk, using):
+    answers = {}
+    rows = UserAnswer.objects.using(using).filter(test_result_id__in=[row[0] for row in chunk]) \
+        .order_by('test_result_id', 'question_id') \
+        .values_list('test_result_id', 'question_id', 'selected_option_id', 'is_correct', 'time_spent', 'response', 'marks_awarded')
+    for result_id, *answer in rows:
+        answers.setdefault(result_id, []).append(tuple(answer))
+    for row in chunk:
+        yield [_plain(value) for value in row], answers.get(row[0], [])
+
+
+# =========================================================================
+# WRITERS (generators of str / bytes chunks)
+# =========================================================================
+
+class _Echo:
+    """File-like object whose write() just returns the value, for csv.writer streaming."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_jsonl(rows):
+    """Emits one JSON object per data row, keyed by the header row."""
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+    for row in rows:
+        yield json.dumps(dict(zip(header, row))) + '\n'
+
+
+def gzip_stream(chunks, level=6):
+    """Compresses a stream of str chunks into gzip bytes incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(queryset, fmt='csv', layout='long', test_id=None, compress=False):
+    """
+    Returns a generator for the requested format, optionally gzip-compressed. Options are
+    validated here, before any output is produced. The database is chosen here too (a
+    replica under exams.replicas), since the rows are only read once the response streams.
+    """
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format '{fmt}'.")
+    if layout not in LAYOUTS:
+        raise ExportError(f"Unknown layout '{layout}'.")
+    if layout == 'wide' and test_id is None:
+        raise ExportError("The wide layout needs exactly one test.")
+    rows = iter_rows(queryset.using(queryset.db), layout, test_id)
+    chunks = stream_csv(rows) if fmt == 'csv' else stream_jsonl(rows)
+    return gzip_stream(chunks) if compress else chunks
+
+
+def export_filename(fmt, layout, compress):
+    extension = 'csv' if fmt == 'csv' else 'jsonl'
+    return f"results_{layout}.{extension}{'.gz' if compress else ''}"
+
+
+def _plain(value):
+    """JSON/CSV-friendly scalars (Decimals as floats, datetimes as ISO strings)."""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if value is not None and not isinstance(value, (int, float, str, bool)):
+        return float(value)
+    return value
+
+
+def _parse_bound(raw):
+    value = parse_datetime(raw)
+    if value is None:
+        day = parse_date(raw)
+        if day is None:
+            raise ExportError(f"Invalid date '{raw}'.")
+        value = datetime.combine(day, time.min)
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
@@ -0,0 +1,421 @@
+# FILE: exams/grading.py
+
+"""
+Answer keys and scoring for the live submit view, offline batch sync and regrading.
+
+Question types (Question.question_type):
+
+- single correct: marks for the correct option, minus negative_marks for any other
+- multiple correct (JEE Advanced style): marks when exactly the correct options are chosen;
+  minus negative_marks if any chosen option is wrong; otherwise partial_marks per correct
+  option chosen
+- numerical answer: marks when the value lies in [answer_min, answer_max], else minus
+  negative_marks
+
+The scoring core works on plain numbers only. An AnswerKey holds parallel columns with
+one entry per question: type, correct-option bitmask, numeric range and marks, all as
+floats. An attempt's responses are encoded against those columns as option bitmasks and
+floats. Decimals are converted once, when the key is loaded. The ORM is used only at the
+edges: loading keys (three queries for any number of tests) and reading and writing
+stored attempts in regrade(). grade() scores one attempt in pure Python. grade_matrix()
+scores an (attempts x questions) batch in one vectorized pass with numpy, for regrading.
+`manage.py benchmark_grading` measures both and checks that they agree.
+
+Counting: `correct` counts full-mark answers; `incorrect` counts every other attempted
+answer, including partially correct ones. The score includes partial marks and is
+floored at zero.
+"""
+
+import math
+from collections import defaultdict, namedtuple
+
+from .models import Option, Question, TestResult, UserAnswer
+
+SINGLE = Question.TYPE_SINGLE
+MULTI = Question.TYPE_MULTI
+NUMERICAL = Question.TYPE_NUMERICAL
+
+# Chosen option that does not belong to the question: never part of a correct mask
+FOREIGN_BIT = 1 << 62
+_NO_OPTION = (None, FOREIGN_BIT)
+
+# One graded answer, ready to become a UserAnswer row
+GradedAnswer = namedtuple('GradedAnswer', [
+    'question_id', 'selected_option_id', 'response', 'time_spent', 'is_correct', 'marks_awarded',
+])
+
+# Outcome of grading one attempt. `answers` holds GradedAnswer tuples.
+GradedAttempt = namedtuple('GradedAttempt', [
+    'score', 'max_marks', 'correct', 'incorrect', 'unattempted', 'time_taken', 'answers',
+])
+
+
+class AnswerKey:
+    """One test's answer key as parallel columns of plain numbers (index = question position)."""
+
+    __slots__ = (
+        'question_ids', 'position', 'types', 'correct_masks', 'low', 'high',
+        'marks', 'negative', 'partial', 'option_bits', 'max_option_bits', 'max_marks',
+    )
+
+    def __init__(self):
+        self.question_ids = []
+        self.position = {}      # question_id -> index
+        self.types = []
+        self.correct_masks = []  # bit i = i-th option of the question (by option ID)
+        self.low = []            # numerical range; NaN when unset
+        self.high = []
+        self.marks = []
+        self.negative = []
+        self.partial = []
+        self.option_bits = {}    # option_id -> (index, bit)
+        self.max_option_bits = 0
+        self.max_marks = 0.0
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def add_question(self, question_id, question_type, marks, negative_marks, partial_marks=0.0,
+                     option_ids=(), correct_option_ids=(), answer_min=None, answer_max=None):
+        index = len(self.question_ids)
+        self.question_ids.append(question_id)
+        self.position[question_id] = index
+        self.types.append(question_type)
+
+        correct_option_ids = set(correct_option_ids)
+        mask = 0
+        option_ids = sorted(option_ids)
+        for bit, option_id in enumerate(option_ids):
+            self.option_bits[option_id] = (index, 1 << bit)
+            if option_id in correct_option_ids:
+                mask |= 1 << bit
+        self.max_option_bits = max(self.max_option_bits, len(option_ids))
+        self.correct_masks.append(mask)
+
+        self.low.append(math.nan if answer_min is None else float(answer_min))
+        self.high.append(math.nan if answer_max is None else float(answer_max))
+        self.marks.append(float(marks or 0))
+        self.negative.append(float(negative_marks or 0))
+        self.partial.append(float(partial_marks or 0))
+        self.max_marks += float(marks or 0)
+
+
+# =========================================================================
+# SCORING CORE (plain numbers)
+# =========================================================================
+
+def score_choice(correct_mask, chosen_mask, marks, negative, partial):
+    """(marks awarded, is fully correct) for a single or multiple correct question."""
+    if not chosen_mask:
+        return 0.0, False
+    if chosen_mask == correct_mask:
+        return marks, True
+    if chosen_mask & ~correct_mask:
+        return -negative, False
+    return partial * (chosen_mask & correct_mask).bit_count(), False
+
+
+def score_numerical(low, high, value, marks, negative):
+    """(marks awarded, is correct) for a numerical answer; NaN bounds accept nothing."""
+    if value is None:
+        return 0.0, False
+    if low <= value <= high:
+        return marks, True
+    return -negative, False
+
+
+def grade(answer_key, answers_data):
+    """
+    Grades one attempt. `answers_data` is the submit payload shape: [{'question_id',
+    'selected_option_id' | 'selected_option_ids' | 'numerical_answer', 'time_spent'}].
+    Answers to questions outside the key are ignored; of several answers to one question,
+    the last one counts.
+    """
+    correct = incorrect = 0
+    score = 0.0
+    time_taken = 0
+    graded_answers = []
+    answered_q_ids = set()
+    # Locals: this loop runs once per answer on every submission
+    position, types, option_bits = answer_key.position, answer_key.types, answer_key.option_bits
+    marks, negative = answer_key.marks, answer_key.negative
+
+    # One answer per question, so a payload repeating a question cannot score it twice
+    latest = {}
+    for answer_data in answers_data:
+        latest[int(answer_data.get('question_id'))] = answer_data
+
+    for q_id, answer_data in latest.items():
+        index = position.get(q_id)
+        if index is None:
+            continue
+        time_spent = max(0, int(answer_data.get('time_spent') or 0))
+        time_taken += time_spent
+
+        question_type = types[index]
+        if question_type == SINGLE:
+            # Inlined encode_answer() for the common case
+            selected_option_id = parse_option_id(answer_data.get('selected_option_id'))
+            response = ''
+            if selected_option_id is None:
+                awarded, is_correct, attempted = 0.0, False, False
+            else:
+                owner, bit = option_bits.get(selected_option_id, _NO_OPTION)
+                is_correct = owner == index and bit == answer_key.correct_masks[index]
+                awarded = marks[index] if is_correct else -negative[index]
+                attempted = True
+        elif question_type == NUMERICAL:
+            _, value, selected_option_id, response = encode_answer(answer_key, index, answer_data)
+            awarded, is_correct = score_numerical(
+                answer_key.low[index], answer_key.high[index], value, marks[index], negative[index],
+            )
+            attempted = value is not None
+        else:
+            chosen_mask, _, selected_option_id, response = encode_answer(answer_key, index, answer_data)
+            awarded, is_correct = score_choice(
+                answer_key.correct_masks[index], chosen_mask, marks[index], negative[index], answer_key.partial[index],
+            )
+            attempted = chosen_mask != 0
+
+        if attempted:
+            answered_q_ids.add(q_id)
+            score += awarded
+            if is_correct:
+                correct += 1
+            else:
+                incorrect += 1
+        graded_answers.append(GradedAnswer(q_id, selected_option_id, response, time_spent, is_correct, awarded))
+
+    return GradedAttempt(
+        score=max(0.0, score),
+        max_marks=answer_key.max_marks,
+        correct=correct,
+        incorrect=incorrect,
+        unattempted=len(answer_key) - len(answered_q_ids),
+        time_taken=time_taken,
+        answers=graded_answers,
+    )
+
+
+def grade_batch(answer_key, attempts_answers):
+    """Grades many attempts of one test against a single loaded key."""
+    return [grade(answer_key, answers_data) for answers_data in attempts_answers]
+
+
+def grade_matrix(answer_key, chosen, values):
+    """
+    Scores a whole batch at once with numpy (batch jobs only; the web path never imports it).
+    `chosen` is an int64 (attempts x questions) array of option bitmasks (0 = not answered),
+    `values` a float64 array of numerical answers (NaN = not answered); see encode_stored().
+    Returns (awarded, is_correct, attempted) arrays of the same shape.
+    """
+    import numpy as np
+
+    numerical = np.array(answer_key.types) == NUMERICAL
+    correct_mask = np.array(answer_key.correct_masks, dtype=np.int64)
+    marks = np.array(answer_key.marks)
+    negative = np.array(answer_key.negative)
+    partial = np.array(answer_key.partial)
+
+    choice_attempted = chosen != 0
+    exact = chosen == correct_mask
+    wrong = (chosen & ~correct_mask) != 0
+    right = chosen & correct_mask
+    right_count = np.zeros(chosen.shape, dtype=np.int64)
+    for bit in range(answer_key.max_option_bits):
+        right_count += (right >> bit) & 1
+    choice_awarded = np.where(exact, marks, np.where(wrong, -negative, partial * right_count))
+
+    numeric_attempted = ~np.isnan(values)
+    with np.errstate(invalid='ignore'):
+        within = (values >= np.array(answer_key.low)) & (values <= np.array(answer_key.high))
+    numeric_awarded = np.where(within, marks, -negative)
+
+    attempted = np.where(numerical, numeric_attempted, choice_attempted)
+    is_correct = attempted & np.where(numerical, within, exact)
+    awarded = np.where(attempted, np.where(numerical, numeric_awarded, choice_awarded), 0.0)
+    return awarded, is_correct, attempted
+
+
+# =========================================================================
+# RESPONSE ENCODING
+# =========================================================================
+
+def parse_option_id(raw):
+    """Client option IDs arrive as int, numeric string, '', 'null' or None."""
+    if type(raw) is int:
+        return raw
+    if raw is None or str(raw).lower() == 'null' or str(raw) == '':
+        return None
+    return int(raw)
+
+
+def parse_option_ids(raw):
+    """A multiple-correct selection: list of option IDs, or a "12,15" string as stored."""
+    if raw is None or raw == '':
+        return []
+    if isinstance(raw, str):
+        raw = raw.split(',')
+    return sorted({option_id for option_id in map(parse_option_id, raw) if option_id is not None})
+
+
+def parse_number(raw):
+    """A numerical answer as float, or None when blank. Non-finite values are rejected."""
+    if raw is None or str(raw).strip() == '':
+        return None
+    value = float(raw)
+    if not math.isfinite(value):
+        raise ValueError(f"Numerical answer '{raw}' is not a finite number.")
+    return value
+
+
+def format_number(value):
+    """The stored form of a numerical answer: the shortest text that parses back to `value`."""
+    text = repr(value)
+    return text[:-2] if text.endswith('.0') else text
+
+
+def _option_mask(answer_key, index, option_ids):
+    mask = 0
+    for option_id in option_ids:
+        owner, bit = answer_key.option_bits.get(option_id, _NO_OPTION)
+        mask |= bit if owner == index else FOREIGN_BIT
+    return mask
+
+
+def encode_answer(answer_key, index, answer_data):
+    """
+    Encodes one payload answer for question `index`. Returns (chosen_mask, value,
+    selected_option_id, response), where the last two are the UserAnswer columns.
+    """
+    question_type = answer_key.types[index]
+    if question_type == NUMERICAL:
+        value = parse_number(answer_data.get('numerical_answer'))
+        return 0, value, None, '' if value is None else format_number(value)
+    if question_type == MULTI:
+        raw = answer_data.get('selected_option_ids')
+        if raw is None:
+            # Older clients send a single choice for every question
+            raw = [answer_data.get('selected_option_id')]
+        option_ids = parse_option_ids(raw)
+        return _option_mask(answer_key, index, option_ids), None, None, ','.join(map(str, option_ids))
+    selected_option_id = parse_option_id(answer_data.get('selected_option_id'))
+    chosen_mask = _option_mask(answer_key, index, [selected_option_id]) if selected_option_id is not None else 0
+    return chosen_mask, None, selected_option_id, ''
+
+
+def encode_stored(answer_key, rows, result_ids):
+    """
+    (chosen, values) arrays for grade_matrix() from stored UserAnswer columns
+    (test_result_id, question_id, selected_option_id, response); row i = result_ids[i].
+    """
+    import numpy as np
+
+    row_of = {result_id: i for i, result_id in enumerate(result_ids)}
+    chosen = np.zeros((len(result_ids), len(answer_key)), dtype=np.int64)
+    values = np.full((len(result_ids), len(answer_key)), np.nan)
+    for result_id, q_id, selected_option_id, response in rows:
+        index = answer_key.position.get(q_id)
+        row = row_of.get(result_id)
+        if index is None or row is None:
+            continue
+        question_type = answer_key.types[index]
+        if question_type == NUMERICAL:
+            value = parse_number(response)
+            values[row, index] = np.nan if value is None else value
+        else:
+            option_ids = parse_option_ids(response) if question_type == MULTI else \
+                [selected_option_id] if selected_option_id is not None else []
+            chosen[row, index] = _option_mask(answer_key, index, option_ids)
+    return chosen, values
+
+
+# =========================================================================
+# ORM EDGES: LOADING KEYS, REGRADING STORED ATTEMPTS
+# =========================================================================
+
+def load_answer_keys(test_ids):
+    """Returns {test_id: AnswerKey} for the given tests in three queries."""
+    answer_keys = {test_id: AnswerKey() for test_id in test_ids}
+    option_ids = defaultdict(list)
+    for q_id, option_id in Option.objects.filter(question__mock_test_id__in=answer_keys.keys()) \
+            .values_list('question_id', 'id'):
+        option_ids[q_id].append(option_id)
+    multi_correct = defaultdict(list)
+    for q_id, option_id in Question.correct_options.through.objects \
+            .filter(question__mock_test_id__in=answer_keys.keys()).values_list('question_id', 'option_id'):
+        multi_correct[q_id].append(option_id)
+
+    rows = Question.objects.filter(mock_test_id__in=answer_keys.keys()).order_by('pk').values_list(
+        'mock_test_id', 'id', 'question_type', 'correct_option_id', 'marks', 'negative_marks',
+        'partial_marks', 'answer_min', 'answer_max',
+    )
+    for test_id, q_id, question_type, correct_option_id, marks, negative, partial, answer_min, answer_max in rows:
+        correct = multi_correct[q_id] if question_type == MULTI else [correct_option_id]
+        answer_keys[test_id].add_question(
+            q_id, question_type, marks, negative, partial, option_ids=option_ids[q_id],
+            correct_option_ids=correct, answer_min=answer_min, answer_max=answer_max,
+        )
+    return answer_keys
+
+
+def load_answer_key(test_id):
+    return load_answer_keys([test_id])[test_id]
+
+
+def regrade(test_id, chunk_size=2000, dry_run=False):
+    """
+    Re-scores every stored attempt of a test against its current answer key (after a key
+    correction), chunk by chunk with grade_matrix(). Only rows whose outcome changed are
+    written. Returns (results changed, answers changed). Needs numpy.
+    """
+    import numpy as np
+
+    answer_key = load_answer_key(test_id)
+    result_ids = list(TestResult.objects.filter(mock_test_id=test_id).order_by('pk').values_list('pk', flat=True))
+    results_changed = answers_changed = 0
+    for start in range(0, len(result_ids), chunk_size):
+        chunk = result_ids[start:start + chunk_size]
+        rows = list(UserAnswer.objects.filter(test_result_id__in=chunk).values_list(
+            'pk', 'test_result_id', 'question_id', 'selected_option_id', 'response', 'is_correct', 'marks_awarded',
+        ))
+        chosen, values = encode_stored(answer_key, [row[1:5] for row in rows], chunk)
+        awarded, is_correct, attempted = grade_matrix(answer_key, chosen, values)
+
+        row_of = {result_id: i for i, result_id in enumerate(chunk)}
+        answer_updates = []
+        for pk, result_id, q_id, _, _, old_correct, old_awarded in rows:
+            index = answer_key.position.get(q_id)
+            if index is None:
+                continue
+            row = row_of[result_id]
+            new_correct, new_awarded = bool(is_correct[row, index]), float(awarded[row, index])
+            if new_correct != old_correct or abs(new_awarded - old_awarded) > 1e-9:
+                answer_updates.append(UserAnswer(pk=pk, is_correct=new_correct, marks_awarded=new_awarded))
+
+        scores = np.maximum(0.0, awarded.sum(axis=1))
+        correct = is_correct.sum(axis=1)
+        incorrect = (attempted & ~is_correct).sum(axis=1)
+        unattempted = len(answer_key) - attempted.sum(axis=1)
+        result_updates = []
+        for result in TestResult.objects.filter(pk__in=chunk).only(
+                'pk', 'score', 'max_marks', 'correct_answers', 'incorrect_answers', 'unattempted'):
+            row = row_of[result.pk]
+            new = (round(float(scores[row]), 2), round(answer_key.max_marks, 2), int(correct[row]),
+                   int(incorrect[row]), int(unattempted[row]))
+            old = (float(result.score), float(result.max_marks), result.correct_answers,
+                   result.incorrect_answers, result.unattempted)
+            if new != old:
+                result.score, result.max_marks, result.correct_answers, result.incorrect_answers, \
+                    result.unattempted = new
+                result_updates.append(result)
+
+        results_changed += len(result_updates)
+        answers_changed += len(answer_updates)
+        if not dry_run:
+            UserAnswer.objects.bulk_update(answer_updates, ['is_correct', 'marks_awarded'], batch_size=chunk_size)
+            TestResult.objects.bulk_update(
+                result_updates, ['score', 'max_marks', 'correct_answers', 'incorrect_answers', 'unattempted'],
+                batch_size=chunk_size,
+            )
+    return results_changed, answers_changed
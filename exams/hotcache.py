@@ -0,0 +1,267 @@
+# FILE: exams/hotcache.py
+
+"""
+Stampede-safe caching for hot keys: single flight, stale-while-revalidate, jittered expiry.
+
+With plain cache.get()/cache.set(), every request that finds a hot key missing or expired
+recomputes it at once; during a live mock that is hundreds of identical leaderboard sorts
+or question prefetches in the same second. get_or_compute() stores the value in an
+envelope with two lifetimes:
+
+- soft: until then the value is fresh and returned as is. After it (or, for entries
+  stored with a `version`, as soon as the caller's version differs) the value is stale:
+  the first caller to take the key's lock refreshes it, in a background thread by default,
+  and every caller, including that one, gets the stale value meanwhile.
+- hard: the cache timeout. Past it the key is missing; one caller computes it while the
+  others wait up to WAIT_SECONDS for its result before computing it themselves.
+
+The lock is a cache.add() on the shared cache, so it holds across threads and processes.
+Both lifetimes are shortened by a random fraction of up to EXAMS_CACHE_JITTER, so keys
+written together do not all expire together. compute() returning None means "do not
+cache". Per-process hit/stale/miss/wait/refresh/error counters are kept per key family
+(the key with numeric parts replaced by '*', or `name`) and reported by stats().
+"""
+
+import asyncio
+import contextvars
+import logging
+import random
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+JITTER = getattr(settings, 'EXAMS_CACHE_JITTER', 0.1)
+REFRESH_WORKERS = getattr(settings, 'EXAMS_CACHE_REFRESH_WORKERS', 2)
+# Longest a refresh may hold a key's lock (a crashed holder frees it after this)
+LOCK_SECONDS = 30
+# Longest a caller waits on a missing key for another caller's computation
+WAIT_SECONDS = 5
+
+EVENTS = ('hits', 'stale', 'misses', 'waits', 'refreshes', 'errors')
+
+_counts = {}  # key family -> {event: count}
+_counts_lock = threading.Lock()  # request threads and refresh threads both count
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_or_compute(key, compute, soft_seconds, hard_seconds=None, version=None, background=True, name=None):
+    """
+    The cached value of `key`, computing it with compute() when missing. Stale values are
+    refreshed by one caller only: in the background, or inline by that caller when
+    `background` is False (the others still get the stale value).
+    """
+    name = name or _family(key)
+    entry = cache.get(key)
+    if entry is not None and _fresh(entry, version):
+        _count(name, 'hits')
+        return entry['value']
+
+    if entry is not None:
+        _count(name, 'stale')
+        token = _acquire(key)
+        if token is None:
+            return entry['value']
+        if background:
+            _refresh_in_background(key, compute, soft_seconds, hard_seconds, version, token, name)
+            return entry['value']
+        try:
+            value = compute()
+        except Exception:
+            logger.exception("Refreshing %s failed; serving the stale value", key)
+            _count(name, 'errors')
+            return entry['value']
+        finally:
+            _release(key, token)
+        _count(name, 'refreshes')
+        if value is not None:
+            store(key, value, soft_seconds, hard_seconds, version)
+        return value
+
+    _count(name, 'misses')
+    token = _acquire(key)
+    if token is None:
+        entry = _wait(key)
+        if entry is not None:
+            _count(name, 'waits')
+            return entry['value']
+        # The holder failed or is too slow: compute without the lock rather than fail
+    try:
+        value = compute()
+        if value is not None:
+            store(key, value, soft_seconds, hard_seconds, version)
+    finally:
+        if token is not None:
+            _release(key, token)
+    return value
+
+
+async def aget_or_compute(key, compute, soft_seconds, hard_seconds=None, version=None, name=None):
+    """
+    get_or_compute() for async callers with an async compute(). Stale values are always
+    refreshed inline by the caller holding the lock.
+    """
+    name = name or _family(key)
+    entry = await cache.aget(key)
+    if entry is not None and _fresh(entry, version):
+        _count(name, 'hits')
+        return entry['value']
+
+    if entry is not None:
+        _count(name, 'stale')
+        token = await _aacquire(key)
+        if token is None:
+            return entry['value']
+        try:
+            value = await compute()
+        except Exception:
+            logger.exception("Refreshing %s failed; serving the stale value", key)
+            _count(name, 'errors')
+            return entry['value']
+        finally:
+            await _arelease(key, token)
+        _count(name, 'refreshes')
+        if value is not None:
+            await astore(key, value, soft_seconds, hard_seconds, version)
+        return value
+
+    _count(name, 'misses')
+    token = await _aacquire(key)
+    if token is None:
+        entry = await _await(key)
+        if entry is not None:
+            _count(name, 'waits')
+            return entry['value']
+    try:
+        value = await compute()
+        if value is not None:
+            await astore(key, value, soft_seconds, hard_seconds, version)
+    finally:
+        if token is not None:
+            await _arelease(key, token)
+    return value
+
+
+def store(key, value, soft_seconds, hard_seconds=None, version=None):
+    """Stores a value for get_or_compute() (e.g. from a warm-up job)."""
+    cache.set(key, *_envelope(value, soft_seconds, hard_seconds, version))
+
+
+async def astore(key, value, soft_seconds, hard_seconds=None, version=None):
+    await cache.aset(key, *_envelope(value, soft_seconds, hard_seconds, version))
+
+
+def stats():
+    """{key family: {event: count}} for this process."""
+    with _counts_lock:
+        return {name: dict(counts) for name, counts in _counts.items()}
+
+
+# =========================================================================
+# Internals
+# =========================================================================
+
+def _envelope(value, soft_seconds, hard_seconds, version):
+    soft = soft_seconds * (1 - random.random() * JITTER)
+    hard = (hard_seconds or 2 * soft_seconds) * (1 - random.random() * JITTER)
+    entry = {'value': value, 'fresh_until': time.time() + soft, 'version': version}
+    return entry, max(1, int(max(soft, hard)))
+
+
+def _fresh(entry, version):
+    return entry['fresh_until'] > time.time() and (version is None or entry['version'] == version)
+
+
+def _family(key):
+    # IDs are not part of the family: exams:live:12:board -> exams:live:*:board
+    return ':'.join('*' if part.isdigit() else part for part in key.split(':'))
+
+
+def _count(name, event):
+    with _counts_lock:
+        counts = _counts.get(name)
+        if counts is None:
+            counts = _counts[name] = dict.fromkeys(EVENTS, 0)
+        counts[event] += 1
+
+
+def _acquire(key):
+    token = secrets.token_hex(8)
+    return token if cache.add(f"{key}:lock", token, LOCK_SECONDS) else None
+
+
+async def _aacquire(key):
+    token = secrets.token_hex(8)
+    return token if await cache.aadd(f"{key}:lock", token, LOCK_SECONDS) else None
+
+
+def _release(key, token):
+    # Only our own lock: after LOCK_SECONDS another caller may hold it
+    if cache.get(f"{key}:lock") == token:
+        cache.delete(f"{key}:lock")
+
+
+async def _arelease(key, token):
+    if await cache.aget(f"{key}:lock") == token:
+        await cache.adelete(f"{key}:lock")
+
+
+def _wait(key):
+    """The entry another caller is computing, or None if it gives up or takes too long."""
+    deadline = time.monotonic() + WAIT_SECONDS
+    delay = 0.01
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(f"{key}:lock") is None:
+            return cache.get(key)
+        delay = min(delay * 2, 0.2)
+    return None
+
+
+async def _await(key):
+    deadline = time.monotonic() + WAIT_SECONDS
+    delay = 0.01
+    while time.monotonic() < deadline:
+        await asyncio.sleep(delay)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return entry
+        if await cache.aget(f"{key}:lock") is None:
+            return await cache.aget(key)
+        delay = min(delay * 2, 0.2)
+    return None
+
+
+def _refresh_in_background(key, compute, soft_seconds, hard_seconds, version, token, name):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='exams-hotcache')
+    # The caller's context carries its database routing (exams/replicas.py)
+    _executor.submit(contextvars.copy_context().run, _refresh, key, compute, soft_seconds, hard_seconds,
+                     version, token, name)
+
+
+def _refresh(key, compute, soft_seconds, hard_seconds, version, token, name):
+    try:
+        value = compute()
+        if value is not None:
+            store(key, value, soft_seconds, hard_seconds, version)
+        _count(name, 'refreshes')
+    except Exception:
+        logger.exception("Background refresh of %s failed", key)
+        _count(name, 'errors')
+    finally:
+        _release(key, token)
+        # Refresh threads outlive requests, so nothing else closes their connections
+        connections.close_all()
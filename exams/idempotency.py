@@ -0,0 +1,73 @@
+# FILE: exams/idempotency.py
+
+"""
+Idempotency keys for test submissions.
+
+A submission's key comes from its attempt session ("session:<id>") or, for clients without
+one, from an `Idempotency-Key` header / `idempotency_key` body field. The key is stored on
+TestResult under a (user, idempotency_key) unique constraint, which is the real guarantee
+under concurrent retries; the cache only makes the common "retry after success" case skip
+the database. A key is bound to the test it was first used for: reusing it for another test
+raises KeyReuseError instead of handing back that test's result.
+"""
+
+import hashlib
+
+from django.core.cache import cache
+
+from .models import TestResult
+
+MAX_KEY_LENGTH = 64
+CACHE_TIMEOUT_SECONDS = 60 * 60
+
+
+class KeyReuseError(ValueError):
+    """Raised when a key already recorded for one test is sent with a submission for another."""
+
+
+def key_for_session(session_id):
+    return f"session:{session_id}"
+
+
+def key_from_request(request, data):
+    """Returns the client-supplied key (header wins over body), or None if absent/invalid."""
+    key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    if not key:
+        return None
+    key = str(key).strip()
+    return key if 0 < len(key) <= MAX_KEY_LENGTH else None
+
+
+def lookup(user_id, key, mock_test_id, locking=False):
+    """
+    Returns the result ID already recorded for this user and key, or None. Raises
+    KeyReuseError if that result belongs to a test other than mock_test_id.
+    Pass locking=True after losing a unique-key race: a locking read sees the winner's
+    committed row even under MySQL's REPEATABLE READ snapshot.
+    """
+    if not key:
+        return None
+    recorded = None if locking else cache.get(_cache_key(user_id, key))
+    if recorded is None:
+        results = TestResult.objects.filter(user_id=user_id, idempotency_key=key)
+        if locking:
+            results = results.select_for_update()
+        recorded = results.values_list('pk', 'mock_test_id').first()
+        if recorded is None:
+            return None
+        remember(user_id, key, *recorded)
+    result_id, recorded_test_id = recorded
+    if recorded_test_id != mock_test_id:
+        raise KeyReuseError("Idempotency key was already used for another test.")
+    return result_id
+
+
+def remember(user_id, key, result_id, mock_test_id):
+    if key:
+        cache.set(_cache_key(user_id, key), (result_id, mock_test_id), CACHE_TIMEOUT_SECONDS)
+
+
+def _cache_key(user_id, key):
+    # Hashed so arbitrary client keys are always valid cache keys (e.g. for memcached); v2 entries
+    # hold (result_id, mock_test_id)
+    return f"exams:submit:v2:{user_id}:{hashlib.sha1(key.encode()).hexdigest()}"
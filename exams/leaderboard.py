@@ -0,0 +1,140 @@
+# FILE: exams/leaderboard.py
+
+"""
+Full leaderboards with keyset (seek) pagination.
+
+Rows are ordered by (score DESC, time_taken_seconds ASC, id ASC), which the
+`result_board_idx` index on TestResult serves directly. A page is fetched with a
+"strictly after this row" predicate instead of OFFSET, so every page is a bounded index
+range scan and page 10,000 costs the same as page 1. Ranks travel inside the cursor, so
+they never need a COUNT either; only "jump to my rank" counts the rows ahead of a result,
+and it does so once.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+from .models import TestResult
+
+PAGE_SIZE = 50
+
+ROW_FIELDS = ('id', 'user_id', 'user__username', 'score', 'time_taken_seconds')
+
+
+class Cursor:
+    """Position of a boundary row plus its rank, serialized as "score:time:id:rank"."""
+
+    def __init__(self, score, time_taken, result_id, rank):
+        self.score = Decimal(score)
+        self.time_taken = int(time_taken)
+        self.result_id = int(result_id)
+        self.rank = int(rank)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row['score'], row['time_taken_seconds'], row['id'], row['rank'])
+
+    @classmethod
+    def parse(cls, raw):
+        """Returns a Cursor, or None for a missing/malformed value."""
+        if not raw:
+            return None
+        try:
+            score, time_taken, result_id, rank = raw.split(':')
+            return cls(score, time_taken, result_id, rank)
+        except (ValueError, InvalidOperation):
+            return None
+
+    def __str__(self):
+        return f"{self.score}:{self.time_taken}:{self.result_id}:{self.rank}"
+
+
+def _ordered(test_id):
+    return TestResult.objects.filter(mock_test_id=test_id).order_by('-score', 'time_taken_seconds', 'id')
+
+
+def _after(cursor):
+    """Rows ranked strictly below the cursor row."""
+    return (
+        Q(score__lt=cursor.score)
+        | Q(score=cursor.score, time_taken_seconds__gt=cursor.time_taken)
+        | Q(score=cursor.score, time_taken_seconds=cursor.time_taken, id__gt=cursor.result_id)
+    )
+
+
+def _before(cursor):
+    """Rows ranked strictly above the cursor row."""
+    return (
+        Q(score__gt=cursor.score)
+        | Q(score=cursor.score, time_taken_seconds__lt=cursor.time_taken)
+        | Q(score=cursor.score, time_taken_seconds=cursor.time_taken, id__lt=cursor.result_id)
+    )
+
+
+def top(test_id, limit=10):
+    """The first `limit` rows with ranks, e.g. for the live WebSocket board."""
+    return _with_ranks(list(_ordered(test_id).values(*ROW_FIELDS)[:limit]), first_rank=1)
+
+
+def page(test_id, after=None, before=None, page_size=PAGE_SIZE):
+    """
+    Returns (rows, prev_cursor, next_cursor). Pass `after` to page forwards from a cursor,
+    `before` to page backwards, or neither for the first page.
+    """
+    if before is not None:
+        # Seek backwards in reverse index order, then flip back to display order
+        rows = list(
+            _ordered(test_id).filter(_before(before))
+            .order_by('score', '-time_taken_seconds', '-id')
+            .values(*ROW_FIELDS)[:page_size + 1]
+        )
+        has_more_before = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        _with_ranks(rows, first_rank=before.rank - len(rows))
+        prev_cursor = Cursor.from_row(rows[0]) if has_more_before and rows else None
+        next_cursor = Cursor.from_row(rows[-1]) if rows else None
+        return rows, prev_cursor, next_cursor
+
+    queryset = _ordered(test_id)
+    if after is not None:
+        queryset = queryset.filter(_after(after))
+    rows = list(queryset.values(*ROW_FIELDS)[:page_size + 1])
+    has_more_after = len(rows) > page_size
+    rows = rows[:page_size]
+    _with_ranks(rows, first_rank=after.rank + 1 if after is not None else 1)
+    prev_cursor = Cursor.from_row(rows[0]) if after is not None and rows and rows[0]['rank'] > 1 else None
+    next_cursor = Cursor.from_row(rows[-1]) if has_more_after else None
+    return rows, prev_cursor, next_cursor
+
+
+def rank_of(result):
+    """1-based rank of a result on its test's leaderboard (one index range count)."""
+    cursor = Cursor(result.score, result.time_taken_seconds, result.pk, 0)
+    return _ordered(result.mock_test_id).filter(_before(cursor)).count() + 1
+
+
+def page_around(result, page_size=PAGE_SIZE):
+    """The page that shows `result` roughly in the middle, for "jump to my rank"."""
+    rank = rank_of(result)
+    # The page starts `lead` rows above the result; its cursor is the row just before that
+    lead = min(page_size // 2, rank - 1)
+    if rank - lead <= 1:
+        return page(result.mock_test_id, page_size=page_size)
+    cursor = Cursor(result.score, result.time_taken_seconds, result.pk, rank)
+    above = list(
+        _ordered(result.mock_test_id).filter(_before(cursor))
+        .order_by('score', '-time_taken_seconds', '-id')
+        .values(*ROW_FIELDS)[lead:lead + 1]
+    )
+    start = above[0] if above else None
+    if start is None:
+        return page(result.mock_test_id, page_size=page_size)
+    start['rank'] = rank - lead - 1
+    return page(result.mock_test_id, after=Cursor.from_row(start), page_size=page_size)
+
+
+def _with_ranks(rows, first_rank):
+    for offset, row in enumerate(rows):
+        row['rank'] = first_rank + offset
+    return rows
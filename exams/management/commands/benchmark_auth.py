@@ -0,0 +1,62 @@
+# FILE: exams/management/commands/benchmark_auth.py
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from exams import auth
+
+_STOCK_MIDDLEWARE = 'django.contrib.auth.middleware.AuthenticationMiddleware'
+_CACHED_MIDDLEWARE = 'exams.auth.CachedAuthenticationMiddleware'
+
+class Command(BaseCommand):
+    help = (
+        'Counts database queries per logged-in request with the stock database sessions and '
+        'AuthenticationMiddleware, and with the cached session store and user fast path '
+        '(exams/sessions.py, exams/auth.py).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Paths requested in order, e.g. / /test/5/instructions/.')
+        parser.add_argument('--user', type=str, required=True, help='Username to log in as.')
+        parser.add_argument('--requests', type=int, default=20, help='Measured passes over the URLs per mode.')
+        parser.add_argument('--host', type=str, default='localhost', help='Host header (must be in ALLOWED_HOSTS).')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User '{options['user']}' not found.")
+
+        modes = [
+            ('stock', 'django.contrib.sessions.backends.db',
+             [_STOCK_MIDDLEWARE if name == _CACHED_MIDDLEWARE else name for name in settings.MIDDLEWARE]),
+            ('cached', 'exams.sessions',
+             [_CACHED_MIDDLEWARE if name == _STOCK_MIDDLEWARE else name for name in settings.MIDDLEWARE]),
+        ]
+        self.stdout.write(f"{'mode':>7} {'requests':>9} {'queries':>8} {'per request':>12} {'errors':>7}")
+        per_request = {}
+        for mode, engine, middleware in modes:
+            with override_settings(SESSION_ENGINE=engine, MIDDLEWARE=middleware):
+                client = Client(HTTP_HOST=options['host'])
+                client.force_login(user)
+                # One unmeasured pass fills the session and user caches, as in a running worker
+                errors = sum(client.get(url).status_code >= 400 for url in options['urls'])
+                with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as captured:
+                    for _ in range(options['requests']):
+                        errors += sum(client.get(url).status_code >= 400 for url in options['urls'])
+            requests = options['requests'] * len(options['urls'])
+            per_request[mode] = len(captured) / requests
+            self.stdout.write(f"{mode:>7} {requests:>9} {len(captured):>8} {per_request[mode]:>12.2f} {errors:>7}")
+
+        self.stdout.write(f"Queries saved per request: {per_request['stock'] - per_request['cached']:.2f}")
+        process = auth.stats()
+        self.stdout.write(
+            f"This process: {process['requests']} requests, {process['queries_saved']} queries saved "
+            f"({process['queries_saved_per_request']:.2f} per request; user {process['saved']['user']}, "
+            f"session loads {process['saved']['session_load']}, session saves {process['saved']['session_save']})."
+        )
+        self.stdout.write(self.style.SUCCESS('--- Benchmark complete ---'))
@@ -0,0 +1,107 @@
+# FILE: exams/management/commands/benchmark_grading.py
+
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import grading
+
+class Command(BaseCommand):
+    help = (
+        'Microbenchmarks the grading core on a synthetic answer key (no database): one attempt, '
+        'a batch in pure Python, and the same batch with grade_matrix(). Also checks that the '
+        'two agree.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=90, help='Questions per test (mixed types).')
+        parser.add_argument('--attempts', type=int, default=5000, help='Attempts in the batch.')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported).')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        answer_key, option_ids = _synthetic_key(rng, options['questions'])
+        attempts = [_synthetic_attempt(rng, answer_key, option_ids) for _ in range(options['attempts'])]
+        repeat = options['repeat']
+
+        single = _best(repeat, lambda: [grading.grade(answer_key, attempts[0]) for _ in range(1000)]) / 1000
+        batch = _best(repeat, lambda: grading.grade_batch(answer_key, attempts))
+        self.stdout.write(f"grade(), one attempt:          {single * 1e6:10.1f} us")
+        self.stdout.write(f"grade_batch(), {len(attempts)} attempts: {batch * 1e3:10.1f} ms "
+                          f"({batch / len(attempts) * 1e6:.1f} us/attempt)")
+
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            self.stdout.write("numpy not installed: grade_matrix() skipped.")
+            return
+        stored, result_ids = _as_stored(answer_key, attempts)
+        encode = _best(repeat, lambda: grading.encode_stored(answer_key, stored, result_ids))
+        chosen, values = grading.encode_stored(answer_key, stored, result_ids)
+        matrix = _best(repeat, lambda: grading.grade_matrix(answer_key, chosen, values))
+        self.stdout.write(f"encode_stored():               {encode * 1e3:10.1f} ms")
+        self.stdout.write(f"grade_matrix():                {matrix * 1e3:10.1f} ms "
+                          f"({matrix / len(attempts) * 1e6:.2f} us/attempt)")
+
+        awarded, is_correct, attempted = grading.grade_matrix(answer_key, chosen, values)
+        for row, graded in enumerate(grading.grade_batch(answer_key, attempts)):
+            if abs(max(0.0, awarded[row].sum()) - graded.score) > 1e-6 or int(is_correct[row].sum()) != graded.correct:
+                raise CommandError(f"grade_matrix() disagrees with grade() on attempt {row}.")
+        self.stdout.write(self.style.SUCCESS('--- Benchmark complete (both paths agree) ---'))
+
+
+def _best(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def _synthetic_key(rng, questions):
+    """A key with JEE-like types: 60% single, 20% multiple correct, 20% numerical."""
+    answer_key, option_ids, next_option = grading.AnswerKey(), {}, 1
+    for q_id in range(1, questions + 1):
+        roll = rng.random()
+        if roll < 0.2:
+            low = round(rng.uniform(0, 100), 2)
+            answer_key.add_question(q_id, grading.NUMERICAL, 4, 0, answer_min=low, answer_max=low + 0.05)
+            continue
+        ids = list(range(next_option, next_option + 4))
+        next_option += 4
+        option_ids[q_id] = ids
+        if roll < 0.4:
+            answer_key.add_question(q_id, grading.MULTI, 4, 2, 1, option_ids=ids,
+                                    correct_option_ids=rng.sample(ids, rng.randint(1, 3)))
+        else:
+            answer_key.add_question(q_id, grading.SINGLE, 4, 1, option_ids=ids, correct_option_ids=[rng.choice(ids)])
+    return answer_key, option_ids
+
+
+def _synthetic_attempt(rng, answer_key, option_ids):
+    answers = []
+    for q_id, index in answer_key.position.items():
+        if rng.random() < 0.2:
+            continue
+        answer = {'question_id': q_id, 'time_spent': rng.randint(5, 120)}
+        question_type = answer_key.types[index]
+        if question_type == grading.NUMERICAL:
+            answer['numerical_answer'] = str(round(answer_key.low[index] + rng.choice([0, 0.02, 1]), 2))
+        elif question_type == grading.MULTI:
+            answer['selected_option_ids'] = rng.sample(option_ids[q_id], rng.randint(1, 3))
+        else:
+            answer['selected_option_id'] = rng.choice(option_ids[q_id])
+        answers.append(answer)
+    return answers
+
+
+def _as_stored(answer_key, attempts):
+    """The batch as UserAnswer columns (result_id, question_id, selected_option_id, response)."""
+    rows = []
+    for result_id, answers in enumerate(attempts, 1):
+        for answer in grading.grade(answer_key, answers).answers:
+            rows.append((result_id, answer.question_id, answer.selected_option_id, answer.response))
+    return rows, list(range(1, len(attempts) + 1))
@@ -0,0 +1,109 @@
+# FILE: exams/management/commands/benchmark_startup.py
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+# Runs in a fresh interpreter per measurement: builds the WSGI application as a worker
+# would, optionally runs exams.startup.warm_worker(), then requests each URL twice.
+# argv: mode (cold|warm), host, cookie, url...
+_WORKER = r'''
+import time
+started = time.perf_counter()
+started_wall = time.time()
+import io, json, sys
+from django.core.wsgi import get_wsgi_application
+
+application = get_wsgi_application()
+ready = time.perf_counter()
+if sys.argv[1] == 'warm':
+    from exams import startup
+    startup.warm_worker(force=True)
+warmed = time.perf_counter()
+
+def get(url):
+    path, _, query = url.partition('?')
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': sys.argv[2], 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': sys.argv[2], 'HTTP_COOKIE': sys.argv[3], 'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': False, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+    }
+    status = []
+    request_started = time.perf_counter()
+    response = application(environ, lambda line, headers, exc_info=None: status.append(line))
+    for _ in response:
+        pass
+    response.close()
+    return (time.perf_counter() - request_started) * 1000, int(status[0].split()[0])
+
+first = [get(url) for url in sys.argv[4:]]
+second = [get(url) for url in sys.argv[4:]]
+print(json.dumps({
+    'started_wall': started_wall, 'boot_ms': (ready - started) * 1000, 'warm_ms': (warmed - ready) * 1000,
+    'first_ms': first[0][0], 'first_all_ms': sum(ms for ms, _ in first), 'steady_ms': sum(ms for ms, _ in second),
+    'errors': sum(status != 200 for _, status in first + second),
+}))
+'''
+
+class Command(BaseCommand):
+    help = (
+        'Measures time to first request of a fresh worker process, with and without the '
+        'exams.startup warm-up hook (one new interpreter per run).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Paths requested in order, e.g. / /test/5/instructions/.')
+        parser.add_argument('--runs', type=int, default=5, help='Worker processes started per mode.')
+        parser.add_argument('--user', type=str, help='Username to log in as (for login_required pages).')
+        parser.add_argument('--host', type=str, default='localhost', help='Host header (must be in ALLOWED_HOSTS).')
+
+    def handle(self, *args, **options):
+        cookie = ''
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User '{options['user']}' not found.")
+            client = Client()
+            client.force_login(user)
+            cookie = '; '.join(f"{name}={morsel.value}" for name, morsel in client.cookies.items())
+
+        env = os.environ.copy()
+        env['DJANGO_SETTINGS_MODULE'] = settings.SETTINGS_MODULE
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), env.get('PYTHONPATH')]))
+
+        self.stdout.write("Milliseconds, median of runs. 'first' is the first request a new worker serves; "
+                          "'to first' runs from process launch to its response.")
+        self.stdout.write(f"{'mode':>5} {'launch':>7} {'boot':>7} {'warm':>7} {'first':>7} {'to first':>9} "
+                          f"{'all urls':>9} {'steady':>7} {'errors':>7}")
+        for mode in ('cold', 'warm'):
+            runs = []
+            for _ in range(options['runs']):
+                launched = time.time()
+                completed = subprocess.run([sys.executable, '-c', _WORKER, mode, options['host'], cookie, *options['urls']],
+                                           env=env, capture_output=True, text=True)
+                if completed.returncode != 0:
+                    raise CommandError(f"Worker failed:\n{completed.stderr[-2000:]}")
+                run = json.loads(completed.stdout.strip().splitlines()[-1])
+                run['launch_ms'] = (run['started_wall'] - launched) * 1000
+                run['to_first_ms'] = run['launch_ms'] + run['boot_ms'] + run['warm_ms'] + run['first_ms']
+                runs.append(run)
+
+            def median(field):
+                return statistics.median(run[field] for run in runs)
+            self.stdout.write(
+                f"{mode:>5} {median('launch_ms'):>7.0f} {median('boot_ms'):>7.0f} {median('warm_ms'):>7.0f} "
+                f"{median('first_ms'):>7.1f} {median('to_first_ms'):>9.0f} {median('first_all_ms'):>9.1f} "
+                f"{median('steady_ms'):>7.1f} {sum(run['errors'] for run in runs):>7}"
+            )
+        self.stdout.write(self.style.SUCCESS('--- Benchmark complete ---'))
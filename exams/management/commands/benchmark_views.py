@@ -0,0 +1,126 @@
+# FILE: exams/management/commands/benchmark_views.py
+
+import asyncio
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+class Command(BaseCommand):
+    help = (
+        'Measures how many concurrent requests one ASGI worker sustains on the given URLs, '
+        'driving the ASGI application in-process. --db-latency-ms adds a delay to every query '
+        '(and one to every new connection) to approximate a networked MySQL server.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Paths to request, e.g. /test/results/5/ (cycled).')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, action='append', help='In-flight requests (repeatable; default 1, 10, 50).')
+        parser.add_argument('--user', type=str, help='Username to log in as (for login_required pages).')
+        parser.add_argument('--db-latency-ms', type=float, default=0.0)
+        parser.add_argument('--host', type=str, default='localhost', help='Host header (must be in ALLOWED_HOSTS).')
+
+    def handle(self, *args, **options):
+        cookie = b''
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User '{options['user']}' not found.")
+            client = Client()
+            client.force_login(user)
+            cookie = '; '.join(f"{name}={morsel.value}" for name, morsel in client.cookies.items()).encode()
+
+        latency = options['db_latency_ms'] / 1000.0
+        connects = [0]
+
+        def count_connect(sender, connection, **kwargs):
+            connects[0] += 1
+            # At least one round trip for the handshake (TLS and auth add more)
+            time.sleep(latency)
+        connection_created.connect(count_connect, weak=False, dispatch_uid='benchmark_views_connects')
+        if latency:
+            def delay(execute, sql, params, many, context):
+                time.sleep(latency)
+                return execute(sql, params, many, context)
+
+            def install(sender, connection, **kwargs):
+                # Fired on every reconnect of the same wrapper object; add the delay once
+                if delay not in connection.execute_wrappers:
+                    connection.execute_wrappers.append(delay)
+            connection_created.connect(install, weak=False, dispatch_uid='benchmark_views_latency')
+
+        app = get_asgi_application()
+        self.stdout.write(
+            f"{'concurrency':>11} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'threads':>8} {'connects':>8} {'errors':>7}"
+        )
+        for concurrency in options['concurrency'] or [1, 10, 50]:
+            connects[0] = 0
+            stats = asyncio.run(_run(app, options['urls'], options['requests'], concurrency, cookie, options['host']))
+            self.stdout.write(
+                f"{concurrency:>11} {stats['throughput']:>9.1f} {stats['p50']:>8.1f} {stats['p95']:>8.1f} "
+                f"{stats['peak_threads']:>8} {connects[0]:>8} {stats['errors']:>7}"
+            )
+        self.stdout.write(self.style.SUCCESS('--- Benchmark complete ---'))
+
+
+async def _run(app, urls, total, concurrency, cookie, host):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors, peak_threads = [], [0], [threading.active_count()]
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            status = await _request(app, urls[i % len(urls)], cookie, host)
+            latencies.append((time.perf_counter() - started) * 1000)
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+            if status != 200:
+                errors[0] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'throughput': total / elapsed,
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+        'peak_threads': peak_threads[0],
+        'errors': errors[0],
+    }
+
+
+async def _request(app, url, cookie, host):
+    """One GET through the ASGI callable; returns the status code."""
+    parts = urlsplit(url)
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': parts.path, 'raw_path': parts.path.encode(),
+        'query_string': parts.query.encode(), 'root_path': '',
+        'headers': [(b'host', host.encode()), (b'cookie', cookie)],
+        'client': ('127.0.0.1', 0), 'server': (host, 80),
+    }
+    body_sent = False
+    status = [None]
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client never disconnects early; the handler cancels this wait when it is done
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status[0] = message['status']
+
+    await app(scope, receive, send)
+    return status[0]
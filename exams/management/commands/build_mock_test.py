@@ -0,0 +1,45 @@
+# FILE: exams/management/commands/build_mock_test.py
+
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import assembly
+from exams.models import ExamCategory
+
+class Command(BaseCommand):
+    help = 'Assembles a new mock test from the question pool, e.g. --quotas "25 Physics/Medium, 10 Chemistry/Hard".'
+
+    def add_arguments(self, parser):
+        parser.add_argument('title', type=str, help='Title of the new test.')
+        parser.add_argument('--category', required=True, help='ExamCategory slug (also defines the cohort to avoid repeats for).')
+        parser.add_argument('--quotas', help='Comma-separated "<count> <Subject>/<Difficulty>" sections.')
+        parser.add_argument('--like', type=int, help='Copy the subject/difficulty mix of this MockTest ID instead of --quotas.')
+        parser.add_argument('--time-minutes', type=int, default=60)
+        parser.add_argument('--avoid-recent-days', type=int, default=assembly.DEFAULT_RECENT_DAYS,
+                            help='Skip questions from tests the category attempted in this many days (0 = allow repeats).')
+        parser.add_argument('--seed', type=int, help='Random seed, for a reproducible paper.')
+
+    def handle(self, *args, **options):
+        try:
+            category = ExamCategory.objects.get(slug=options['category'])
+        except ExamCategory.DoesNotExist:
+            raise CommandError(f"Category with slug '{options['category']}' not found.")
+        if bool(options['quotas']) == bool(options['like']):
+            raise CommandError('Pass exactly one of --quotas or --like.')
+
+        try:
+            quotas = assembly.parse_quotas(options['quotas']) if options['quotas'] else assembly.quotas_like(options['like'])
+            rng = random.Random(options['seed'])
+            mock_test = assembly.build_mock_test(
+                options['title'], category, quotas, options['time_minutes'],
+                avoid_recent_days=options['avoid_recent_days'], rng=rng,
+            )
+        except assembly.AssemblyError as e:
+            raise CommandError(str(e))
+
+        for quota in quotas:
+            self.stdout.write(f"  {quota}")
+        self.stdout.write(self.style.SUCCESS(
+            f"--- Created test #{mock_test.pk} '{mock_test.title}' with {mock_test.question_count} questions ---"
+        ))
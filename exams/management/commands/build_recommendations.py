@@ -0,0 +1,24 @@
+# FILE: exams/management/commands/build_recommendations.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from exams import recommendations, replicas
+
+class Command(BaseCommand):
+    help = 'Recomputes weak-area test recommendations for every user (nightly batch; needs numpy).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild-performance', action='store_true', help='Recompute the per-user performance cells from all answers first.')
+        parser.add_argument('--chunk-size', type=int, default=recommendations.USER_CHUNK_SIZE, help='Users scored per matrix block.')
+
+    def handle(self, *args, **options):
+        if options['rebuild_performance']:
+            with transaction.atomic():
+                cells = recommendations.rebuild_performance()
+            self.stdout.write(f"Rebuilt {cells} performance cells.")
+        # The scoring reads are the heavy part; they may use a replica
+        with replicas.using_replica():
+            users = recommendations.build_all(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Scored {users} users.")
+        self.stdout.write(self.style.SUCCESS('--- Recommendations built ---'))
@@ -0,0 +1,26 @@
+# FILE: exams/management/commands/dispatch_outbox.py
+
+import time
+from django.core.management.base import BaseCommand
+
+from exams import outbox
+
+class Command(BaseCommand):
+    help = 'Drains pending outbox events (leaderboard broadcasts, stat rollups) in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.DEFAULT_BATCH_SIZE, help='Events claimed per batch.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once the outbox is empty.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep between polls in --loop mode.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            dispatched = outbox.dispatch_pending(batch_size=batch_size)
+            if dispatched:
+                self.stdout.write(f"Dispatched {dispatched} event(s).")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('--- Outbox drained ---'))
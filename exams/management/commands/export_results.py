@@ -0,0 +1,50 @@
+# FILE: exams/management/commands/export_results.py
+
+import sys
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import exports, replicas
+
+class Command(BaseCommand):
+    help = 'Streams test results with per-question answers to a CSV or JSON lines file (or stdout).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, action='append', dest='test_ids', help='MockTest ID (repeatable).')
+        parser.add_argument('--category', type=str, help='ExamCategory slug.')
+        parser.add_argument('--since', type=str, help='Only attempts submitted on/after this ISO date or datetime.')
+        parser.add_argument('--until', type=str, help='Only attempts submitted before this ISO date or datetime.')
+        parser.add_argument('--format', choices=exports.FORMATS, default='csv')
+        parser.add_argument('--layout', choices=exports.LAYOUTS, default='long')
+        parser.add_argument('--gzip', action='store_true', help='Gzip-compress the output.')
+        parser.add_argument('--output', type=str, help='Output file path (default: stdout).')
+
+    def handle(self, *args, **options):
+        test_ids = options['test_ids'] or []
+        try:
+            # Analyst exports read from a replica when one is configured (bound in stream_export)
+            with replicas.using_replica():
+                queryset = exports.filter_results(
+                    test_ids=test_ids, category_slug=options['category'],
+                    since=options['since'], until=options['until'],
+                )
+                stream = exports.stream_export(
+                    queryset, fmt=options['format'], layout=options['layout'],
+                    test_id=test_ids[0] if len(test_ids) == 1 else None, compress=options['gzip'],
+                )
+        except exports.ExportError as e:
+            raise CommandError(str(e))
+
+        mode = 'wb' if options['gzip'] else 'w'
+        if options['output']:
+            out = open(options['output'], mode, **({} if options['gzip'] else {'encoding': 'utf-8', 'newline': ''}))
+        else:
+            out = sys.stdout.buffer if options['gzip'] else sys.stdout
+        try:
+            for chunk in stream:
+                out.write(chunk)
+        finally:
+            if options['output']:
+                out.close()
+
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f"--- Export written to {options['output']} ---"))
@@ -0,0 +1,29 @@
+# FILE: exams/management/commands/export_test_package.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import packages
+from exams.models import MockTest
+
+class Command(BaseCommand):
+    help = 'Writes mock tests (questions, options, answer keys) to a binary test package.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help='Package file to write, e.g. ssc_cgl.expk')
+        parser.add_argument('--test', type=int, action='append', dest='test_ids', help='MockTest ID (repeatable).')
+        parser.add_argument('--category', type=str, help='Export every test of this ExamCategory slug.')
+
+    def handle(self, *args, **options):
+        test_ids = list(options['test_ids'] or [])
+        if options['category']:
+            test_ids += MockTest.objects.filter(category__slug=options['category']).values_list('pk', flat=True)
+        if not test_ids:
+            raise CommandError('Pass --test and/or --category.')
+        try:
+            manifest = packages.write_package(options['output'], test_ids)
+        except packages.PackageError as e:
+            raise CommandError(str(e))
+        counts = manifest['counts']
+        self.stdout.write(self.style.SUCCESS(
+            f"--- Wrote {counts['tests']} tests, {counts['questions']} questions to {options['output']} ---"
+        ))
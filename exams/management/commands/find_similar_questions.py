@@ -0,0 +1,40 @@
+# FILE: exams/management/commands/find_similar_questions.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import similarity
+from exams.models import Question
+
+class Command(BaseCommand):
+    help = (
+        'Lists near-duplicate questions from the MinHash/LSH index: of the given question IDs, '
+        'or every pair in the bank. --rebuild re-indexes all questions first (needs numpy).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_ids', nargs='*', type=int)
+        parser.add_argument('--threshold', type=float, default=similarity.THRESHOLD, help='Minimum estimated similarity (0-1).')
+        parser.add_argument('--rebuild', action='store_true', help='Re-index every question before searching.')
+
+    def handle(self, *args, **options):
+        if not 0 < options['threshold'] <= 1:
+            raise CommandError("--threshold must be between 0 and 1.")
+        if options['rebuild']:
+            indexed = similarity.rebuild()
+            self.stdout.write(f"Indexed {indexed} questions.")
+
+        if options['question_ids']:
+            missing = set(options['question_ids']) - set(Question.objects.filter(pk__in=options['question_ids']).values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"Questions not found: {sorted(missing)}")
+            matches = [match for question_id in options['question_ids']
+                       for match in similarity.find_similar(question_id, options['threshold'])]
+        else:
+            matches = similarity.all_pairs(options['threshold'])
+
+        found = 0
+        for match in matches:
+            found += 1
+            self.stdout.write(f"{match.question_id}\t{match.similar_id}\t{match.score:.2f}")
+        self.stdout.write(f"{found} near-duplicate pair(s) at similarity >= {options['threshold']:.2f}.")
+        self.stdout.write(self.style.SUCCESS('--- Similarity search complete ---'))
@@ -0,0 +1,15 @@
+# FILE: exams/management/commands/flush_counters.py
+
+from django.core.management.base import BaseCommand
+
+from exams import counters, outbox
+
+class Command(BaseCommand):
+    help = 'Drains pending submissions into the attempt counters, flushes them and re-derives is_popular.'
+
+    def handle(self, *args, **options):
+        # Counters are buffered per process, so drain the outbox here to pick up any
+        # submissions whose events were never handled by a web worker.
+        outbox.dispatch_pending()
+        updated = counters.flush()
+        self.stdout.write(self.style.SUCCESS(f"Flushed attempt counters for {updated} test(s)."))
@@ -0,0 +1,43 @@
+# FILE: exams/management/commands/import_attempts.py
+
+import json
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import sync
+
+class Command(BaseCommand):
+    help = 'Grades and imports a batch of offline test attempts from a JSON lines or CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('batch_file_path', type=str, help='Path to the .jsonl or .csv batch file.')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Batch format (default: from the file extension).')
+        parser.add_argument('--report', type=str, help='Optional path to write the per-attempt outcomes as JSON.')
+
+    def handle(self, *args, **options):
+        file_path = options['batch_file_path']
+        fmt = options['format'] or ('csv' if file_path.lower().endswith('.csv') else 'jsonl')
+        self.stdout.write(self.style.SUCCESS(f"Starting attempt import from {file_path} ({fmt})..."))
+
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                batch = sync.parse_batch(file.read(), fmt)
+        except FileNotFoundError:
+            raise CommandError(f'File not found at: {file_path}')
+        except sync.BatchFormatError as e:
+            raise CommandError(str(e))
+
+        outcomes = sync.submit_batch(batch)
+
+        counts = {'created': 0, 'duplicate': 0, 'error': 0}
+        for outcome in outcomes:
+            counts[outcome['status']] += 1
+            if outcome['status'] == 'error':
+                self.stderr.write(self.style.ERROR(f"Attempt {outcome['ref']}: {outcome['message']}"))
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as report:
+                json.dump(outcomes, report, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"--- Import complete: {counts['created']} created, {counts['duplicate']} duplicate(s), {counts['error']} error(s) ---"
+        ))
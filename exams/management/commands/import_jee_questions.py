@@ -4,6 +4,7 @@ import csv
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
+from exams import similarity
 from exams.models import MockTest, Subject, Question, Option, ExamCategory 
 
 # Define the maximum allowed questions per file
@@ -46,6 +47,7 @@ class Command(BaseCommand):
                 total_questions = 0
                 total_marks = 0
                 
+                imported_ids = []
                 for row_num, row in enumerate(reader, 1):
                     # Use a master try-except for skipping rows gracefully
                     try:
@@ -112,6 +114,7 @@ class Command(BaseCommand):
                         correct_option_instance = created_options[correct_option_index]
                         question.correct_option = correct_option_instance
                         question.save()
+                        imported_ids.append(question.id)
 
                         total_questions += 1
                         total_marks += marks 
@@ -124,6 +127,12 @@ class Command(BaseCommand):
                         self.stderr.write(self.style.ERROR(f"Row {row_num}: Skipping due to data error or conversion failure: {error_detail}."))
                         continue
                 
+                # Index the new questions and flag near-copies of questions already in the bank
+                for match in similarity.check_new_questions(imported_ids):
+                    self.stdout.write(self.style.WARNING(
+                        f"Question {match.question_id} looks like a near-duplicate of question {match.similar_id} ({match.score:.0%} similar)."
+                    ))
+
                 # 8. Final Update to MockTest counts
                 mock_test.question_count = total_questions
                 mock_test.max_marks = int(total_marks)
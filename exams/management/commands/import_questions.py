@@ -5,6 +5,7 @@ from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
 # Import all necessary models
+from exams import similarity
 from exams.models import ExamCategory, MockTest, Subject, Question, Option 
 from django.core.exceptions import ObjectDoesNotExist
 
@@ -33,6 +34,7 @@ class Command(BaseCommand):
                 # Lists to hold newly created options and questions for setting Foreign Keys later
                 questions_to_update = []
                 
+                imported_ids = []
                 for row_num, row in enumerate(reader, 1):
                     try:
                         # 2. Parse required fields
@@ -83,6 +85,7 @@ class Command(BaseCommand):
                         correct_option_instance = created_options[correct_option_index]
                         question.correct_option = correct_option_instance
                         question.save() # Save the question with the correct foreign key
+                        imported_ids.append(question.id)
 
                         self.stdout.write(f"Row {row_num}: Successfully imported question for '{mock_test_title}'.")
 
@@ -90,6 +93,12 @@ class Command(BaseCommand):
                         self.stderr.write(self.style.ERROR(f"Row {row_num}: Skipping due to data error: {e}."))
                         continue
                 
+                # Index the new questions and flag near-copies of questions already in the bank
+                for match in similarity.check_new_questions(imported_ids):
+                    self.stdout.write(self.style.WARNING(
+                        f"Question {match.question_id} looks like a near-duplicate of question {match.similar_id} ({match.score:.0%} similar)."
+                    ))
+
                 # NOTE: You may want to add logic here to update the final question_count/max_marks on the MockTest object(s)
 
         except FileNotFoundError:
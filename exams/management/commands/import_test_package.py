@@ -0,0 +1,34 @@
+# FILE: exams/management/commands/import_test_package.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import packages
+
+class Command(BaseCommand):
+    help = 'Validates and bulk-loads a binary test package written by export_test_package.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('package', type=str, help='Path to the package file.')
+        parser.add_argument('--validate-only', action='store_true', help='Check checksums and structure without importing.')
+
+    def handle(self, *args, **options):
+        try:
+            if options['validate_only']:
+                with packages.PackageReader(options['package']) as reader:
+                    counts = reader.validate()
+                self.stdout.write(self.style.SUCCESS(
+                    f"--- Package OK: {counts['tests']} tests, {counts['questions']} questions, {counts['options']} options ---"
+                ))
+                return
+            outcomes = packages.import_package(options['package'])
+        except FileNotFoundError:
+            raise CommandError(f"File not found at '{options['package']}'")
+        except packages.PackageError as e:
+            raise CommandError(str(e))
+
+        for title, status in outcomes:
+            if status == 'created':
+                self.stdout.write(self.style.SUCCESS(f"Created test '{title}'"))
+            else:
+                self.stdout.write(f"Skipped '{title}': a test with this title already exists in its category")
+        self.stdout.write(self.style.SUCCESS('--- Package import complete ---'))
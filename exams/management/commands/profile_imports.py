@@ -0,0 +1,65 @@
+# FILE: exams/management/commands/profile_imports.py
+
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a worker imports before serving: settings, apps, the WSGI handler and the URLconf
+# (which imports every view module and the admin)
+_WORKER_IMPORTS = (
+    "from django.core.wsgi import get_wsgi_application; get_wsgi_application(); "
+    "from django.urls import get_resolver; get_resolver().reverse_dict"
+)
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| \s*(\S+)$')
+
+class Command(BaseCommand):
+    help = (
+        "Reports module import costs of a worker's start-up, from `python -X importtime` in a "
+        "fresh interpreter that builds the WSGI application and loads the URLconf."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Rows per table.')
+        parser.add_argument('--prefix', action='append', help="Only list modules under this package, e.g. 'exams' (repeatable).")
+        parser.add_argument('--sort', choices=['self', 'cumulative'], default='cumulative')
+
+    def handle(self, *args, **options):
+        env = os.environ.copy()
+        env['DJANGO_SETTINGS_MODULE'] = settings.SETTINGS_MODULE
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), env.get('PYTHONPATH')]))
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', _WORKER_IMPORTS],
+                                   env=env, capture_output=True, text=True)
+        wall_ms = (time.perf_counter() - started) * 1000
+        modules = []  # (name, self µs, cumulative µs)
+        for line in completed.stderr.splitlines():
+            match = _LINE.match(line)
+            if match:
+                modules.append((match.group(3), int(match.group(1)), int(match.group(2))))
+        if completed.returncode != 0 or not modules:
+            raise CommandError(f"Start-up failed:\n{completed.stderr[-2000:]}")
+
+        total_ms = sum(module[1] for module in modules) / 1000
+        self.stdout.write(f"{len(modules)} modules imported in {total_ms:.0f} ms "
+                          f"(process wall time {wall_ms:.0f} ms, including interpreter start).")
+
+        by_package = defaultdict(int)
+        for name, self_us, _ in modules:
+            by_package[name.split('.')[0]] += self_us
+        self.stdout.write(f"\n{'package':<40} {'ms':>8} {'share':>6}")
+        for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"{package:<40} {self_us / 1000:>8.1f} {self_us / 10 / total_ms:>5.1f}%")
+
+        listed = [module for module in modules
+                  if not options['prefix'] or any(module[0] == p or module[0].startswith(p + '.') for p in options['prefix'])]
+        column = 1 if options['sort'] == 'self' else 2
+        self.stdout.write(f"\n{'module':<50} {'self ms':>8} {'cum ms':>8}")
+        for name, self_us, cumulative_us in sorted(listed, key=lambda module: -module[column])[:options['top']]:
+            self.stdout.write(f"{name:<50} {self_us / 1000:>8.1f} {cumulative_us / 1000:>8.1f}")
+        self.stdout.write(self.style.SUCCESS('--- Import profile complete ---'))
@@ -0,0 +1,22 @@
+# FILE: exams/management/commands/rebuild_cohort_stats.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from exams import cohort
+from exams.models import MockTest
+
+class Command(BaseCommand):
+    help = 'Recomputes per-subject cohort statistics from existing results (backfill or repair).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, action='append', dest='test_ids', help='MockTest ID (repeatable, default: all tests).')
+
+    def handle(self, *args, **options):
+        test_ids = options['test_ids'] or list(MockTest.objects.order_by('pk').values_list('pk', flat=True))
+        for test_id in test_ids:
+            # One transaction per test: new submissions for other tests keep flowing
+            with transaction.atomic():
+                cohort.rebuild(test_id)
+            self.stdout.write(f"Rebuilt cohort stats for test {test_id}.")
+        self.stdout.write(self.style.SUCCESS('--- Cohort stats rebuilt ---'))
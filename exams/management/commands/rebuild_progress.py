@@ -0,0 +1,18 @@
+# FILE: exams/management/commands/rebuild_progress.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from exams import progress
+
+class Command(BaseCommand):
+    help = 'Recomputes every user\'s score progression series from existing results (backfill or repair).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=progress.REBUILD_CHUNK_SIZE, help='Results per batch.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            applied = progress.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Rebuilt progress series from {applied} results.")
+        self.stdout.write(self.style.SUCCESS('--- Progress series rebuilt ---'))
@@ -0,0 +1,40 @@
+# FILE: exams/management/commands/regrade_results.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from exams import cohort, comparison, grading, progress, warmup
+from exams.models import MockTest
+
+class Command(BaseCommand):
+    help = (
+        'Re-scores all stored attempts of a test against its current answer key, e.g. after a '
+        'corrected answer or a dropped question (needs numpy).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_id', type=int)
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Attempts graded per matrix.')
+
+    def handle(self, *args, **options):
+        test_id = options['test_id']
+        if not MockTest.objects.filter(pk=test_id).exists():
+            raise CommandError(f"MockTest {test_id} not found.")
+
+        # Live submissions must not keep grading against a pre-warmed copy of the old key
+        warmup.forget(test_id)
+        with transaction.atomic():
+            results, answers = grading.regrade(test_id, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+            if not options['dry_run'] and results:
+                cohort.rebuild(test_id)
+                # Re-applied points bump their users' series versions once this commits
+                progress.rebuild(test_id, chunk_size=options['chunk_size'])
+        if not options['dry_run'] and results:
+            # Cached attempt vectors and comparisons hold the old grades
+            comparison.forget(test_id)
+        verb = 'Would change' if options['dry_run'] else 'Changed'
+        self.stdout.write(f"{verb} {results} results and {answers} answers.")
+        if results and not options['dry_run']:
+            self.stdout.write("Run build_recommendations --rebuild-performance to refresh weak-area cells.")
+        self.stdout.write(self.style.SUCCESS('--- Regrade complete ---'))
@@ -0,0 +1,54 @@
+# FILE: exams/management/commands/render_question_html.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+
+from exams import rendering, warmup
+from exams.models import Option, Question
+
+class Command(BaseCommand):
+    help = (
+        'Re-renders the stored question, option and solution HTML of questions rendered with an '
+        'older renderer (run after bumping exams.rendering.RENDERER_VERSION or after migrating).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render every question, not only outdated ones.')
+        parser.add_argument('--test', type=int, action='append', help='Only questions of this test ID (repeatable).')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Questions rendered and updated per transaction.')
+
+    def handle(self, *args, **options):
+        questions = Question.objects.only('id', 'mock_test_id', 'text', 'solution').order_by('pk')
+        if not options['all']:
+            questions = questions.filter(render_version__lt=rendering.RENDERER_VERSION)
+        if options['test']:
+            questions = questions.filter(mock_test_id__in=options['test'])
+        questions = questions.prefetch_related(
+            Prefetch('options', queryset=Option.objects.only('id', 'question_id', 'text')),
+        )
+
+        # Keyset pages: rendered rows drop out of the filter, so OFFSET would skip rows
+        last_pk, question_total, option_total, test_ids = 0, 0, 0, set()
+        while True:
+            chunk = list(questions.filter(pk__gt=last_pk)[:options['chunk_size']])
+            if not chunk:
+                break
+            chunk_options = [rendering.prerender_option(option) for question in chunk for option in question.options.all()]
+            for question in chunk:
+                rendering.prerender_question(question)
+                test_ids.add(question.mock_test_id)
+            with transaction.atomic():
+                Question.objects.bulk_update(chunk, ['text_html', 'solution_html', 'render_version'])
+                Option.objects.bulk_update(chunk_options, ['text_html'])
+            last_pk = chunk[-1].pk
+            question_total += len(chunk)
+            option_total += len(chunk_options)
+            self.stdout.write(f"Rendered {question_total} questions...")
+
+        # bulk_update sends no signals; drop pre-warmed live exam payloads holding the old HTML
+        for test_id in test_ids:
+            warmup.forget(test_id)
+        self.stdout.write(f"Rendered {question_total} questions and {option_total} options "
+                          f"with renderer version {rendering.RENDERER_VERSION}.")
+        self.stdout.write(self.style.SUCCESS('--- Rendering complete ---'))
@@ -0,0 +1,33 @@
+# FILE: exams/management/commands/warm_live_exams.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import warmup
+from exams.models import MockTest
+
+class Command(BaseCommand):
+    help = (
+        'Pre-builds the cached payload of scheduled live exams that start soon or are running '
+        '(run from cron every few minutes).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes-ahead', type=int, default=warmup.WARM_AHEAD_MINUTES, help='Warm exams starting within this many minutes.')
+        parser.add_argument('--test', type=int, action='append', help='Warm this scheduled test ID regardless of its start time (repeatable).')
+
+    def handle(self, *args, **options):
+        if options['test']:
+            tests = list(MockTest.objects.filter(pk__in=options['test'], live_starts_at__isnull=False).select_related('category'))
+            missing = set(options['test']) - {test.pk for test in tests}
+            if missing:
+                raise CommandError(f"Not scheduled live tests: {sorted(missing)}")
+        else:
+            tests = list(warmup.due_for_warming(ahead_minutes=options['minutes_ahead']))
+
+        if not tests:
+            self.stdout.write("No live exams due.")
+            return
+        keys = warmup.warm(tests)
+        for test in tests:
+            self.stdout.write(f"Warmed '{test.title}' (starts {test.live_starts_at:%Y-%m-%d %H:%M}).")
+        self.stdout.write(self.style.SUCCESS(f'--- {keys} cache entries warmed ---'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0002_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mocktest',
+            name='trending_score',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0003_mocktest_trending_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('active', 'Active'), ('submitted', 'Submitted')], default='active', max_length=10)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('answers', models.JSONField(default=dict)),
+                ('compacted_seq', models.PositiveIntegerField(default=0)),
+                ('compacted_at', models.DateTimeField(blank=True, null=True)),
+                ('mock_test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_sessions', to='exams.mocktest')),
+                ('test_result', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attempt_session', to='exams.testresult')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AttemptLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveIntegerField()),
+                ('changes', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_entries', to='exams.attemptsession')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='attemptsession',
+            index=models.Index(fields=['user', 'mock_test', 'status'], name='attempt_user_test_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='attemptlogentry',
+            constraint=models.UniqueConstraint(fields=('session', 'seq'), name='unique_attempt_log_seq'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0004_attempt_sessions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testresult',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='testresult',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='unique_result_idempotency_key'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0005_testresult_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['mock_test', '-score', 'time_taken_seconds', 'id', 'user'], name='result_board_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['user', 'mock_test', '-end_time'], name='result_user_test_idx'),
+        ),
+    ]
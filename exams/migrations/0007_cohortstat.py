@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0006_testresult_leaderboard_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('top_score', models.FloatField(blank=True, null=True)),
+                ('max_marks', models.FloatField(default=0)),
+                ('correct_sum', models.PositiveIntegerField(default=0)),
+                ('incorrect_sum', models.PositiveIntegerField(default=0)),
+                ('time_sum', models.PositiveBigIntegerField(default=0, help_text='Total seconds spent, summed over attempts')),
+                ('score_sketch', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('mock_test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cohort_stats', to='exams.mocktest')),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exams.subject')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('mock_test', 'subject'), name='unique_cohort_stat')],
+            },
+        ),
+    ]
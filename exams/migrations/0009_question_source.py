@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0008_user_performance_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='source_question',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='copies', to='exams.question'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0009_question_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mocktest',
+            name='live_ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mocktest',
+            name='live_starts_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
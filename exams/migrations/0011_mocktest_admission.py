@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0010_live_exam_window'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mocktest',
+            name='admission_burst',
+            field=models.PositiveIntegerField(blank=True, help_text="Admissions allowed at once after a quiet period (default: one second's worth).", null=True),
+        ),
+        migrations.AddField(
+            model_name='mocktest',
+            name='admission_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='Candidates admitted per second once the window opens.', null=True),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:37
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_marks_awarded(apps, schema_editor):
+    # Existing answers are all single correct: +marks if correct, -negative_marks if answered wrong
+    UserAnswer = apps.get_model('exams', 'UserAnswer')
+    Question = apps.get_model('exams', 'Question')
+    question = Question.objects.filter(pk=OuterRef('question_id'))
+    UserAnswer.objects.filter(is_correct=True).update(marks_awarded=Subquery(question.values('marks')))
+    UserAnswer.objects.filter(is_correct=False, selected_option__isnull=False) \
+        .update(marks_awarded=-Subquery(question.values('negative_marks')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0011_mocktest_admission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='answer_max',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='answer_min',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='correct_options',
+            field=models.ManyToManyField(blank=True, help_text='Multiple correct questions only.', related_name='correct_for_multi_question', to='exams.option'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='partial_marks',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=4),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='question_type',
+            field=models.CharField(choices=[('S', 'Single correct'), ('M', 'Multiple correct'), ('N', 'Numerical answer')], default='S', max_length=1),
+        ),
+        migrations.AddField(
+            model_name='useranswer',
+            name='marks_awarded',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='useranswer',
+            name='response',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(backfill_marks_awarded, migrations.RunPython.noop),
+    ]
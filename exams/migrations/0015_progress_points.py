@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0014_question_similarity_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('A', 'Overall'), ('C', 'Category'), ('S', 'Subject')], max_length=1)),
+                ('key', models.PositiveIntegerField(default=0)),
+                ('taken_at', models.DateTimeField()),
+                ('score_percent', models.FloatField()),
+                ('accuracy', models.FloatField(help_text='Correct answers as a percentage of attempted questions')),
+                ('time_seconds', models.PositiveIntegerField(default=0)),
+                ('test_result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exams.testresult')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_points', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'scope', 'key', 'taken_at'], name='progress_series_idx')],
+                'constraints': [models.UniqueConstraint(fields=('test_result', 'scope', 'key'), name='unique_progress_point')],
+            },
+        ),
+    ]
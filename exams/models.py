@@ -5,6 +5,8 @@ from django.contrib.auth import get_user_model
 from django.template.defaultfilters import slugify
 from django.db.models import Sum
 
+from . import rendering
+
 # Get the active User model for relationships
 User = get_user_model()
 
@@ -46,8 +48,17 @@ class MockTest(models.Model):
     is_new = models.BooleanField(default=False)
     is_popular = models.BooleanField(default=False)
     attempts_count = models.IntegerField(default=0)
+    # Log-space, time-decayed attempt count maintained by exams.counters (higher = trending)
+    trending_score = models.FloatField(default=0, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Scheduled live exam window (both NULL = always open); see exams/warmup.py
+    live_starts_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    live_ends_at = models.DateTimeField(null=True, blank=True)
+    # Waiting room for scheduled exams (NULL rate = none); see exams/waitingroom.py
+    admission_rate = models.PositiveIntegerField(null=True, blank=True, help_text="Candidates admitted per second once the window opens.")
+    admission_burst = models.PositiveIntegerField(null=True, blank=True, help_text="Admissions allowed at once after a quiet period (default: one second's worth).")
+
     # NOTE: These fields store pre-calculated or default values
     question_count = models.IntegerField()
     max_marks = models.IntegerField()
@@ -55,6 +66,18 @@ class MockTest(models.Model):
 
     def __str__(self): return f"{self.title} ({self.category.name})"
 
+    def window_state(self, now):
+        """'upcoming', 'open' or 'closed' for scheduled exams; always 'open' otherwise."""
+        if self.live_starts_at and now < self.live_starts_at:
+            return 'upcoming'
+        if self.live_ends_at and now >= self.live_ends_at:
+            return 'closed'
+        return 'open'
+
+    @property
+    def uses_waiting_room(self):
+        return bool(self.live_starts_at and self.admission_rate)
+
 # Define Question first, as Option needs it.
 class Question(models.Model):
     """Represents a single question within a MockTest."""
@@ -64,24 +87,88 @@ class Question(models.Model):
     
     DIFFICULTY_CHOICES = [('E', 'Easy'), ('M', 'Medium'), ('H', 'Hard')]
     difficulty = models.CharField(max_length=1, choices=DIFFICULTY_CHOICES, default='M')
+
+    # Scoring rules per type are in exams/grading.py
+    TYPE_SINGLE = 'S'
+    TYPE_MULTI = 'M'
+    TYPE_NUMERICAL = 'N'
+    TYPE_CHOICES = [(TYPE_SINGLE, 'Single correct'), (TYPE_MULTI, 'Multiple correct'), (TYPE_NUMERICAL, 'Numerical answer')]
+    question_type = models.CharField(max_length=1, choices=TYPE_CHOICES, default=TYPE_SINGLE)
+
     marks = models.DecimalField(max_digits=4, decimal_places=2, default=1.00)
     negative_marks = models.DecimalField(max_digits=4, decimal_places=2, default=0.00)
+    # Multiple correct: marks per correct option chosen when no wrong option is chosen
+    partial_marks = models.DecimalField(max_digits=4, decimal_places=2, default=0.00)
     solution = models.TextField(blank=True, null=True)
     
     # CRITICAL FIELD: Links the Question to the ONE correct Option (used for scoring and admin).
     correct_option = models.ForeignKey('Option', on_delete=models.SET_NULL, null=True, blank=True, 
                                      related_name='correct_for_question', 
                                      help_text="Set the correct option after saving all options.")
+    # Multiple correct questions: every correct option (correct_option is not used)
+    correct_options = models.ManyToManyField('Option', blank=True, related_name='correct_for_multi_question',
+                                             help_text="Multiple correct questions only.")
+    # Numerical answer questions: accepted inclusive range (equal bounds = exact answer)
+    answer_min = models.DecimalField(max_digits=14, decimal_places=4, null=True, blank=True)
+    answer_max = models.DecimalField(max_digits=14, decimal_places=4, null=True, blank=True)
+
+    # Set on copies made by exams.assembly; the pool samples only originals (NULL here)
+    source_question = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
+                                        related_name='copies')
+
+    # Pre-rendered, sanitized HTML of text/solution (and of the options' text); see exams/rendering.py
+    text_html = models.TextField(blank=True, default='', editable=False)
+    solution_html = models.TextField(blank=True, default='', editable=False)
+    # RENDERER_VERSION the fragments were rendered with (0 = not rendered yet)
+    render_version = models.PositiveSmallIntegerField(default=0, editable=False)
 
     def __str__(self): return f"{self.mock_test.title}: {self.text[:50]}..."
 
+    def save(self, *args, **kwargs):
+        rendering.prerender_question(self)
+        super().save(*args, **kwargs)
+
+    # Provide code with comments: Templates use these; rows not rendered yet are rendered on the fly
+    @property
+    def text_display(self):
+        return self.text_html if self.render_version else rendering.render(self.text)
+
+    @property
+    def solution_display(self):
+        return self.solution_html if self.render_version else rendering.render(self.solution)
+
 class Option(models.Model):
     """Represents a single multiple-choice option for a Question."""
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='options')
     text = models.CharField(max_length=500)
+    # Rendered with the question's text, under Question.render_version
+    text_html = models.TextField(blank=True, default='', editable=False)
     # The 'is_correct' field is removed as correctness is tracked by Question.correct_option
     def __str__(self): return f"{self.question.id}: {self.text[:30]}"
 
+    def save(self, *args, **kwargs):
+        rendering.prerender_option(self)
+        super().save(*args, **kwargs)
+
+    @property
+    def text_display(self):
+        return self.text_html or rendering.render(self.text)
+
+class QuestionFingerprint(models.Model):
+    """MinHash signature of a question's text and options, for near-duplicate search (exams/similarity.py)."""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='fingerprint')
+    # similarity.NUM_PERM little-endian uint32 minimums
+    signature = models.BinaryField()
+
+class QuestionBucket(models.Model):
+    """One LSH band of a fingerprint; questions sharing a (band, bucket) are near-duplicate candidates."""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['band', 'bucket', 'question'], name='question_bucket_idx')]
+
 # =========================================================================
 # 3. USER INTERACTION & RESULT MODELS
 # =========================================================================
@@ -102,6 +189,20 @@ class TestResult(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField(auto_now_add=True)
     time_taken_seconds = models.PositiveIntegerField(default=0)
+
+    # Submission key used to collapse double-clicks and client retries (see exams/idempotency.py)
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_result_idempotency_key'),
+        ]
+        indexes = [
+            # Leaderboard order (see exams/leaderboard.py); user last so a page never reads the table rows
+            models.Index(fields=['mock_test', '-score', 'time_taken_seconds', 'id', 'user'], name='result_board_idx'),
+            # "Latest attempt of this test by this user" (test list Result buttons, dashboard)
+            models.Index(fields=['user', 'mock_test', '-end_time'], name='result_user_test_idx'),
+        ]
     
     def __str__(self): return f"{self.user.username} - {self.mock_test.title} ({self.score})"
 
@@ -110,18 +211,165 @@ class UserAnswer(models.Model):
     test_result = models.ForeignKey(TestResult, on_delete=models.CASCADE, related_name='user_answers')
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     selected_option = models.ForeignKey(Option, on_delete=models.CASCADE, null=True, blank=True)
+    # Multiple correct: chosen option IDs ("12,15"); numerical: the value entered. Empty otherwise.
+    response = models.CharField(max_length=100, blank=True, default='')
     
     # Crucial field added to speed up results_view aggregation
     is_correct = models.BooleanField(default=False) 
+    # Signed marks this answer contributed (partial marks and negative marking included)
+    marks_awarded = models.FloatField(default=0)
     
     time_spent = models.PositiveIntegerField(default=0, help_text="Time spent on the question in seconds")
     
     def __str__(self): return f"Answer for Q:{self.question.id} in TestResult:{self.test_result.id}"
 
+class AttemptSession(models.Model):
+    """
+    Server-side state of an in-progress test attempt, created when the live test is opened.
+    Autosaved answer diffs are appended to AttemptLogEntry and periodically compacted into
+    `answers`, so the final submission can be graded from already-persisted state.
+    """
+    STATUS_ACTIVE = 'active'
+    STATUS_SUBMITTED = 'submitted'
+    STATUS_CHOICES = [(STATUS_ACTIVE, 'Active'), (STATUS_SUBMITTED, 'Submitted')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attempt_sessions')
+    mock_test = models.ForeignKey(MockTest, on_delete=models.CASCADE, related_name='attempt_sessions')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+    started_at = models.DateTimeField(auto_now_add=True)
+    # Compacted snapshot: {"<question_id>": [selected_option_id or null, time_spent_seconds]}
+    answers = models.JSONField(default=dict)
+    # Highest log sequence number already folded into `answers`
+    compacted_seq = models.PositiveIntegerField(default=0)
+    compacted_at = models.DateTimeField(null=True, blank=True)
+    test_result = models.OneToOneField(TestResult, on_delete=models.SET_NULL, null=True, blank=True, related_name='attempt_session')
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'mock_test', 'status'], name='attempt_user_test_idx')]
+
+    def __str__(self): return f"Attempt {self.id}: {self.user_id} on {self.mock_test_id} ({self.status})"
+
+class AttemptLogEntry(models.Model):
+    """One append-only batch of answer changes sent by the live test page."""
+    session = models.ForeignKey(AttemptSession, on_delete=models.CASCADE, related_name='log_entries')
+    seq = models.PositiveIntegerField()
+    # List of {"question_id", "selected_option_id", "time_spent"} changes, last write wins
+    changes = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['session', 'seq'], name='unique_attempt_log_seq')]
+
+    def __str__(self): return f"Attempt {self.session_id} diff #{self.seq}"
+
+class CohortStat(models.Model):
+    """
+    Running aggregates of all attempts of a test, per subject (subject NULL = whole test).
+    Maintained incrementally from the outbox by exams.cohort, so results pages can show
+    "you vs average vs topper" with a single lookup.
+    """
+    mock_test = models.ForeignKey(MockTest, on_delete=models.CASCADE, related_name='cohort_stats')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    attempts = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    top_score = models.FloatField(null=True, blank=True)
+    max_marks = models.FloatField(default=0)
+    correct_sum = models.PositiveIntegerField(default=0)
+    incorrect_sum = models.PositiveIntegerField(default=0)
+    time_sum = models.PositiveBigIntegerField(default=0, help_text="Total seconds spent, summed over attempts")
+    # Mergeable histogram of score as a percentage of max_marks (see exams.cohort.SKETCH_*)
+    score_sketch = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['mock_test', 'subject'], name='unique_cohort_stat')]
+
+    def __str__(self): return f"Cohort stats: test {self.mock_test_id}, subject {self.subject_id or 'all'}"
+
+class UserPerformance(models.Model):
+    """
+    One non-zero cell of the sparse user x subject / user x difficulty performance matrix,
+    maintained by exams.recommendations so recommendations never scan UserAnswer.
+    """
+    DIMENSION_SUBJECT = 'S'
+    DIMENSION_DIFFICULTY = 'D'
+    DIMENSION_CHOICES = [(DIMENSION_SUBJECT, 'Subject'), (DIMENSION_DIFFICULTY, 'Difficulty')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='performance_cells')
+    dimension = models.CharField(max_length=1, choices=DIMENSION_CHOICES)
+    # Subject ID (as text) or difficulty code, depending on `dimension`
+    key = models.CharField(max_length=20)
+    questions = models.PositiveIntegerField(default=0, help_text="Questions seen, answered or not")
+    correct = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'dimension', 'key'], name='unique_user_performance_cell')]
+
+    def __str__(self): return f"{self.user_id} {self.dimension}:{self.key} {self.correct}/{self.questions}"
+
+class ProgressPoint(models.Model):
+    """
+    One attempt in a user's score series: overall, for the test's category and for each of
+    its subjects. Appended after each submission by exams.progress and never updated.
+    """
+    SCOPE_OVERALL = 'A'
+    SCOPE_CATEGORY = 'C'
+    SCOPE_SUBJECT = 'S'
+    SCOPE_CHOICES = [(SCOPE_OVERALL, 'Overall'), (SCOPE_CATEGORY, 'Category'), (SCOPE_SUBJECT, 'Subject')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='progress_points')
+    scope = models.CharField(max_length=1, choices=SCOPE_CHOICES)
+    # Category or subject ID, depending on `scope`; 0 for the overall series
+    key = models.PositiveIntegerField(default=0)
+    test_result = models.ForeignKey(TestResult, on_delete=models.CASCADE, related_name='+')
+    taken_at = models.DateTimeField()
+    score_percent = models.FloatField()
+    accuracy = models.FloatField(help_text="Correct answers as a percentage of attempted questions")
+    time_seconds = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Outbox delivery is at-least-once: a redelivered result must not add points twice
+            models.UniqueConstraint(fields=['test_result', 'scope', 'key'], name='unique_progress_point'),
+        ]
+        indexes = [models.Index(fields=['user', 'scope', 'key', 'taken_at'], name='progress_series_idx')]
+
+    def __str__(self): return f"{self.user_id} {self.scope}:{self.key} {self.taken_at:%Y-%m-%d} {self.score_percent:.1f}%"
+
+class UserRecommendation(models.Model):
+    """Precomputed top-K next tests for a user (durable copy of the cached list)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='test_recommendation')
+    test_ids = models.JSONField(default=list)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self): return f"Recommendations for {self.user_id}"
+
 class Testimonial(models.Model):
     """Represents a user testimonial for the homepage."""
     user_name = models.CharField(max_length=100)
     feedback_text = models.TextField()
     is_featured = models.BooleanField(default=False)
     user_avatar = models.ImageField(upload_to='avatars/', blank=True, null=True) 
-    def __str__(self): return f"Testimonial by {self.user_name}"
\ No newline at end of file
+    def __str__(self): return f"Testimonial by {self.user_name}"
+
+# =========================================================================
+# 4. ASYNC SIDE-EFFECT MODELS
+# =========================================================================
+
+class OutboxEvent(models.Model):
+    """
+    A post-commit side effect (leaderboard refresh, broadcast, stat rollup) written in the
+    same transaction as the data it describes, and drained later by exams.outbox.
+    """
+    topic = models.CharField(max_length=50, db_index=True)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # NULL until a dispatcher has run every handler for the event successfully
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [models.Index(fields=['dispatched_at', 'id'], name='outbox_pending_idx')]
+
+    def __str__(self): return f"{self.topic} #{self.id}"
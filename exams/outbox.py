@@ -0,0 +1,210 @@
+# FILE: exams/outbox.py
+
+"""
+Transactional outbox for side effects that must not run inside a request's transaction.
+
+Writers call publish() inside their transaction.atomic block. The event row commits (or
+rolls back) together with the data it describes, and an on_commit hook then dispatches
+just the events that transaction published; anything else pending (earlier failures,
+events of a crashed worker) is left to the `dispatch_outbox` management command, so a
+request never works through other users' backlog.
+
+Delivery is at-least-once: an event is only marked as dispatched after every handler for
+its topic has succeeded, so external side effects (broadcasts) must be idempotent. Database
+writes made by handlers run in the same transaction as the dispatched mark, so rollups
+stored in the database apply exactly once; in-process buffers (the attempt counters) are
+only fed once that transaction commits, so a retried batch is not counted twice.
+"""
+
+import json
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import cohort, counters, leaderboard, progress, recommendations
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Topics written by the exam flow
+RESULT_SUBMITTED = 'result.submitted'
+
+DEFAULT_BATCH_SIZE = 100
+# Events that keep failing stop being retried automatically after this many attempts
+MAX_ATTEMPTS = 10
+
+# topic -> list of handler callables taking a list of payload dicts
+_handlers = {}
+
+
+def register(topic):
+    """Decorator that subscribes a batch handler to an outbox topic."""
+    def decorator(func):
+        _handlers.setdefault(topic, []).append(func)
+        return func
+    return decorator
+
+
+def publish(topic, payload):
+    """
+    Records an event in the current transaction and schedules its dispatch once it commits.
+    Returns the created OutboxEvent.
+    """
+    event = OutboxEvent.objects.create(topic=topic, payload=payload)
+    # robust: a failed dispatch must not turn an already committed request into an error
+    transaction.on_commit(lambda: dispatch_events([event.pk]), robust=True)
+    return event
+
+
+def publish_many(topic, payloads):
+    """
+    Bulk variant of publish() for batch writers; one INSERT and one dispatch for all events.
+    Backends whose bulk_create does not return primary keys (MySQL) leave the events to
+    dispatch_outbox.
+    """
+    events = OutboxEvent.objects.bulk_create([OutboxEvent(topic=topic, payload=payload) for payload in payloads])
+    event_ids = [event.pk for event in events if event.pk is not None]
+    if event_ids:
+        transaction.on_commit(lambda: dispatch_events(event_ids), robust=True)
+    return events
+
+
+def dispatch_events(event_ids, batch_size=DEFAULT_BATCH_SIZE):
+    """Dispatches the given events if still pending (another dispatcher may have claimed them)."""
+    dispatched = 0
+    for start in range(0, len(event_ids), batch_size):
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(pk__in=event_ids[start:start + batch_size], dispatched_at__isnull=True)
+                .order_by('id')
+            )
+            if events:
+                dispatched += _dispatch_batch(events)
+    return dispatched
+
+
+def dispatch_pending(batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """
+    Drains pending events in batches. Each batch is claimed with SKIP LOCKED so concurrent
+    dispatchers never handle the same rows, and handlers receive every payload of a topic in
+    the batch at once so they can coalesce work (e.g. one leaderboard refresh per test).
+    Returns the number of events dispatched.
+    """
+    dispatched = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(dispatched_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+                .order_by('id')[:batch_size]
+            )
+            if not events:
+                break
+            dispatched += _dispatch_batch(events)
+        batches += 1
+        if len(events) < batch_size:
+            break
+    return dispatched
+
+
+def _dispatch_batch(events):
+    """Runs handlers per topic and records success or failure on each event row."""
+    by_topic = {}
+    for event in events:
+        by_topic.setdefault(event.topic, []).append(event)
+
+    now = timezone.now()
+    succeeded = 0
+    for topic, topic_events in by_topic.items():
+        error = ''
+        try:
+            payloads = [event.payload for event in topic_events]
+            # Savepoint: database rollups written by handlers commit together with the
+            # dispatched mark (exactly once) or are rolled back with a failed attempt
+            with transaction.atomic():
+                for handler in _handlers.get(topic, []):
+                    handler(payloads)
+        except Exception as e:
+            # Leave the events pending so the next drain retries them
+            logger.exception("Outbox handler failed for topic %s", topic)
+            error = f"{e.__class__.__name__}: {e}"
+
+        for event in topic_events:
+            event.attempts += 1
+            event.last_error = error
+            if not error:
+                event.dispatched_at = now
+                succeeded += 1
+        OutboxEvent.objects.bulk_update(topic_events, ['attempts', 'last_error', 'dispatched_at'])
+    return succeeded
+
+
+# =========================================================================
+# HANDLERS
+# =========================================================================
+
+def build_leaderboard(test_id, limit=10):
+    """Returns the top-N leaderboard rows for a test in the WebSocket payload format."""
+    return [
+        {
+            'rank': row['rank'],
+            'username': row['user__username'],
+            'score': float(row['score']),
+            'time_taken_seconds': row['time_taken_seconds'],
+        }
+        for row in leaderboard.top(test_id, limit)
+    ]
+
+
+@register(RESULT_SUBMITTED)
+def broadcast_leaderboards(payloads):
+    """Rebuilds and broadcasts the leaderboard once per test touched by the batch."""
+    # Lazy imports: only dispatchers need the channel layer
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for test_id in sorted({payload['test_id'] for payload in payloads}):
+        async_to_sync(channel_layer.group_send)(
+            'leaderboard',
+            {'type': 'leaderboard_update', 'text': json.dumps(build_leaderboard(test_id))}
+        )
+
+
+@register(RESULT_SUBMITTED)
+def count_attempts(payloads):
+    """Feeds submissions into the buffered MockTest attempt counters."""
+    per_test = {}
+    for payload in payloads:
+        per_test[payload['test_id']] = per_test.get(payload['test_id'], 0) + 1
+    # On commit: if a later handler fails, the savepoint rollback drops this callback too
+    # and the retried batch counts the submissions then
+    transaction.on_commit(lambda: _increment_counters(per_test))
+
+
+def _increment_counters(per_test):
+    for test_id, amount in per_test.items():
+        counters.increment(test_id, amount)
+
+
+@register(RESULT_SUBMITTED)
+def apply_cohort_stats(payloads):
+    """Folds new results into the per-test, per-subject cohort aggregates."""
+    cohort.apply_results([payload['result_id'] for payload in payloads])
+
+
+@register(RESULT_SUBMITTED)
+def refresh_recommendations(payloads):
+    """Adds new results to their users' performance cells and re-scores those users."""
+    recommendations.apply_results([payload['result_id'] for payload in payloads])
+
+
+@register(RESULT_SUBMITTED)
+def append_progress(payloads):
+    """Appends new results to their users' score progression series."""
+    progress.apply_results([payload['result_id'] for payload in payloads])
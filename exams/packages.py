@@ -0,0 +1,400 @@
+# FILE: exams/packages.py
+
+"""
+Self-contained binary test packages, for moving papers between environments.
+
+A package is one file:
+
+    header    MAGIC, format version, manifest length, manifest CRC32   (struct HEADER)
+    manifest  JSON: package metadata, record counts and, per section, its offset/length in
+              the data area, uncompressed length and SHA-256 of the stored bytes
+    data      the sections, each zlib-compressed independently
+
+Sections: "tests" and "subjects" (small JSON lists), "questions" and "options" (arrays of
+fixed-size little-endian records, see QUESTION_RECORD / OPTION_RECORD), "answer_key" (one
+uint16 per question: index of the correct option within the question, NO_ANSWER if unset
+or not a single correct question), "correct_options" (CORRECT_OPTION_RECORDs: every correct
+option of multiple correct questions) and "strings" (one UTF-8 blob that the records point
+into by offset/length).
+
+Version 2 added the question type, partial marks and numerical answer range to the question
+record and the "correct_options" section; version 1 packages (single correct questions
+only) are still read.
+
+PackageReader memory-maps the file, so validate() checks every checksum and record count by
+hashing and stream-decompressing slices of the map without materializing the package.
+import_package() then loads each test with a handful of bulk INSERTs in its own transaction.
+"""
+
+import hashlib
+import json
+import mmap
+import struct
+import zlib
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import rendering, similarity
+from .models import ExamCategory, MockTest, Option, Question, Subject
+
+MAGIC = b'EXPK'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sHII')  # magic, version, manifest length, manifest crc32
+
+# test_index, subject_index (-1 = none), difficulty, marks and negative marks (hundredths),
+# option count, text offset/length, solution offset/length (NULL_LENGTH = no solution),
+# question type, partial marks (hundredths), answer_min and answer_max offset/length
+# (decimal strings, NULL_LENGTH = unset)
+QUESTION_RECORD = struct.Struct('<IiBiiHIIIIBiIIII')
+# Version 1 records end after the solution
+QUESTION_RECORD_V1 = struct.Struct('<IiBiiHIIII')
+# question_index, text offset/length
+OPTION_RECORD = struct.Struct('<III')
+# question_index, index of a correct option within the question
+CORRECT_OPTION_RECORD = struct.Struct('<IH')
+NO_ANSWER = 0xFFFF
+NULL_LENGTH = 0xFFFFFFFF
+
+SECTIONS = ('tests', 'subjects', 'questions', 'options', 'answer_key', 'correct_options', 'strings')
+SECTIONS_V1 = ('tests', 'subjects', 'questions', 'options', 'answer_key', 'strings')
+READ_CHUNK = 1 << 20
+
+
+class PackageError(ValueError):
+    """Raised for a package that is malformed, corrupt or of an unsupported version."""
+
+
+# =========================================================================
+# EXPORT
+# =========================================================================
+
+def write_package(path, test_ids):
+    """Writes the given MockTests (with questions, options and answer keys) to `path`."""
+    tests = list(MockTest.objects.filter(pk__in=test_ids).select_related('category').order_by('pk'))
+    if not tests:
+        raise PackageError("No tests to export.")
+    test_index = {test.pk: i for i, test in enumerate(tests)}
+
+    strings = bytearray()
+
+    def put(value):
+        if value is None:
+            return 0, NULL_LENGTH
+        data = value.encode('utf-8')
+        strings.extend(data)
+        return len(strings) - len(data), len(data)
+
+    subject_index = {}
+    questions, answer_key = bytearray(), []
+    question_rows = list(
+        Question.objects.filter(mock_test_id__in=test_index).select_related('subject')
+        .order_by('mock_test_id', 'pk')
+    )
+    question_index = {q.pk: i for i, q in enumerate(question_rows)}
+    options_by_question = {}
+    for option in Option.objects.filter(question_id__in=question_index).order_by('question_id', 'pk'):
+        options_by_question.setdefault(option.question_id, []).append(option)
+    multi_correct = {}
+    for q_id, option_id in Question.correct_options.through.objects.filter(
+            question_id__in=question_index).values_list('question_id', 'option_id'):
+        multi_correct.setdefault(q_id, set()).add(option_id)
+
+    options, correct_options = bytearray(), bytearray()
+    for q in question_rows:
+        subject = -1
+        if q.subject is not None:
+            subject = subject_index.setdefault(q.subject.name, len(subject_index))
+        q_options = options_by_question.get(q.pk, [])
+        text, solution = put(q.text), put(q.solution)
+        answer_min = put(None if q.answer_min is None else str(q.answer_min))
+        answer_max = put(None if q.answer_max is None else str(q.answer_max))
+        questions += QUESTION_RECORD.pack(
+            test_index[q.mock_test_id], subject, ord(q.difficulty), _hundredths(q.marks),
+            _hundredths(q.negative_marks), len(q_options), *text, *solution,
+            ord(q.question_type), _hundredths(q.partial_marks), *answer_min, *answer_max,
+        )
+        if q.question_type == Question.TYPE_SINGLE:
+            answer_key.append(next((i for i, o in enumerate(q_options) if o.pk == q.correct_option_id), NO_ANSWER))
+        else:
+            answer_key.append(NO_ANSWER)
+        for i, option in enumerate(q_options):
+            options += OPTION_RECORD.pack(question_index[q.pk], *put(option.text))
+            if q.question_type == Question.TYPE_MULTI and option.pk in multi_correct.get(q.pk, ()):
+                correct_options += CORRECT_OPTION_RECORD.pack(question_index[q.pk], i)
+
+    raw_sections = {
+        'tests': json.dumps([
+            {
+                'title': test.title, 'category': test.category.name, 'category_slug': test.category.slug,
+                'question_count': test.question_count, 'max_marks': test.max_marks,
+                'time_minutes': test.time_minutes, 'is_free': test.is_free,
+            }
+            for test in tests
+        ]).encode('utf-8'),
+        'subjects': json.dumps(sorted(subject_index, key=subject_index.get)).encode('utf-8'),
+        'questions': bytes(questions),
+        'options': bytes(options),
+        'answer_key': struct.pack(f'<{len(answer_key)}H', *answer_key),
+        'correct_options': bytes(correct_options),
+        'strings': bytes(strings),
+    }
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'created_at': timezone.now().isoformat(),
+        'counts': {'tests': len(tests), 'questions': len(question_rows), 'options': len(options) // OPTION_RECORD.size},
+        'sections': {},
+    }
+    stored, offset = [], 0
+    for name in SECTIONS:
+        data = zlib.compress(raw_sections[name], 6)
+        manifest['sections'][name] = {
+            'offset': offset, 'length': len(data), 'raw_length': len(raw_sections[name]),
+            'sha256': hashlib.sha256(data).hexdigest(),
+        }
+        stored.append(data)
+        offset += len(data)
+
+    manifest_bytes = json.dumps(manifest, sort_keys=True).encode('utf-8')
+    with open(path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(manifest_bytes), zlib.crc32(manifest_bytes)))
+        out.write(manifest_bytes)
+        for data in stored:
+            out.write(data)
+    return manifest
+
+
+def _hundredths(value):
+    return int((Decimal(value or 0) * 100).to_integral_value())
+
+
+# =========================================================================
+# READING
+# =========================================================================
+
+class PackageReader:
+    """Memory-mapped view of a package file; use as a context manager."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._map = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise PackageError("Package file is empty.")
+        try:
+            self._read_manifest()
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self._map.close()
+        self._file.close()
+
+    def _read_manifest(self):
+        if len(self._map) < HEADER.size:
+            raise PackageError("File is too short to be a test package.")
+        magic, version, manifest_length, manifest_crc = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise PackageError("Not a test package (bad magic bytes).")
+        if version > FORMAT_VERSION:
+            raise PackageError(f"Package format version {version} is newer than supported ({FORMAT_VERSION}).")
+        raw = self._map[HEADER.size:HEADER.size + manifest_length]
+        if len(raw) != manifest_length or zlib.crc32(raw) != manifest_crc:
+            raise PackageError("Package manifest is truncated or corrupt.")
+        self.manifest = json.loads(raw)
+        self._data_start = HEADER.size + manifest_length
+        self.version = version
+        self.sections = SECTIONS if version >= 2 else SECTIONS_V1
+        self.question_record = QUESTION_RECORD if version >= 2 else QUESTION_RECORD_V1
+        self.record_sizes = {'questions': self.question_record.size, 'options': OPTION_RECORD.size, 'answer_key': 2}
+        if version >= 2:
+            self.record_sizes['correct_options'] = CORRECT_OPTION_RECORD.size
+
+    def _stored(self, name):
+        try:
+            info = self.manifest['sections'][name]
+        except KeyError:
+            raise PackageError(f"Package has no '{name}' section.")
+        start = self._data_start + info['offset']
+        if start + info['length'] > len(self._map):
+            raise PackageError(f"Section '{name}' is truncated.")
+        return memoryview(self._map)[start:start + info['length']], info
+
+    def validate(self):
+        """
+        Checks every section's checksum, uncompressed size and record count while holding at
+        most READ_CHUNK bytes of decompressed data. Raises PackageError; returns the counts.
+        """
+        for name in self.sections:
+            view, info = self._stored(name)
+            try:
+                if hashlib.sha256(view).hexdigest() != info['sha256']:
+                    raise PackageError(f"Checksum mismatch in section '{name}'.")
+                decompressor = zlib.decompressobj()
+                raw_length = 0
+                for start in range(0, len(view), READ_CHUNK):
+                    raw_length += len(decompressor.decompress(view[start:start + READ_CHUNK]))
+                raw_length += len(decompressor.flush())
+            except zlib.error as e:
+                raise PackageError(f"Section '{name}' does not decompress: {e}")
+            finally:
+                view.release()
+            if raw_length != info['raw_length']:
+                raise PackageError(f"Section '{name}' has {raw_length} bytes, manifest says {info['raw_length']}.")
+            if name in self.record_sizes and raw_length % self.record_sizes[name]:
+                raise PackageError(f"Section '{name}' is not a whole number of records.")
+
+        counts = self.manifest['counts']
+        sizes = {name: self.manifest['sections'][name]['raw_length'] for name in self.record_sizes}
+        if sizes['questions'] // self.question_record.size != counts['questions'] \
+                or sizes['answer_key'] // 2 != counts['questions'] \
+                or sizes['options'] // OPTION_RECORD.size != counts['options']:
+            raise PackageError("Record counts do not match the manifest.")
+        return counts
+
+    def section(self, name):
+        """Decompressed bytes of a section."""
+        view, _ = self._stored(name)
+        try:
+            return zlib.decompress(view)
+        except zlib.error as e:
+            raise PackageError(f"Section '{name}' does not decompress: {e}")
+        finally:
+            view.release()
+
+    def load(self):
+        """Decodes the whole package into plain Python structures for import."""
+        strings = self.section('strings')
+
+        def text(offset, length):
+            return None if length == NULL_LENGTH else strings[offset:offset + length].decode('utf-8')
+
+        answer_key = struct.unpack(f"<{self.manifest['counts']['questions']}H", self.section('answer_key'))
+        questions = []
+        for i, record in enumerate(self.question_record.iter_unpack(self.section('questions'))):
+            test_i, subject_i, difficulty, marks, negative, option_count, t_off, t_len, s_off, s_len = record[:10]
+            # Version 1 packages hold single correct questions only
+            question_type, partial, min_off, min_len, max_off, max_len = \
+                record[10:] or (ord(Question.TYPE_SINGLE), 0, 0, NULL_LENGTH, 0, NULL_LENGTH)
+            answer_min, answer_max = text(min_off, min_len), text(max_off, max_len)
+            questions.append({
+                'test_index': test_i, 'subject_index': subject_i, 'difficulty': chr(difficulty),
+                'question_type': chr(question_type),
+                'marks': Decimal(marks) / 100, 'negative_marks': Decimal(negative) / 100,
+                'partial_marks': Decimal(partial) / 100,
+                'answer_min': None if answer_min is None else Decimal(answer_min),
+                'answer_max': None if answer_max is None else Decimal(answer_max),
+                'text': text(t_off, t_len), 'solution': text(s_off, s_len),
+                'correct': answer_key[i], 'correct_options': [], 'options': [],
+            })
+        for question_i, t_off, t_len in OPTION_RECORD.iter_unpack(self.section('options')):
+            questions[question_i]['options'].append(text(t_off, t_len))
+        if self.version >= 2:
+            for question_i, option_i in CORRECT_OPTION_RECORD.iter_unpack(self.section('correct_options')):
+                if question_i >= len(questions):
+                    raise PackageError("Correct options point past the questions.")
+                questions[question_i]['correct_options'].append(option_i)
+        for question in questions:
+            if question['question_type'] not in (Question.TYPE_SINGLE, Question.TYPE_MULTI, Question.TYPE_NUMERICAL):
+                raise PackageError(f"Unknown question type of question '{question['text'][:40]}'.")
+            if question['correct'] != NO_ANSWER and question['correct'] >= len(question['options']):
+                raise PackageError(f"Answer key points past the options of question '{question['text'][:40]}'.")
+            if any(option_i >= len(question['options']) for option_i in question['correct_options']):
+                raise PackageError(f"Correct options point past the options of question '{question['text'][:40]}'.")
+        return {
+            'tests': json.loads(self.section('tests')),
+            'subjects': json.loads(self.section('subjects')),
+            'questions': questions,
+        }
+
+
+# =========================================================================
+# IMPORT
+# =========================================================================
+
+def import_package(path):
+    """
+    Validates and loads a package. Each test is created in its own transaction with bulk
+    inserts; tests whose title already exists in the category are skipped.
+    Returns a list of (title, status) with status 'created' or 'exists'.
+    """
+    with PackageReader(path) as reader:
+        reader.validate()
+        package = reader.load()
+
+    with transaction.atomic():
+        subject_ids = _ensure_subjects(package['subjects'])
+
+    by_test = {}
+    for question in package['questions']:
+        by_test.setdefault(question['test_index'], []).append(question)
+
+    outcomes = []
+    for test_i, meta in enumerate(package['tests']):
+        with transaction.atomic():
+            category, _ = ExamCategory.objects.get_or_create(slug=meta['category_slug'], defaults={'name': meta['category']})
+            if MockTest.objects.filter(category=category, title=meta['title']).exists():
+                outcomes.append((meta['title'], 'exists'))
+                continue
+            mock_test = MockTest.objects.create(
+                category=category, title=meta['title'], question_count=meta['question_count'],
+                max_marks=meta['max_marks'], time_minutes=meta['time_minutes'], is_free=meta['is_free'],
+            )
+            _load_questions(mock_test, by_test.get(test_i, []), subject_ids)
+            outcomes.append((meta['title'], 'created'))
+    return outcomes
+
+
+def _ensure_subjects(names):
+    """Subject IDs by package index, creating missing subjects in one INSERT."""
+    existing = dict(Subject.objects.filter(name__in=names).values_list('name', 'pk'))
+    Subject.objects.bulk_create([Subject(name=name) for name in names if name not in existing])
+    existing = dict(Subject.objects.filter(name__in=names).values_list('name', 'pk'))
+    return [existing[name] for name in names]
+
+
+def _load_questions(mock_test, questions, subject_ids):
+    """
+    Bulk-inserts a test's questions and options, then sets correct options (the single
+    correct FK and the multiple correct rows). Rows of a new test are re-read in primary-key
+    order (insertion order), since MySQL's bulk_create does not return primary keys.
+    """
+    # bulk_create skips save(), so the HTML is pre-rendered here
+    Question.objects.bulk_create([
+        rendering.prerender_question(Question(
+            mock_test=mock_test, subject_id=subject_ids[q['subject_index']] if q['subject_index'] >= 0 else None,
+            text=q['text'], difficulty=q['difficulty'], question_type=q['question_type'], marks=q['marks'],
+            negative_marks=q['negative_marks'], partial_marks=q['partial_marks'],
+            answer_min=q['answer_min'], answer_max=q['answer_max'], solution=q['solution'],
+        ))
+        for q in questions
+    ], batch_size=1000)
+    question_ids = list(Question.objects.filter(mock_test=mock_test).order_by('pk').values_list('pk', flat=True))
+
+    Option.objects.bulk_create([
+        rendering.prerender_option(Option(question_id=q_id, text=option_text))
+        for q_id, q in zip(question_ids, questions) for option_text in q['options']
+    ], batch_size=1000)
+    option_ids = {}
+    for option_id, q_id in Option.objects.filter(question__mock_test=mock_test).order_by('pk').values_list('pk', 'question_id'):
+        option_ids.setdefault(q_id, []).append(option_id)
+
+    Question.objects.bulk_update([
+        Question(pk=q_id, correct_option_id=option_ids[q_id][q['correct']])
+        for q_id, q in zip(question_ids, questions) if q['correct'] != NO_ANSWER
+    ], ['correct_option'], batch_size=1000)
+    Question.correct_options.through.objects.bulk_create([
+        Question.correct_options.through(question_id=q_id, option_id=option_ids[q_id][option_i])
+        for q_id, q in zip(question_ids, questions) for option_i in q['correct_options']
+    ], batch_size=1000)
+    similarity.index_questions(question_ids)
@@ -0,0 +1,177 @@
+# FILE: exams/pagecache.py
+
+"""
+Full-page cache for anonymous catalog pages, with conditional GET.
+
+Anonymous visitors all see the same catalog pages, so the rendered HTML is cached per URL
+(path + query string) together with the catalog version it was rendered at. The version is
+bumped whenever a category or test is saved or deleted and after an attempt-counter flush
+that changes the trending order or a Popular badge (attempt counts alone may lag by up to
+PAGE_CACHE_SECONDS), which makes every cached page stale at once without a key scan. A stale or missing page is rendered by one request at a time (exams/hotcache.py);
+visitors arriving meanwhile get the previous page, so a bump during a live exam does not
+send every anonymous visitor to the database together.
+
+Per-visitor parts are kept out of the cached body:
+- CSRF tokens are replaced by a placeholder when stored and filled in with the visitor's
+  own token on each hit (one string substitution, no template rendering).
+- Pages rendered within EXAMS_REPLICA_PIN_SECONDS of a version bump read from the primary,
+  so replica lag cannot get a stale page cached under the new version.
+- Authenticated users bypass the cache entirely, so the navbar login state and per-user
+  annotations (e.g. the test list's Result buttons) are always rendered live.
+
+Responses carry an ETag (hash of the cached body) and Last-Modified (catalog version
+time), so repeat visitors revalidate with a 304 instead of downloading the page again.
+"""
+
+import hashlib
+import re
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from . import hotcache, replicas
+
+CATALOG_VERSION_KEY = 'exams:catalog:version'
+PAGE_CACHE_SECONDS = getattr(settings, 'EXAMS_PAGE_CACHE_SECONDS', 10 * 60)
+PAGE_CACHE_NAME = 'exams:page'
+
+CSRF_PLACEHOLDER = '__EXAMS_CSRF_TOKEN__'
+# Matches the hidden input rendered by {% csrf_token %}
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def catalog_version():
+    """Current catalog version: the UNIX time of the last catalog change."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = int(time.time())
+        # add(): concurrent first requests agree on a single version
+        if not cache.add(CATALOG_VERSION_KEY, version, None):
+            version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+async def acatalog_version():
+    """catalog_version() for async views."""
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        version = int(time.time())
+        if not await cache.aadd(CATALOG_VERSION_KEY, version, None):
+            version = await cache.aget(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version(**kwargs):
+    """Retires every cached catalog page. Usable directly as a signal receiver."""
+    cache.set(CATALOG_VERSION_KEY, max(int(time.time()), (cache.get(CATALOG_VERSION_KEY) or 0) + 1), None)
+
+
+def connect_signals():
+    """Called from ExamsConfig.ready(): catalog model writes bump the version."""
+    from .models import ExamCategory, MockTest
+    for model in (ExamCategory, MockTest):
+        post_save.connect(bump_catalog_version, sender=model, dispatch_uid=f'pagecache_save_{model.__name__}')
+        post_delete.connect(bump_catalog_version, sender=model, dispatch_uid=f'pagecache_delete_{model.__name__}')
+
+
+def cache_anonymous_page(view_func):
+    """
+    View decorator: serves anonymous GET/HEAD requests from the page cache, answering
+    If-None-Match / If-Modified-Since with 304. Other requests run the view unchanged.
+    Works on sync and async views.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            user = await request.auser()
+            if request.method not in ('GET', 'HEAD') or user.is_authenticated:
+                return await view_func(request, *args, **kwargs)
+            version = await acatalog_version()
+            rendered = []
+
+            async def render_page():
+                with _fresh_reads(version):
+                    rendered.append(await view_func(request, *args, **kwargs))
+                return _entry_for(rendered[-1], version)
+
+            entry = await hotcache.aget_or_compute(_page_key(request), render_page, PAGE_CACHE_SECONDS,
+                                                   version=version, name=PAGE_CACHE_NAME)
+            if entry is None:
+                return rendered[-1]
+            return _serve(request, entry)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return view_func(request, *args, **kwargs)
+        version = catalog_version()
+        rendered = []
+
+        def render_page():
+            with _fresh_reads(version):
+                rendered.append(view_func(request, *args, **kwargs))
+            return _entry_for(rendered[-1], version)
+
+        # Rendering needs this request, so a stale page is re-rendered inline by the one
+        # request holding the lock, not in the background
+        entry = hotcache.get_or_compute(_page_key(request), render_page, PAGE_CACHE_SECONDS,
+                                        version=version, background=False, name=PAGE_CACHE_NAME)
+        if entry is None:
+            return rendered[-1]
+        return _serve(request, entry)
+    return wrapper
+
+
+def _fresh_reads(version):
+    """
+    Right after a catalog change a replica may not have it yet, and a page rendered from
+    it would be cached under the new version; render such pages from the primary.
+    """
+    if time.time() - version < replicas.PIN_SECONDS:
+        return replicas.primary_only()
+    return nullcontext()
+
+
+def _entry_for(response, version):
+    """Cache entry for a rendered response, or None if it must not be cached."""
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return None
+    body = CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', response.content.decode(response.charset))
+    return {
+        'body': body,
+        'content_type': response['Content-Type'],
+        'etag': '"%s"' % hashlib.sha1(body.encode('utf-8')).hexdigest(),
+        'version': version,
+    }
+
+
+def _serve(request, entry):
+    # A stale page (served while another request re-renders it) keeps its own version
+    version = entry['version']
+    response = get_conditional_response(request, etag=entry['etag'], last_modified=version)
+    if response is None:
+        body = entry['body']
+        if CSRF_PLACEHOLDER in body:
+            body = body.replace(CSRF_PLACEHOLDER, get_token(request))
+        response = HttpResponse(body, content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(version)
+    # Revalidate every time: the body embeds this visitor's CSRF token, so keep it private
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _page_key(request):
+    digest = hashlib.sha1(request.get_full_path().encode('utf-8')).hexdigest()
+    return f"exams:page:{digest}"
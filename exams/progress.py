@@ -0,0 +1,175 @@
+# FILE: exams/progress.py
+
+"""
+Per-user score progression series, downsampled on the server for charts.
+
+Each submitted result appends ProgressPoint rows (score %, accuracy %, time) to the user's
+overall series, the test's category series and one series per subject, from an outbox
+handler after the submission commits. A chart then reads one series with a single range
+scan of (user, scope, key, taken_at) instead of re-aggregating TestResult and UserAnswer.
+
+Long histories are reduced to at most `points` points with largest-triangle-three-buckets
+(LTTB), which keeps the peaks and dips a line chart needs to look right. The reduced series
+is cached per user under a version bumped on every append, so repeat requests cost one
+cache read whatever the length of the history.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import cohort
+from .models import MockTest, ProgressPoint, TestResult
+
+DEFAULT_POINTS = 200
+MAX_POINTS = 1000
+SERIES_CACHE_SECONDS = 24 * 60 * 60
+REBUILD_CHUNK_SIZE = 2000
+
+OVERALL = ProgressPoint.SCOPE_OVERALL
+CATEGORY = ProgressPoint.SCOPE_CATEGORY
+SUBJECT = ProgressPoint.SCOPE_SUBJECT
+SCOPES = {'overall': OVERALL, 'category': CATEGORY, 'subject': SUBJECT}
+
+
+# =========================================================================
+# Appending (after each submission)
+# =========================================================================
+
+def apply_results(result_ids):
+    """Appends the given results to their users' series. Redelivered results are ignored."""
+    if not result_ids:
+        return
+    results = list(TestResult.objects.filter(pk__in=result_ids).values(
+        'pk', 'user_id', 'mock_test_id', 'end_time', 'score', 'max_marks',
+        'correct_answers', 'incorrect_answers', 'time_taken_seconds',
+    ))
+    by_test = {}
+    for result in results:
+        by_test.setdefault(result['mock_test_id'], []).append(result)
+    categories = dict(MockTest.objects.filter(pk__in=by_test).values_list('pk', 'category_id'))
+
+    points = []
+    for test_id, test_results in by_test.items():
+        subject_marks, totals = cohort.result_subject_totals(test_id, [result['pk'] for result in test_results])
+        for result in test_results:
+            whole_test = _point_values(float(result['score']), float(result['max_marks']), result['correct_answers'],
+                                   result['incorrect_answers'], result['time_taken_seconds'])
+            scopes = [(OVERALL, 0, whole_test), (CATEGORY, categories[test_id], whole_test)]
+            for subject_id, (score, correct, incorrect, time_spent) in totals[result['pk']].items():
+                if subject_id is not cohort.OVERALL:
+                    scopes.append((SUBJECT, subject_id, _point_values(score, subject_marks[subject_id], correct,
+                                                                      incorrect, time_spent)))
+            points.extend(
+                ProgressPoint(user_id=result['user_id'], scope=scope, key=key, test_result_id=result['pk'],
+                              taken_at=result['end_time'], score_percent=score_percent, accuracy=accuracy,
+                              time_seconds=time_seconds)
+                for scope, key, (score_percent, accuracy, time_seconds) in scopes
+            )
+    ProgressPoint.objects.bulk_create(points, batch_size=1000, ignore_conflicts=True)
+    user_ids = {result['user_id'] for result in results}
+    # After commit: a reader must not cache the old series under the new version
+    transaction.on_commit(lambda: _bump_versions(user_ids))
+
+
+def _point_values(score, max_marks, correct, incorrect, time_seconds):
+    answered = correct + incorrect
+    return (
+        score * 100.0 / max_marks if max_marks else 0.0,
+        correct * 100.0 / answered if answered else 0.0,
+        time_seconds,
+    )
+
+
+def rebuild(test_id=None, chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    Recomputes series points from TestResult and UserAnswer: every point (backfill), or those
+    of one test's results (after a regrade). Returns the number of results.
+    """
+    points = ProgressPoint.objects.all()
+    results = TestResult.objects.order_by('pk').values_list('pk', flat=True)
+    if test_id is not None:
+        points = points.filter(test_result__mock_test_id=test_id)
+        results = results.filter(mock_test_id=test_id)
+    points.delete()
+    last_pk, applied = 0, 0
+    while True:
+        chunk = list(results.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return applied
+        apply_results(chunk)
+        applied += len(chunk)
+        last_pk = chunk[-1]
+
+
+# =========================================================================
+# Reading
+# =========================================================================
+
+def series(user_id, scope=OVERALL, key=0, points=DEFAULT_POINTS):
+    """
+    The user's series as {'total', 'points': [{'t', 'score', 'accuracy', 'time', 'result_id'}]},
+    oldest first, downsampled to at most `points` points.
+    """
+    points = max(3, min(points, MAX_POINTS))
+    cache_key = f"exams:progress:{user_id}:{_version(user_id)}:{scope}:{key}:{points}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    rows = list(ProgressPoint.objects.filter(user_id=user_id, scope=scope, key=key).order_by('taken_at', 'test_result_id')
+                .values_list('taken_at', 'score_percent', 'accuracy', 'time_seconds', 'test_result_id'))
+    kept = lttb([(taken_at.timestamp(), score) for taken_at, score, *_ in rows], points)
+    data = {
+        'total': len(rows),
+        'points': [
+            {'t': rows[i][0].isoformat(), 'score': round(rows[i][1], 2), 'accuracy': round(rows[i][2], 2),
+             'time': rows[i][3], 'result_id': rows[i][4]}
+            for i in kept
+        ],
+    }
+    cache.set(cache_key, data, SERIES_CACHE_SECONDS)
+    return data
+
+
+def lttb(points, threshold):
+    """
+    Largest-triangle-three-buckets: indexes of at most `threshold` of the (x, y) points,
+    always keeping the first and last. Each bucket keeps the point forming the largest
+    triangle with the point kept before it and the average of the next bucket.
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(range(count))
+    kept = [0]
+    bucket_size = (count - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        next_points = points[end:next_end] or [points[-1]]
+        avg_x = sum(x for x, _ in next_points) / len(next_points)
+        avg_y = sum(y for _, y in next_points) / len(next_points)
+        px, py = points[previous]
+        best_area, best = -1.0, start
+        for i in range(start, end):
+            x, y = points[i]
+            area = abs((px - avg_x) * (y - py) - (px - x) * (avg_y - py))
+            if area > best_area:
+                best_area, best = area, i
+        kept.append(best)
+        previous = best
+    kept.append(count - 1)
+    return kept
+
+
+def _version(user_id):
+    return cache.get(f"exams:progress:version:{user_id}", 0)
+
+
+def _bump_versions(user_ids):
+    for user_id in user_ids:
+        key = f"exams:progress:version:{user_id}"
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
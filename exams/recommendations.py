@@ -0,0 +1,256 @@
+# FILE: exams/recommendations.py
+
+"""
+Weak-area recommendations for the next test.
+
+Performance is kept as a sparse user x subject and user x difficulty matrix (UserPerformance
+rows; only cells a user has touched exist). A user's weakness in a cell is
+1 - smoothed accuracy, with unseen cells at the prior. Each untaken MockTest is scored by
+how much of its question mix falls on the user's weak cells:
+
+    score(test) = sum_s mix_s(test) * weakness_s + DIFFICULTY_WEIGHT * sum_d mix_d(test) * weakness_d
+
+The full rebuild (build_all, `build_recommendations` command) does this as matrix products
+over user chunks with numpy. After each submission an outbox handler adds the result's
+counts to the user's cells and re-scores just that user in pure Python. The top-K test IDs
+are stored in UserRecommendation and the cache; the dashboard reads only those.
+"""
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from . import replicas
+from .models import Question, TestResult, UserAnswer, UserPerformance, UserRecommendation
+
+TOP_K = 5
+DIFFICULTY_WEIGHT = 0.5
+# Beta prior for accuracy smoothing: behaves like PRIOR_STRENGTH questions at PRIOR_ACCURACY
+PRIOR_ACCURACY = 0.5
+PRIOR_STRENGTH = 5.0
+USER_CHUNK_SIZE = 5000
+
+CACHE_TIMEOUT_SECONDS = 24 * 60 * 60
+TEST_MIX_CACHE_KEY = 'exams:recs:test_mix'
+TEST_MIX_CACHE_SECONDS = 60 * 60
+
+SUBJECT = UserPerformance.DIMENSION_SUBJECT
+DIFFICULTY = UserPerformance.DIMENSION_DIFFICULTY
+
+
+def for_user(user_id):
+    """Recommended MockTest IDs for the dashboard; never touches the answer tables."""
+    test_ids = cache.get(_cache_key(user_id))
+    if test_ids is None:
+        test_ids = UserRecommendation.objects.filter(user_id=user_id).values_list('test_ids', flat=True).first() or []
+        cache.set(_cache_key(user_id), test_ids, CACHE_TIMEOUT_SECONDS)
+    return test_ids
+
+
+# =========================================================================
+# TEST MIX (columns of the scoring product)
+# =========================================================================
+
+def test_mix(refresh=False):
+    """
+    {test_id: {(dimension, key): fraction of the test's questions}} for all tests, from one
+    GROUP BY over Question, cached for TEST_MIX_CACHE_SECONDS.
+    """
+    mix = None if refresh else cache.get(TEST_MIX_CACHE_KEY)
+    if mix is not None:
+        return mix
+    counts = {}
+    rows = Question.objects.values('mock_test_id', 'subject_id', 'difficulty').annotate(n=Count('id'))
+    for row in rows:
+        test_counts = counts.setdefault(row['mock_test_id'], {})
+        if row['subject_id'] is not None:
+            cell = (SUBJECT, str(row['subject_id']))
+            test_counts[cell] = test_counts.get(cell, 0) + row['n']
+        cell = (DIFFICULTY, row['difficulty'])
+        test_counts[cell] = test_counts.get(cell, 0) + row['n']
+    mix = {}
+    for test_id, test_counts in counts.items():
+        totals = {SUBJECT: 0, DIFFICULTY: 0}
+        for (dimension, _), n in test_counts.items():
+            totals[dimension] += n
+        mix[test_id] = {cell: n / totals[cell[0]] for cell, n in test_counts.items() if totals[cell[0]]}
+    cache.set(TEST_MIX_CACHE_KEY, mix, TEST_MIX_CACHE_SECONDS)
+    return mix
+
+
+def _weakness(correct, questions):
+    return 1.0 - (correct + PRIOR_ACCURACY * PRIOR_STRENGTH) / (questions + PRIOR_STRENGTH)
+
+
+# =========================================================================
+# INCREMENTAL PATH (after each submission)
+# =========================================================================
+
+def apply_results(result_ids):
+    """
+    Adds the given results' per-subject/difficulty counts to their users' cells and
+    re-scores those users. Runs inside the outbox dispatcher's transaction.
+    """
+    if not result_ids:
+        return
+    deltas = {}  # (user_id, dimension, key) -> [questions, correct]
+    answers = UserAnswer.objects.filter(test_result_id__in=result_ids) \
+        .values_list('test_result__user_id', 'question__subject_id', 'question__difficulty', 'is_correct')
+    for user_id, subject_id, difficulty, is_correct in answers:
+        cells = [(user_id, DIFFICULTY, difficulty)]
+        if subject_id is not None:
+            cells.append((user_id, SUBJECT, str(subject_id)))
+        for cell in cells:
+            delta = deltas.setdefault(cell, [0, 0])
+            delta[0] += 1
+            delta[1] += 1 if is_correct else 0
+
+    user_ids = sorted({cell[0] for cell in deltas})
+    existing = {
+        (p.user_id, p.dimension, p.key): p
+        for p in UserPerformance.objects.select_for_update().filter(user_id__in=user_ids).order_by('pk')
+    }
+    to_create, to_update = [], []
+    for cell, (questions, correct) in deltas.items():
+        performance = existing.get(cell)
+        if performance is None:
+            performance = UserPerformance(user_id=cell[0], dimension=cell[1], key=cell[2])
+            existing[cell] = performance
+            to_create.append(performance)
+        else:
+            to_update.append(performance)
+        performance.questions += questions
+        performance.correct += correct
+    UserPerformance.objects.bulk_create(to_create)
+    UserPerformance.objects.bulk_update(to_update, ['questions', 'correct'])
+
+    mix = test_mix()
+    taken = _taken_tests(user_ids)
+    profiles = {}
+    for (user_id, dimension, key), performance in existing.items():
+        profiles.setdefault(user_id, {})[(dimension, key)] = _weakness(performance.correct, performance.questions)
+    _store({user_id: _score_user(profiles.get(user_id, {}), mix, taken.get(user_id, set())) for user_id in user_ids})
+
+
+def _score_user(profile, mix, taken):
+    prior = _weakness(0, 0)
+    scored = []
+    for test_id, fractions in mix.items():
+        if test_id in taken:
+            continue
+        score = 0.0
+        for cell, fraction in fractions.items():
+            weight = DIFFICULTY_WEIGHT if cell[0] == DIFFICULTY else 1.0
+            score += weight * fraction * profile.get(cell, prior)
+        scored.append((score, test_id))
+    scored.sort(key=lambda item: (-item[0], -item[1]))
+    return [test_id for _, test_id in scored[:TOP_K]]
+
+
+def _taken_tests(user_ids):
+    taken = {}
+    for user_id, test_id in TestResult.objects.filter(user_id__in=user_ids) \
+            .values_list('user_id', 'mock_test_id').distinct():
+        taken.setdefault(user_id, set()).add(test_id)
+    return taken
+
+
+def _store(recommendations):
+    # Read on the primary: a lagging replica could hide rows and cause duplicate inserts
+    with replicas.primary_only():
+        existing = {r.user_id: r for r in UserRecommendation.objects.filter(user_id__in=recommendations.keys())}
+    to_create, to_update = [], []
+    for user_id, test_ids in recommendations.items():
+        record = existing.get(user_id)
+        if record is None:
+            to_create.append(UserRecommendation(user_id=user_id, test_ids=test_ids))
+        else:
+            record.test_ids = test_ids
+            to_update.append(record)
+    UserRecommendation.objects.bulk_create(to_create)
+    UserRecommendation.objects.bulk_update(to_update, ['test_ids', 'computed_at'])
+    cache.set_many({_cache_key(user_id): test_ids for user_id, test_ids in recommendations.items()}, CACHE_TIMEOUT_SECONDS)
+
+
+# =========================================================================
+# BATCH PATH (full rebuild, vectorized)
+# =========================================================================
+
+def rebuild_performance():
+    """Recomputes every UserPerformance cell from UserAnswer with two GROUP BY queries."""
+    UserPerformance.objects.all().delete()
+    correct = Count('id', filter=Q(is_correct=True))
+    cells = []
+    for row in UserAnswer.objects.filter(question__subject__isnull=False) \
+            .values('test_result__user_id', 'question__subject_id').annotate(n=Count('id'), c=correct).order_by():
+        cells.append(UserPerformance(user_id=row['test_result__user_id'], dimension=SUBJECT,
+                                     key=str(row['question__subject_id']), questions=row['n'], correct=row['c']))
+    for row in UserAnswer.objects.values('test_result__user_id', 'question__difficulty') \
+            .annotate(n=Count('id'), c=correct).order_by():
+        cells.append(UserPerformance(user_id=row['test_result__user_id'], dimension=DIFFICULTY,
+                                     key=row['question__difficulty'], questions=row['n'], correct=row['c']))
+    UserPerformance.objects.bulk_create(cells, batch_size=5000)
+    return len(cells)
+
+
+def build_all(chunk_size=USER_CHUNK_SIZE):
+    """
+    Scores every user against every test: W (users x cells) @ M.T (cells x tests), masked by
+    taken tests, top-K by argpartition. Users are processed in chunks so the dense
+    users x tests block stays bounded. Returns the number of users scored.
+    """
+    import numpy as np  # batch-only dependency; the web path never imports it
+
+    mix = test_mix(refresh=True)
+    test_ids = sorted(mix)
+    cells = sorted({cell for fractions in mix.values() for cell in fractions})
+    if not test_ids or not cells:
+        return 0
+    cell_index = {cell: i for i, cell in enumerate(cells)}
+    test_index = {test_id: i for i, test_id in enumerate(test_ids)}
+
+    # M: tests x cells, difficulty columns pre-weighted
+    M = np.zeros((len(test_ids), len(cells)))
+    for test_id, fractions in mix.items():
+        for cell, fraction in fractions.items():
+            M[test_index[test_id], cell_index[cell]] = fraction * (DIFFICULTY_WEIGHT if cell[0] == DIFFICULTY else 1.0)
+    test_id_array = np.array(test_ids)
+
+    user_ids = UserPerformance.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+    scored_users = 0
+    last_user_id = 0
+    while True:
+        chunk = list(user_ids.filter(user_id__gt=last_user_id)[:chunk_size])
+        if not chunk:
+            break
+        last_user_id = chunk[-1]
+        row_index = {user_id: i for i, user_id in enumerate(chunk)}
+
+        # Q, C: users x cells question/correct counts (sparse cells filled in)
+        Qm = np.zeros((len(chunk), len(cells)))
+        Cm = np.zeros((len(chunk), len(cells)))
+        for user_id, dimension, key, questions, correct in UserPerformance.objects.filter(user_id__in=chunk) \
+                .values_list('user_id', 'dimension', 'key', 'questions', 'correct'):
+            column = cell_index.get((dimension, key))
+            if column is not None:
+                Qm[row_index[user_id], column] = questions
+                Cm[row_index[user_id], column] = correct
+        W = 1.0 - (Cm + PRIOR_ACCURACY * PRIOR_STRENGTH) / (Qm + PRIOR_STRENGTH)
+
+        scores = W @ M.T  # users x tests
+        for user_id, test_id in TestResult.objects.filter(user_id__in=chunk).values_list('user_id', 'mock_test_id').distinct():
+            if test_id in test_index:
+                scores[row_index[user_id], test_index[test_id]] = -np.inf
+
+        k = min(TOP_K, len(test_ids))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        recommendations = {}
+        for user_id, i in row_index.items():
+            candidates = top[i][np.argsort(-scores[i, top[i]], kind='stable')]
+            recommendations[user_id] = [int(test_id_array[j]) for j in candidates if np.isfinite(scores[i, j])]
+        _store(recommendations)
+        scored_users += len(chunk)
+    return scored_users
+
+
+def _cache_key(user_id):
+    return f"exams:recs:{user_id}"
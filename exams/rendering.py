@@ -0,0 +1,306 @@
+# FILE: exams/rendering.py
+
+"""
+Question, option and solution text converted to final HTML once, when it is imported or
+saved, instead of on every page view.
+
+The imported sources are pasted from PDFs and word processors: zero-width spaces, NBSPs,
+caret powers ("11^2"), unit vectors ("3i^+4j^"), and inline LaTeX ("$\\frac{v}{t}$").
+render() normalizes the text, keeps a small allow-list of formatting tags (no attributes),
+escapes everything else, and turns the math into <sup>/<sub> or MathML. Results are stored
+in Question.text_html / solution_html and Option.text_html together with
+Question.render_version; bump RENDERER_VERSION whenever the output changes and run
+`manage.py render_question_html` to re-render the stored fragments.
+"""
+
+import html
+import re
+import unicodedata
+from html.parser import HTMLParser
+
+RENDERER_VERSION = 1
+
+# Formatting kept from the source (attributes are always dropped); other tags are removed
+ALLOWED_TAGS = {'b', 'strong', 'i', 'em', 'u', 'sup', 'sub', 'br', 'p', 'ul', 'ol', 'li', 'code', 'pre'}
+VOID_TAGS = {'br'}
+# Tags whose content is dropped along with the tag
+DROPPED_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'template'}
+
+_INVISIBLE = dict.fromkeys(map(ord, '\u200b\u200c\u200d\u2060\ufeff\u00ad'))
+_SPACES = {0x00a0: ' ', 0x202f: ' ', 0x2009: ' ', 0x2007: ' '}
+
+# Inline ($...$, \(...\)) and display ($$...$$, \[...\]) LaTeX. As in Pandoc, "$" only opens
+# math before a non-space and only closes it after one, so prices ("$5 or $10") stay text.
+_MATH = re.compile(r'\$\$(.+?)\$\$|\\\[(.+?)\\\]|\$(?=\S)(.+?)(?<=\S)\$(?!\d)|\\\((.+?)\\\)', re.S)
+# "i^" / "j^" / "k^" not followed by an exponent are unit vectors (î, ĵ, k̂)
+_UNIT_VECTOR = re.compile(r'(?<![A-Za-z])([ijk])\^(?![\w({])')
+_POWER = re.compile(r'(?<=[\w)\]])\^(?:\{([^{}]*)\}|\(([^()]*)\)|(-?\d+(?:\.\d+)?|[A-Za-z]\b))')
+_SUBSCRIPT = re.compile(r'(?<=[A-Za-z])_(?:\{([^{}]*)\}|(\d+))')
+
+
+def render(text):
+    """Final, sanitized HTML for one question, option or solution text ('' for empty text)."""
+    if not text:
+        return ''
+    parser = _Sanitizer()
+    parser.feed(normalize(text))
+    parser.close()
+    return ''.join(parser.out).strip()
+
+
+def normalize(text):
+    """NFC text without zero-width characters and with unusual spaces made plain."""
+    return unicodedata.normalize('NFC', text).translate(_INVISIBLE).translate(_SPACES)
+
+
+def prerender_question(question):
+    """Fills a Question's pre-rendered fields in place (nothing is saved)."""
+    question.text_html = render(question.text)
+    question.solution_html = render(question.solution)
+    question.render_version = RENDERER_VERSION
+    return question
+
+
+def prerender_option(option):
+    option.text_html = render(option.text)
+    return option
+
+
+# =========================================================================
+# Sanitizing
+# =========================================================================
+
+class _Sanitizer(HTMLParser):
+    """Re-emits allow-listed tags without attributes; all text goes through render_text()."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open_tags = []
+        self.dropping = 0
+        self.pending = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_CONTENT_TAGS:
+            self.dropping += 1
+        elif tag in ALLOWED_TAGS and not self.dropping:
+            self._flush()
+            self.out.append(f'<{tag}>')
+            if tag not in VOID_TAGS:
+                self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in VOID_TAGS and not self.dropping:
+            self._flush()
+            self.out.append(f'<{tag}>')
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+        elif tag in self.open_tags and not self.dropping:
+            self._flush()
+            # Close anything left open inside it, so the fragment stays well-formed
+            while self.open_tags:
+                open_tag = self.open_tags.pop()
+                self.out.append(f'</{open_tag}>')
+                if open_tag == tag:
+                    break
+
+    def handle_data(self, data):
+        # Text is buffered so a formula split by an entity or comment is still seen whole
+        if not self.dropping:
+            self.pending.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+        while self.open_tags:
+            self.out.append(f'</{self.open_tags.pop()}>')
+
+    def _flush(self):
+        if self.pending:
+            self.out.append(render_text(''.join(self.pending)))
+            self.pending = []
+
+
+def render_text(text):
+    """HTML for plain (already unescaped) text: LaTeX to MathML, caret/underscore math to tags."""
+    out = []
+    position = 0
+    for match in _MATH.finditer(text):
+        out.append(_render_plain(text[position:match.start()]))
+        display_source, bracket_source, inline_source, paren_source = match.groups()
+        source = display_source or bracket_source or inline_source or paren_source
+        out.append(tex_to_mathml(source, display=bool(display_source or bracket_source))
+                   or html.escape(match.group(0), quote=False))
+        position = match.end()
+    out.append(_render_plain(text[position:]))
+    return ''.join(out)
+
+
+def _render_plain(text):
+    text = html.escape(text, quote=False)
+    text = _UNIT_VECTOR.sub('\\1\u0302', text)
+    text = _POWER.sub(lambda m: f'<sup>{next(g for g in m.groups() if g is not None)}</sup>', text)
+    return _SUBSCRIPT.sub(lambda m: f'<sub>{next(g for g in m.groups() if g is not None)}</sub>', text)
+
+
+# =========================================================================
+# LaTeX subset to MathML
+# =========================================================================
+
+_TEX_TOKEN = re.compile(r'\\[A-Za-z]+|\\.|\d+(?:\.\d+)?|\s+|.', re.S)
+
+_TEX_SYMBOLS = {
+    # Operators and relations
+    'times': ('mo', '×'), 'cdot': ('mo', '⋅'), 'div': ('mo', '÷'), 'pm': ('mo', '±'), 'mp': ('mo', '∓'),
+    'leq': ('mo', '≤'), 'le': ('mo', '≤'), 'geq': ('mo', '≥'), 'ge': ('mo', '≥'), 'neq': ('mo', '≠'),
+    'ne': ('mo', '≠'), 'approx': ('mo', '≈'), 'sim': ('mo', '∼'), 'equiv': ('mo', '≡'), 'propto': ('mo', '∝'),
+    'to': ('mo', '→'), 'rightarrow': ('mo', '→'), 'leftarrow': ('mo', '←'), 'Rightarrow': ('mo', '⇒'),
+    'leftrightarrow': ('mo', '↔'), 'rightleftharpoons': ('mo', '⇌'), 'in': ('mo', '∈'), 'cup': ('mo', '∪'),
+    'cap': ('mo', '∩'), 'subset': ('mo', '⊂'), 'sum': ('mo', '∑'), 'prod': ('mo', '∏'), 'int': ('mo', '∫'),
+    'oint': ('mo', '∮'), 'partial': ('mo', '∂'), 'nabla': ('mo', '∇'), 'circ': ('mo', '∘'), 'degree': ('mo', '°'),
+    'angle': ('mo', '∠'), 'perp': ('mo', '⊥'), 'parallel': ('mo', '∥'), 'infty': ('mi', '∞'),
+    'ldots': ('mo', '…'), 'cdots': ('mo', '⋯'), ',': ('mspace', ''), ';': ('mspace', ''), ' ': ('mspace', ''),
+    'quad': ('mspace', ''), '%': ('mo', '%'), '{': ('mo', '{'), '}': ('mo', '}'), '$': ('mo', '$'),
+    # Greek letters
+    'alpha': ('mi', 'α'), 'beta': ('mi', 'β'), 'gamma': ('mi', 'γ'), 'delta': ('mi', 'δ'), 'epsilon': ('mi', 'ϵ'),
+    'varepsilon': ('mi', 'ε'), 'zeta': ('mi', 'ζ'), 'eta': ('mi', 'η'), 'theta': ('mi', 'θ'), 'iota': ('mi', 'ι'),
+    'kappa': ('mi', 'κ'), 'lambda': ('mi', 'λ'), 'mu': ('mi', 'μ'), 'nu': ('mi', 'ν'), 'xi': ('mi', 'ξ'),
+    'pi': ('mi', 'π'), 'rho': ('mi', 'ρ'), 'sigma': ('mi', 'σ'), 'tau': ('mi', 'τ'), 'phi': ('mi', 'ϕ'),
+    'varphi': ('mi', 'φ'), 'chi': ('mi', 'χ'), 'psi': ('mi', 'ψ'), 'omega': ('mi', 'ω'),
+    'Gamma': ('mi', 'Γ'), 'Delta': ('mi', 'Δ'), 'Theta': ('mi', 'Θ'), 'Lambda': ('mi', 'Λ'), 'Pi': ('mi', 'Π'),
+    'Sigma': ('mi', 'Σ'), 'Phi': ('mi', 'Φ'), 'Psi': ('mi', 'Ψ'), 'Omega': ('mi', 'Ω'),
+}
+_TEX_FUNCTIONS = {'sin', 'cos', 'tan', 'cot', 'sec', 'csc', 'log', 'ln', 'exp', 'lim', 'max', 'min'}
+_TEX_ACCENTS = {'vec': '→', 'hat': '^', 'bar': '¯', 'overline': '¯', 'dot': '˙', 'tilde': '~'}
+_TEX_TEXT = {'text', 'mathrm', 'textrm', 'mbox', 'operatorname'}
+# Sizing commands with no MathML counterpart; the delimiter after them is kept
+_TEX_IGNORED = {'left', 'right', 'displaystyle', 'big', 'Big', 'bigg', 'Bigg', 'limits'}
+
+
+class TexError(ValueError):
+    """The formula uses LaTeX outside the supported subset (it is then shown as typed)."""
+
+
+def tex_to_mathml(source, display=False):
+    """MathML for a LaTeX formula, or None when it cannot be converted."""
+    try:
+        body = _TexParser(source).parse()
+    except TexError:
+        return None
+    mode = ' display="block"' if display else ''
+    return f'<math{mode}><mrow>{body}</mrow></math>'
+
+
+class _TexParser:
+    def __init__(self, source):
+        self.tokens = _TEX_TOKEN.findall(source)
+        self.position = 0
+
+    def parse(self):
+        body = self._sequence()
+        if self.position < len(self.tokens):
+            raise TexError(f"unbalanced '{self.tokens[self.position]}'")
+        return body
+
+    def _peek(self):
+        while self.position < len(self.tokens) and self.tokens[self.position].isspace():
+            self.position += 1
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _take(self):
+        token = self._peek()
+        if token is None:
+            raise TexError("unexpected end of formula")
+        self.position += 1
+        return token
+
+    def _sequence(self):
+        parts = []
+        while self._peek() not in (None, '}'):
+            parts.append(self._scripts(self._atom()))
+        return ''.join(parts)
+
+    def _scripts(self, base):
+        sub = sup = None
+        while self._peek() in ('^', '_'):
+            if self._take() == '^':
+                sup = self._argument()
+            else:
+                sub = self._argument()
+        if sub is not None and sup is not None:
+            return f'<msubsup>{base}{sub}{sup}</msubsup>'
+        if sup is not None:
+            return f'<msup>{base}{sup}</msup>'
+        if sub is not None:
+            return f'<msub>{base}{sub}</msub>'
+        return base
+
+    def _argument(self):
+        """A braced group or a single atom (exponents, fractions, roots...)."""
+        if self._peek() == '{':
+            self._take()
+            body = self._sequence()
+            if self._take() != '}':
+                raise TexError("missing '}'")
+            return f'<mrow>{body}</mrow>'
+        return self._atom()
+
+    def _raw_argument(self):
+        """The literal text of a braced group, for \\text{...}."""
+        if self._take() != '{':
+            raise TexError("expected '{'")
+        depth, parts = 1, []
+        while self.position < len(self.tokens):
+            token = self.tokens[self.position]
+            self.position += 1
+            depth += token == '{'
+            depth -= token == '}'
+            if depth == 0:
+                return ''.join(parts)
+            parts.append(token[1:] if token in ('\\{', '\\}', '\\%', '\\$') else token)
+        raise TexError("missing '}'")
+
+    def _atom(self):
+        token = self._take()
+        if token == '{':
+            self.position -= 1
+            return self._argument()
+        if token in ('}', '^', '_'):
+            raise TexError(f"unexpected '{token}'")
+        if token.startswith('\\'):
+            return self._command(token[1:])
+        escaped = html.escape(token, quote=False)
+        if token[0].isdigit():
+            return f'<mn>{escaped}</mn>'
+        if token.isalpha():
+            return f'<mi>{escaped}</mi>'
+        return f'<mo>{escaped}</mo>'
+
+    def _command(self, name):
+        if name == 'frac':
+            return f'<mfrac>{self._argument()}{self._argument()}</mfrac>'
+        if name == 'sqrt':
+            if self._peek() == '[':
+                self._take()
+                index = []
+                while self._peek() != ']':
+                    index.append(self._scripts(self._atom()))
+                self._take()
+                return f'<mroot>{self._argument()}<mrow>{"".join(index)}</mrow></mroot>'
+            return f'<msqrt>{self._argument()}</msqrt>'
+        if name in _TEX_ACCENTS:
+            return f'<mover accent="true">{self._argument()}<mo>{_TEX_ACCENTS[name]}</mo></mover>'
+        if name in _TEX_TEXT:
+            return f'<mtext>{html.escape(self._raw_argument(), quote=False)}</mtext>'
+        if name in _TEX_FUNCTIONS:
+            return f'<mi>{name}</mi><mo>\u2061</mo>'
+        if name in _TEX_IGNORED:
+            return ''
+        if name in _TEX_SYMBOLS:
+            element, symbol = _TEX_SYMBOLS[name]
+            if element == 'mspace':
+                return '<mspace width="0.3em"></mspace>'
+            return f'<{element}>{symbol}</{element}>'
+        raise TexError(f"unsupported command '\\{name}'")
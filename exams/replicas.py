@@ -0,0 +1,167 @@
+# FILE: exams/replicas.py
+
+"""
+Read-replica routing with read-your-writes consistency.
+
+Reads go to a replica only where code opts in: views decorated with @read_replica and code
+running inside `with using_replica():` (export and analytics commands). Everything else,
+including every write and every read inside a transaction on the primary, stays on
+`default`, so the submit flow can never read stale rows.
+
+Read-your-writes: after a user submits, pin_user() pins them to the primary for
+EXAMS_REPLICA_PIN_SECONDS (shared cache), so the results page they are redirected to
+never 404s because of replication lag. A replica that cannot be connected to is skipped for
+EXAMS_REPLICA_RETRY_SECONDS, and reads fall back to the primary.
+
+Configuration:
+
+    DATABASES = {'default': {...primary...}, 'replica1': {...}}
+    DATABASE_ROUTERS = ['exams.replicas.ReplicaRouter']
+    EXAMS_READ_REPLICAS = ['replica1']
+
+With EXAMS_READ_REPLICAS empty (the default) the router routes everything to `default`.
+Locally, two SQLite files can stand in: add a 'replica' entry with its own NAME, run
+`migrate --database=replica`, and copy the primary file over it to "replicate".
+"""
+
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+PIN_SECONDS = getattr(settings, 'EXAMS_REPLICA_PIN_SECONDS', 15)
+RETRY_SECONDS = getattr(settings, 'EXAMS_REPLICA_RETRY_SECONDS', 30)
+
+# Sessions and users must be read back right after login/signup, so they never use a replica
+PRIMARY_ONLY_APPS = {'auth', 'sessions', 'contenttypes', 'admin'}
+
+# True while the current request/job may read from a replica
+_replica_allowed = contextvars.ContextVar('exams_replica_allowed', default=False)
+# alias -> time.monotonic() before which the replica is considered down
+_down_until = {}
+
+
+def replica_aliases():
+    return list(getattr(settings, 'EXAMS_READ_REPLICAS', []))
+
+
+def healthy(alias):
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    connection = connections[alias]
+    if connection.connection is None:
+        try:
+            connection.ensure_connection()
+        except OperationalError:
+            _down_until[alias] = time.monotonic() + RETRY_SECONDS
+            return False
+    _down_until.pop(alias, None)
+    return True
+
+
+def choose_replica():
+    """A healthy replica alias at random, or None to use the primary."""
+    candidates = replica_aliases()
+    random.shuffle(candidates)
+    for alias in candidates:
+        if healthy(alias):
+            return alias
+    return None
+
+
+class ReplicaRouter:
+    """Sends opted-in reads to a replica; writes, transactions and everything else to default."""
+
+    def db_for_read(self, model, **hints):
+        if not _replica_allowed.get() or model._meta.app_label in PRIMARY_ONLY_APPS \
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return choose_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+@contextmanager
+def using_replica():
+    """Lets reads in the block go to a replica (jobs, commands)."""
+    token = _replica_allowed.set(True)
+    try:
+        yield
+    finally:
+        _replica_allowed.reset(token)
+
+
+@contextmanager
+def primary_only():
+    """Forces reads in the block onto the primary, overriding an enclosing opt-in."""
+    token = _replica_allowed.set(False)
+    try:
+        yield
+    finally:
+        _replica_allowed.reset(token)
+
+
+# =========================================================================
+# READ-YOUR-WRITES PINNING
+# =========================================================================
+
+def pin_user(user_id):
+    """Keeps the user's reads on the primary for PIN_SECONDS (call after their writes commit)."""
+    if replica_aliases():
+        cache.set(_pin_key(user_id), 1, PIN_SECONDS)
+
+
+def pin_users(user_ids):
+    if replica_aliases() and user_ids:
+        cache.set_many({_pin_key(user_id): 1 for user_id in user_ids}, PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return bool(user_id) and cache.get(_pin_key(user_id)) is not None
+
+
+def _pin_key(user_id):
+    return f"exams:replica_pin:{user_id}"
+
+
+def read_replica(view_func):
+    """
+    View decorator: the view's reads may use a replica unless the user is pinned to the
+    primary. Works on sync and async views; place it inside login/cache decorators
+    (below @login_required and @cache_anonymous_page), so cache hits skip the pin lookup.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if not replica_aliases():
+                return await view_func(request, *args, **kwargs)
+            user = await request.auser()
+            pinned = user.is_authenticated and await cache.aget(_pin_key(user.pk)) is not None
+            token = _replica_allowed.set(not pinned)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _replica_allowed.reset(token)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not replica_aliases():
+            return view_func(request, *args, **kwargs)
+        token = _replica_allowed.set(not is_pinned(request.user.pk))
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _replica_allowed.reset(token)
+    return wrapper
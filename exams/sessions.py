@@ -0,0 +1,195 @@
+# FILE: exams/sessions.py
+
+"""
+Cache-first session store with buffered database writes (SESSION_ENGINE = 'exams.sessions').
+
+Django's cached_db store already reads sessions from the cache, but it still writes every
+modified session to the database inside the request. During a live exam most requests
+touch the session (answer autosaves, timer state), so this store keeps the cache as the
+primary copy and writes the database behind it:
+
+- Creating a session (login, cycle_key), saving it again in the request that created it,
+  and deleting one (logout) go straight to the database and the cache, so a session and
+  its login exist everywhere as soon as the cookie is issued and are gone everywhere once
+  the user logs out.
+- Saving an existing session updates the cache immediately and buffers the encoded data in
+  the process; buffered sessions are written in one bulk UPDATE every
+  EXAMS_SESSION_FLUSH_SECONDS (checked on each save and at the end of each request).
+- The flush only updates rows that still exist, so a late flush can never bring back a
+  session that another worker has deleted.
+- Deleting a session also leaves a tombstone in the cache. A buffered save that finds it
+  (checked after its cache write, so a concurrent delete cannot slip between the two)
+  drops its cache entry and raises UpdateError, as cached_db does when the row is gone.
+
+The database copy is the fallback for cache misses (eviction, cache restart) and can lag the
+cache by up to the flush interval; a worker that dies loses only its buffered writes, which
+the cache still holds. SESSION_CACHE_ALIAS must name a cache shared by all workers in
+production (Redis/memcached); the default local-memory cache works for development and tests
+with a single process.
+"""
+
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.models import Session
+from django.core.signals import request_finished
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = getattr(settings, 'EXAMS_SESSION_FLUSH_SECONDS', 10)
+KEY_PREFIX = 'exams:session:'
+TOMBSTONE_PREFIX = 'exams:session-deleted:'
+
+_lock = threading.Lock()
+_pending = {}  # session_key -> (encoded session data, expire_date)
+_last_flush = time.monotonic()
+# Process-local counters for exams.auth.stats(): loads (and those that missed the cache),
+# buffered saves and the rows flushes actually wrote
+counts = {'loads': 0, 'db_loads': 0, 'buffered_saves': 0, 'db_writes': 0}
+
+
+class SessionStore(cached_db.SessionStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def load(self):
+        counts['loads'] += 1
+        return super().load()
+
+    async def aload(self):
+        counts['loads'] += 1
+        return await super().aload()
+
+    def _get_session_from_db(self):
+        counts['db_loads'] += 1
+        return super()._get_session_from_db()
+
+    async def _aget_session_from_db(self):
+        counts['db_loads'] += 1
+        return await super()._aget_session_from_db()
+
+    def create(self):
+        super().create()
+        # Whatever the request then stores in a new session (login() sets the auth keys right
+        # after cycle_key()) is written through as well, so losing the cache never logs anyone out
+        self._created_here = True
+
+    async def acreate(self):
+        await super().acreate()
+        self._created_here = True
+
+    def save(self, must_create=False):
+        if self.session_key is None or must_create or getattr(self, '_created_here', False):
+            # New sessions are written through (create() relies on the INSERT to detect key collisions)
+            return super().save(must_create)
+        self._buffer()
+        try:
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+        except Exception:
+            logger.exception("Error saving session to cache (%s)", self._cache)
+        if self._cache.get(TOMBSTONE_PREFIX + self.session_key) is not None:
+            # Deleted by another worker (logout): it must not live on in the cache
+            _discard(self.session_key)
+            self._cache.delete(self.cache_key)
+            raise UpdateError
+        flush_if_due()
+
+    async def asave(self, must_create=False):
+        if self.session_key is None or must_create or getattr(self, '_created_here', False):
+            return await super().asave(must_create)
+        self._buffer()
+        try:
+            await self._cache.aset(await self.acache_key(), self._session, await self.aget_expiry_age())
+        except Exception:
+            logger.exception("Error saving session to cache (%s)", self._cache)
+        if await self._cache.aget(TOMBSTONE_PREFIX + self.session_key) is not None:
+            _discard(self.session_key)
+            await self._cache.adelete(await self.acache_key())
+            raise UpdateError
+        if flush_due():
+            await sync_to_async(flush)()
+
+    def delete(self, session_key=None):
+        session_key = session_key or self.session_key
+        if session_key:
+            # Before the cache entry goes, so a concurrent buffered save either sees it or is overwritten
+            self._cache.set(TOMBSTONE_PREFIX + session_key, 1, settings.SESSION_COOKIE_AGE)
+        _discard(session_key)
+        super().delete(session_key)
+
+    async def adelete(self, session_key=None):
+        session_key = session_key or self.session_key
+        if session_key:
+            await self._cache.aset(TOMBSTONE_PREFIX + session_key, 1, settings.SESSION_COOKIE_AGE)
+        _discard(session_key)
+        await super().adelete(session_key)
+
+    def _buffer(self):
+        entry = (self.encode(self._get_session()), self.get_expiry_date())
+        with _lock:
+            _pending[self.session_key] = entry
+        counts['buffered_saves'] += 1
+
+    @classmethod
+    def clear_expired(cls):
+        flush()
+        super().clear_expired()
+
+
+def _discard(session_key):
+    if session_key:
+        with _lock:
+            _pending.pop(session_key, None)
+
+
+def flush_due():
+    return bool(_pending) and time.monotonic() - _last_flush >= FLUSH_INTERVAL_SECONDS
+
+
+def flush_if_due(**kwargs):
+    """Flushes if the interval has elapsed. Usable directly as a signal receiver."""
+    if flush_due():
+        try:
+            flush()
+        except Exception:
+            # The entries are back in the buffer; a failed flush must not fail the request
+            logger.exception("Session flush failed")
+
+
+def pending_count():
+    with _lock:
+        return len(_pending)
+
+
+def flush():
+    """Writes every buffered session in bulk UPDATEs. Returns the number of rows updated."""
+    global _last_flush
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not batch:
+        return 0
+    try:
+        # UPDATE only, for rows that still exist: a session deleted elsewhere must stay deleted
+        existing = Session.objects.filter(pk__in=batch.keys()).values_list('pk', flat=True)
+        sessions = [Session(session_key=session_key, session_data=batch[session_key][0], expire_date=batch[session_key][1])
+                    for session_key in existing]
+        Session.objects.bulk_update(sessions, ['session_data', 'expire_date'], batch_size=500)
+    except Exception:
+        # Put the sessions back unless a newer save has buffered them again
+        with _lock:
+            for session_key, entry in batch.items():
+                _pending.setdefault(session_key, entry)
+        raise
+    counts['db_writes'] += len(sessions)
+    return len(sessions)
+
+
+def connect_signals():
+    """Called from ExamsConfig.ready(): buffered sessions are flushed at the end of requests once due."""
+    request_finished.connect(flush_if_due, dispatch_uid='exams_sessions_flush')
@@ -0,0 +1,228 @@
+# FILE: exams/similarity.py
+
+"""
+Near-duplicate question search with MinHash signatures and locality-sensitive hashing.
+
+A question is reduced to the set of its word 3-shingles (question text plus each option,
+so reordered options still match). Its MinHash signature keeps, for NUM_PERM hash
+functions, the smallest hash of any shingle; the fraction of equal positions between two
+signatures estimates the Jaccard similarity of their shingle sets. Signatures are cut into
+BANDS bands of ROWS values and each band is hashed into a bucket (QuestionBucket): two
+questions become candidates when any band matches, which with 16 bands of 8 rows catches
+~95% of pairs at 0.8 similarity and ~6% at 0.5. A lookup is one indexed query on
+(band, bucket) plus a signature check of the candidates, whatever the size of the bank.
+
+Only original questions are indexed; copies made by exams.assembly are duplicates on purpose.
+Imports index what they load and report near-copies (check_new_questions()); the admin and
+`manage.py find_similar_questions` search the index. rebuild() re-indexes the whole bank
+in vectorized chunks (needs numpy).
+"""
+
+import hashlib
+import itertools
+import random
+import re
+import struct
+import unicodedata
+import zlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from . import rendering
+from .models import Option, Question, QuestionBucket, QuestionFingerprint
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+# Estimated Jaccard similarity from which two questions are reported as near-duplicates
+THRESHOLD = getattr(settings, 'EXAMS_SIMILARITY_THRESHOLD', 0.8)
+# Candidates checked per lookup; boilerplate buckets ("None of these") can be huge
+MAX_CANDIDATES = 1000
+# all_pairs() skips buckets shared by more questions than this (boilerplate, not copies)
+MAX_BUCKET_SIZE = 200
+REBUILD_CHUNK_SIZE = 500
+BULK_BATCH_SIZE = 1000
+
+# Universal hashing (a*x + b) mod p. a < 2**31 and x < 2**32 keep a*x + b within uint64,
+# so the numpy path in rebuild() computes exactly the same values as signature().
+_PRIME = (1 << 61) - 1
+_random = random.Random(0x5EED)
+_A = [_random.randrange(1, 1 << 31) for _ in range(NUM_PERM)]
+_B = [_random.randrange(0, 1 << 32) for _ in range(NUM_PERM)]
+_SIGNATURE = struct.Struct(f'<{NUM_PERM}I')
+_WORD = re.compile(r'\w+')
+
+Match = namedtuple('Match', 'question_id similar_id score')
+
+
+def shingles(text, options=()):
+    """CRC32 hashes of the word 3-shingles of a question's text and of each option."""
+    hashes = set()
+    for part in (text, *options):
+        words = _WORD.findall(unicodedata.normalize('NFKC', rendering.normalize(part or '')).casefold())
+        if words:
+            hashes.update(zlib.crc32(' '.join(words[i:i + SHINGLE_WORDS]).encode())
+                          for i in range(max(1, len(words) - SHINGLE_WORDS + 1)))
+    return hashes
+
+
+def signature(hashes):
+    """Packed MinHash signature of a non-empty shingle set."""
+    return _SIGNATURE.pack(*(min((a * x + b) % _PRIME for x in hashes) & 0xFFFFFFFF for a, b in zip(_A, _B)))
+
+
+def band_buckets(packed):
+    """One signed 64-bit bucket per band (the band's index is stored next to it)."""
+    step = ROWS * 4
+    return [int.from_bytes(hashlib.blake2b(packed[i * step:(i + 1) * step], digest_size=8).digest(), 'little', signed=True)
+            for i in range(BANDS)]
+
+
+def estimate(left, right):
+    """Estimated Jaccard similarity of two packed signatures."""
+    return sum(x == y for x, y in zip(_SIGNATURE.unpack(left), _SIGNATURE.unpack(right))) / NUM_PERM
+
+
+# =========================================================================
+# Index maintenance
+# =========================================================================
+
+def index_questions(question_ids):
+    """(Re)indexes the given questions. Returns their packed signatures by question ID."""
+    packed = {question_id: signature(hashes) for question_id, hashes in _shingle(question_ids).items() if hashes}
+    QuestionBucket.objects.filter(question_id__in=question_ids).delete()
+    QuestionFingerprint.objects.filter(question_id__in=question_ids).delete()
+    _store(packed)
+    return packed
+
+
+def check_new_questions(question_ids, threshold=THRESHOLD):
+    """
+    Indexes freshly imported or edited questions and returns their near-duplicates among
+    all indexed questions. A pair within the batch is reported once.
+    """
+    packed = index_questions(question_ids)
+    matches = []
+    for question_id, question_signature in packed.items():
+        matches.extend(match for match in _similar(question_id, question_signature, threshold)
+                       if match.similar_id not in packed or match.similar_id < question_id)
+    return matches
+
+
+@transaction.atomic
+def rebuild(chunk_size=REBUILD_CHUNK_SIZE):
+    """Re-indexes every original question in keyset chunks. Returns the number indexed. Needs numpy."""
+    QuestionBucket.objects.all().delete()
+    QuestionFingerprint.objects.all().delete()
+    originals = Question.objects.filter(source_question__isnull=True).order_by('pk')
+    last_pk, indexed = 0, 0
+    while True:
+        question_ids = list(originals.filter(pk__gt=last_pk).values_list('pk', flat=True)[:chunk_size])
+        if not question_ids:
+            return indexed
+        packed = _signature_batch(_shingle(question_ids))
+        _store(packed)
+        indexed += len(packed)
+        last_pk = question_ids[-1]
+
+
+def _signature_batch(shingled):
+    """signature() for many questions in one vectorized pass per group of hash functions."""
+    import numpy as np
+
+    question_ids = [question_id for question_id, hashes in shingled.items() if hashes]
+    if not question_ids:
+        return {}
+    lengths = np.fromiter((len(shingled[question_id]) for question_id in question_ids), dtype=np.int64,
+                          count=len(question_ids))
+    x = np.fromiter(itertools.chain.from_iterable(shingled[question_id] for question_id in question_ids),
+                    dtype=np.uint64, count=int(lengths.sum()))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    a = np.array(_A, dtype=np.uint64)[:, None]
+    b = np.array(_B, dtype=np.uint64)[:, None]
+    minimums = np.empty((NUM_PERM, len(question_ids)), dtype=np.uint64)
+    # 32 hash functions at a time keeps the (functions x shingles) temporaries small
+    for first in range(0, NUM_PERM, 32):
+        hashed = (a[first:first + 32] * x + b[first:first + 32]) % np.uint64(_PRIME)
+        minimums[first:first + 32] = np.minimum.reduceat(hashed, starts, axis=1)
+    rows = (minimums & np.uint64(0xFFFFFFFF)).astype('<u4').T
+    return {question_id: rows[i].tobytes() for i, question_id in enumerate(question_ids)}
+
+
+def _shingle(question_ids):
+    """Shingle sets of the original questions among question_ids (two queries)."""
+    texts = dict(Question.objects.filter(pk__in=question_ids, source_question__isnull=True).values_list('pk', 'text'))
+    options = {}
+    for question_id, text in Option.objects.filter(question_id__in=texts).order_by('pk').values_list('question_id', 'text'):
+        options.setdefault(question_id, []).append(text)
+    return {question_id: shingles(text, options.get(question_id, ())) for question_id, text in texts.items()}
+
+
+def _store(packed):
+    QuestionFingerprint.objects.bulk_create(
+        [QuestionFingerprint(question_id=question_id, signature=value) for question_id, value in packed.items()],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    QuestionBucket.objects.bulk_create([
+        QuestionBucket(question_id=question_id, band=band, bucket=bucket)
+        for question_id, value in packed.items() for band, bucket in enumerate(band_buckets(value))
+    ], batch_size=BULK_BATCH_SIZE)
+
+
+# =========================================================================
+# Lookups
+# =========================================================================
+
+def find_similar(question_id, threshold=THRESHOLD):
+    """Near-duplicates of one question, most similar first (indexes it first if needed)."""
+    stored = QuestionFingerprint.objects.filter(question_id=question_id).values_list('signature', flat=True).first()
+    if stored is None:
+        return sorted(check_new_questions([question_id], threshold), key=lambda match: -match.score)
+    return sorted(_similar(question_id, bytes(stored), threshold), key=lambda match: -match.score)
+
+
+def all_pairs(threshold=THRESHOLD):
+    """
+    Every near-duplicate pair in the bank, from one ordered scan of the bucket index.
+    Yields Match tuples with question_id < similar_id.
+    """
+    candidates = set()
+    group_key, group = None, []
+    rows = QuestionBucket.objects.order_by('band', 'bucket', 'question_id').values_list('band', 'bucket', 'question_id')
+    for band, bucket, question_id in itertools.chain(rows.iterator(chunk_size=10000), [(None, None, None)]):
+        if (band, bucket) != group_key:
+            if 1 < len(group) <= MAX_BUCKET_SIZE:
+                candidates.update(itertools.combinations(group, 2))
+            group_key, group = (band, bucket), []
+        group.append(question_id)
+
+    signatures = {}
+    pending = sorted({question_id for pair in candidates for question_id in pair})
+    for first in range(0, len(pending), BULK_BATCH_SIZE):
+        signatures.update(
+            (question_id, bytes(value)) for question_id, value in QuestionFingerprint.objects
+            .filter(question_id__in=pending[first:first + BULK_BATCH_SIZE]).values_list('question_id', 'signature')
+        )
+    for left, right in sorted(candidates):
+        score = estimate(signatures[left], signatures[right])
+        if score >= threshold:
+            yield Match(left, right, score)
+
+
+def _similar(question_id, packed, threshold):
+    condition = Q()
+    for band, bucket in enumerate(band_buckets(packed)):
+        condition |= Q(band=band, bucket=bucket)
+    candidate_ids = list(QuestionBucket.objects.filter(condition).exclude(question_id=question_id)
+                         .values_list('question_id', flat=True).distinct()[:MAX_CANDIDATES])
+    matches = []
+    for candidate_id, value in QuestionFingerprint.objects.filter(question_id__in=candidate_ids) \
+            .values_list('question_id', 'signature'):
+        score = estimate(packed, bytes(value))
+        if score >= threshold:
+            matches.append(Match(question_id, candidate_id, score))
+    return matches
@@ -0,0 +1,102 @@
+# FILE: exams/startup.py
+
+"""
+Worker start-up warming.
+
+A new gunicorn/daphne worker otherwise pays on its first real requests for resolving the
+URLconf, compiling templates, the first database connection and loading the catalog data
+every page reads, which shows up as latency spikes each time the pool scales out.
+warm_worker() does that work once, before the worker accepts traffic:
+
+- populates the URL resolver
+- compiles the hot templates into the cached template loader (see TEMPLATES in settings)
+- connects to the primary and checks the read replicas (exams/replicas.py), so a dead
+  replica is marked down before the first read
+- loads the navbar categories and catalog version (exams/context_processors.py,
+  exams/pagecache.py) and pulls warmed live-exam entries into the process (exams/warmup.py)
+
+It is called from competition_cluster/wsgi.py and asgi.py right after the application is
+built, not from AppConfig.ready(), which also runs for migrate and every other management
+command, possibly before the database exists. Every step is best effort: a failure is
+logged and the worker starts anyway. Disable with EXAMS_WARM_WORKER = False.
+
+The hook runs at import time, on the main thread, possibly in a gunicorn --preload master
+that forks the workers, so the database connections it opened are closed once it is done:
+a forked worker must not share the master's socket, and under ASGI requests run on other
+threads that never reuse it. The replica health results stay recorded.
+
+`manage.py profile_imports` reports module import costs and `manage.py benchmark_startup`
+measures time to first request with and without this hook.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+from . import context_processors, pagecache, replicas, warmup
+
+logger = logging.getLogger(__name__)
+
+WARM_WORKER = getattr(settings, 'EXAMS_WARM_WORKER', True)
+
+# Pages (and the templates they extend/include) candidates hit first
+HOT_TEMPLATES = [
+    'exams/base.html', 'exams/navbar.html', 'exams/footer.html', 'exams/home.html', 'exams/test_list.html',
+    'exams/category_detail.html', 'exams/test_instructions.html', 'exams/waiting_room.html',
+    'exams/live_test.html', 'exams/results.html', 'exams/answer_review.html', 'exams/leaderboard.html',
+    'exams/dashboard.html',
+]
+
+
+def warm_worker(force=False):
+    """Runs every warm-up step. Returns {step: milliseconds} (failed steps are left out)."""
+    if not (WARM_WORKER or force):
+        return {}
+    timings = {}
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception("Worker warm-up step '%s' failed", name)
+            continue
+        timings[name] = (time.perf_counter() - started) * 1000
+    connections.close_all()
+    logger.info("Worker warmed in %.0f ms (%s)", sum(timings.values()),
+                ', '.join(f"{name} {ms:.0f} ms" for name, ms in timings.items()))
+    return timings
+
+
+def warm_urls():
+    # reverse_dict builds the resolver's lookup tables, importing every view module
+    get_resolver().reverse_dict
+
+
+def warm_templates():
+    for name in HOT_TEMPLATES:
+        get_template(name)
+
+
+def warm_databases():
+    connections[DEFAULT_DB_ALIAS].ensure_connection()
+    for alias in replicas.replica_aliases():
+        # Connects, or marks the replica down for EXAMS_REPLICA_RETRY_SECONDS
+        replicas.healthy(alias)
+
+
+def warm_catalog():
+    pagecache.catalog_version()
+    context_processors.all_categories_context(None)
+    warmup.preload()
+
+
+STEPS = [
+    ('urls', warm_urls),
+    ('templates', warm_templates),
+    ('databases', warm_databases),
+    ('catalog', warm_catalog),
+]
@@ -16,6 +16,19 @@ document.addEventListener('DOMContentLoaded', () => {
     let testState = {}; 
     let timerInterval; // Accessible globally for starting/stopping the timer
 
+    // Server-side attempt session: only changed questions are sent, in small batches
+    const AUTOSAVE_INTERVAL_MS = 10000;
+    // Resends of a submission whose seq another tab already used
+    const SUBMIT_CONFLICT_RETRIES = 3;
+    const testHeader = document.querySelector('.test-header');
+    const sessionId = testHeader.dataset.sessionId;
+    const autosaveUrl = testHeader.dataset.autosaveUrl;
+    let autosaveSeq = parseInt(testHeader.dataset.savedSeq, 10) || 0;
+    let dirtyQuestions = new Set();
+    let inFlightQuestions = new Set();
+    // One key per page load: retries of the same submission are collapsed server-side
+    const submissionKey = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`;
+
     // --- 2. Initialization ---
     function initializeTest() {
         const paletteGrid = document.querySelector('.question-palette-grid');
@@ -23,7 +36,8 @@ document.addEventListener('DOMContentLoaded', () => {
         allQuestions.forEach((q, index) => {
             const qId = q.dataset.id;
             // Provide code with comments: Initialize state for each question with default values
-            testState[qId] = { status: 'unanswered', selectedOption: null, timeSpent: 0 };
+            // selectedOption: option ID (single), array of IDs (multiple correct) or the typed value (numerical)
+            testState[qId] = { status: 'unanswered', type: q.dataset.type || 'S', selectedOption: null, timeSpent: 0 };
             const paletteItem = document.createElement('div');
             paletteItem.classList.add('palette-item', 'unanswered');
             paletteItem.textContent = index + 1;
@@ -31,15 +45,98 @@ document.addEventListener('DOMContentLoaded', () => {
             paletteItem.addEventListener('click', () => navigateToQuestion(index));
             paletteGrid.appendChild(paletteItem);
 
-            // Attach event listener to options to track answers instantly
-            q.querySelectorAll('input[type="radio"]').forEach(option => {
-                option.addEventListener('change', () => updateQuestionStatus(index));
+            // Attach event listener to options (or the numerical answer box) to track answers instantly
+            q.querySelectorAll('input').forEach(input => {
+                input.addEventListener('change', () => updateQuestionStatus(index));
             });
         });
 
+        restoreSavedAnswers();
         updateNavigationButtons();
         showQuestion(currentQuestionIndex); 
         startTimer(); // Call to start the timer countdown
+        setInterval(autosave, AUTOSAVE_INTERVAL_MS);
+        // Flush pending changes when the tab is hidden or closed
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') { autosave(true); }
+        });
+    }
+
+    // Provide code with comments: Re-apply answers the server already holds (reload or crash recovery)
+    function restoreSavedAnswers() {
+        const savedElement = document.getElementById('saved-answers-data');
+        const saved = savedElement ? JSON.parse(savedElement.textContent) : {};
+
+        allQuestions.forEach((q, index) => {
+            const entry = saved[q.dataset.id];
+            if (!entry) return;
+            // Multiple correct and numerical questions carry their response as a third element
+            const [selectedOptionId, timeSpent, response] = entry;
+            testState[q.dataset.id].timeSpent = timeSpent || 0;
+            if (q.dataset.type === 'N') {
+                q.querySelector('.numerical-answer').value = response || '';
+            } else {
+                const chosen = q.dataset.type === 'M' ? (response || []) : [selectedOptionId];
+                chosen.filter(optionId => optionId !== null).forEach(optionId => {
+                    const input = q.querySelector(`input[value="${optionId}"]`);
+                    if (input) { input.checked = true; }
+                });
+            }
+            updateQuestionStatus(index, false);
+        });
+    }
+
+    // --- Autosave ---
+    function getCsrfToken() {
+        const csrfTokenInput = document.getElementById('csrf-token-input');
+        return csrfTokenInput ? csrfTokenInput.value : '';
+    }
+
+    function collectChanges(qIds) {
+        return Array.from(qIds).map(qId => {
+            const state = testState[qId];
+            const change = { question_id: qId, selected_option_id: null, time_spent: state.timeSpent };
+            if (state.type === 'M') {
+                change.selected_option_ids = state.selectedOption || [];
+            } else if (state.type === 'N') {
+                change.numerical_answer = state.selectedOption;
+            } else {
+                change.selected_option_id = state.selectedOption;
+            }
+            return change;
+        });
+    }
+
+    function autosave(keepalive = false) {
+        if (!sessionId || inFlightQuestions.size > 0 || dirtyQuestions.size === 0) return;
+
+        const sending = dirtyQuestions;
+        dirtyQuestions = new Set();
+        inFlightQuestions = sending;
+        autosaveSeq += 1;
+
+        fetch(autosaveUrl, {
+            method: 'POST',
+            keepalive: keepalive,
+            headers: { 'Content-Type': 'application/json', 'X-CSRFToken': getCsrfToken() },
+            body: JSON.stringify({ seq: autosaveSeq, changes: collectChanges(sending) })
+        })
+        .then(response => {
+            if (response.status === 409) {
+                // Provide code with comments: The seq was already used (another tab); continue after the server's last seq
+                return response.json().then(data => {
+                    autosaveSeq = Math.max(autosaveSeq, data.last_seq || 0);
+                    throw new Error('Autosave conflict: sequence number already used');
+                });
+            }
+            if (!response.ok) { throw new Error(`Autosave failed with status: ${response.status}`); }
+        })
+        .catch(error => {
+            // Provide code with comments: Keep the changes so the next autosave (or submit) resends them
+            console.error('Autosave Error:', error);
+            sending.forEach(qId => dirtyQuestions.add(qId));
+        })
+        .finally(() => { inFlightQuestions = new Set(); });
     }
 
     // --- 3. Time Tracking & Navigation ---
@@ -49,6 +146,7 @@ document.addEventListener('DOMContentLoaded', () => {
             // Provide code with comments: Calculate time elapsed in seconds and add to total timeSpent
             const timeElapsed = Math.round((new Date() - questionStartTime) / 1000);
             testState[qId].timeSpent += timeElapsed;
+            if (timeElapsed > 0) { dirtyQuestions.add(qId); }
         }
     }
 
@@ -82,19 +180,26 @@ document.addEventListener('DOMContentLoaded', () => {
         if (!confirm("Click OK to finalize your submission.")) {
             return;
         }
+        sendSubmission(SUBMIT_CONFLICT_RETRIES);
+    }
 
-        const mockTestId = document.querySelector('.test-header').dataset.testId;
+    function sendSubmission(conflictRetries) {
+        const mockTestId = testHeader.dataset.testId;
         
         // Provide code with comments: Retrieve token directly from the hidden input field (CRITICAL CSRF FIX)
-        const csrfTokenInput = document.getElementById('csrf-token-input');
-        const csrfToken = csrfTokenInput ? csrfTokenInput.value : '';
-
-        // Prepare the JSON payload for the backend
-        const answers = Object.keys(testState).map(qId => ({
-            question_id: qId,
-            selected_option_id: testState[qId].selectedOption,
-            time_spent: testState[qId].timeSpent
-        }));
+        const csrfToken = getCsrfToken();
+
+        // Prepare the JSON payload for the backend: with a session the server already holds
+        // the autosaved answers, so only the unsaved diff is sent
+        let payload;
+        if (sessionId) {
+            autosaveSeq += 1;
+            // In-flight changes are resent too, in case that autosave lands after the submission
+            const unsaved = new Set([...dirtyQuestions, ...inFlightQuestions]);
+            payload = { session_id: sessionId, seq: autosaveSeq, changes: collectChanges(unsaved) };
+        } else {
+            payload = { answers: collectChanges(Object.keys(testState)) };
+        }
         
         const url = `/test/submit/${mockTestId}/`;
 
@@ -103,11 +208,20 @@ document.addEventListener('DOMContentLoaded', () => {
             method: 'POST',
             headers: { 
                 'Content-Type': 'application/json', 
-                'X-CSRFToken': csrfToken // Send the CSRF token securely
+                'X-CSRFToken': csrfToken, // Send the CSRF token securely
+                'Idempotency-Key': submissionKey
             },
-            body: JSON.stringify({ answers: answers })
+            body: JSON.stringify(payload)
         })
         .then(response => {
+            if (response.status === 409 && conflictRetries > 0) {
+                // Provide code with comments: The seq was already used (another tab); resend after the server's last seq
+                return response.json().then(data => {
+                    autosaveSeq = Math.max(autosaveSeq, data.last_seq || 0);
+                    sendSubmission(conflictRetries - 1);
+                    return null;
+                });
+            }
             if (!response.ok) {
                 // If the server returns a 500 or 403, this triggers the catch block
                 throw new Error(`Server responded with status: ${response.status}`);
@@ -115,6 +229,7 @@ document.addEventListener('DOMContentLoaded', () => {
             return response.json();
         })
         .then(data => {
+            if (data === null) { return; }
             // Check if the backend processing status is 'success'
             if (data.status === 'success' && data.result_id) {
                 // Provide code with comments: SUCCESS: Stop the timer and redirect immediately
@@ -144,13 +259,26 @@ document.addEventListener('DOMContentLoaded', () => {
         document.getElementById('next-btn').textContent = currentQuestionIndex === totalQuestions - 1 ? 'Finish & Submit' : 'Save & Next \u00BB';
     }
 
-    function updateQuestionStatus(index) {
+    // Provide code with comments: The question's current answer, or null when unanswered
+    function readResponse(questionElement) {
+        if (questionElement.dataset.type === 'N') {
+            const value = questionElement.querySelector('.numerical-answer').value.trim();
+            return value === '' ? null : value;
+        }
+        const checked = Array.from(questionElement.querySelectorAll('input:checked')).map(input => input.value);
+        if (checked.length === 0) return null;
+        return questionElement.dataset.type === 'M' ? checked.sort() : checked[0];
+    }
+
+    function updateQuestionStatus(index, trackChange = true) {
         if (!allQuestions[index]) return;
         const qId = allQuestions[index].dataset.id;
-        const selectedOption = allQuestions[index].querySelector('input[type="radio"]:checked');
         const paletteItem = document.querySelector(`.palette-item[data-index="${index}"]`);
         
-        testState[qId].selectedOption = selectedOption ? selectedOption.value : null;
+        const newSelection = readResponse(allQuestions[index]);
+        const selectedOption = newSelection !== null;
+        if (trackChange && JSON.stringify(newSelection) !== JSON.stringify(testState[qId].selectedOption)) { dirtyQuestions.add(qId); }
+        testState[qId].selectedOption = newSelection;
 
         let newStatus = 'unanswered';
         if (testState[qId].status === 'marked') {
@@ -173,8 +301,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
         // Provide code with comments: Toggle 'marked' status
         if (testState[qId].status === 'marked') {
-            const selectedOption = allQuestions[currentQuestionIndex].querySelector('input[type="radio"]:checked');
-            testState[qId].status = selectedOption ? 'answered' : 'unanswered';
+            testState[qId].status = readResponse(allQuestions[currentQuestionIndex]) !== null ? 'answered' : 'unanswered';
         } else {
             testState[qId].status = 'marked';
         }
@@ -183,11 +310,13 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     function startTimer() {
-        const headerElement = document.querySelector('.test-header');
+        const headerElement = testHeader;
         
         // Provide code with comments: CRITICAL FIX: Ensure safe parsing of duration data attribute
         const durationMinutes = parseInt(headerElement.dataset.duration, 10);
-        let timeInSeconds = (isNaN(durationMinutes) ? 0 : durationMinutes) * 60;
+        // Provide code with comments: A resumed attempt only gets the time that is left on the server clock
+        const elapsedSeconds = parseInt(headerElement.dataset.elapsedSeconds, 10) || 0;
+        let timeInSeconds = Math.max(0, (isNaN(durationMinutes) ? 0 : durationMinutes) * 60 - elapsedSeconds);
         const timerDisplay = document.getElementById('timer-display');
         
         // Initial timer display before interval starts
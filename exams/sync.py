@@ -0,0 +1,242 @@
+# FILE: exams/sync.py
+
+"""
+Batch submission of attempts recorded offline (e.g. LAN exam centres syncing later).
+
+A batch is parsed from JSON lines or CSV, graded in one pass against answer keys loaded
+once for all its tests (see exams/grading.py), and written with bulk_create. Leaderboard refreshes happen once per
+test through the outbox. Every attempt gets an idempotency key (supplied by the centre, or
+derived from the attempt's content), so re-sending a batch is safe: already-imported
+attempts return their original result IDs.
+"""
+
+import csv
+import hashlib
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import grading, outbox, replicas
+from .models import MockTest, TestResult, UserAnswer
+
+User = get_user_model()
+
+BULK_BATCH_SIZE = 1000
+
+# CSV layout: one row per answered question, grouped into attempts by `attempt_ref`
+CSV_COLUMNS = ['attempt_ref', 'username', 'test_id', 'question_id', 'selected_option_id', 'time_spent']
+CSV_OPTIONAL_COLUMNS = ['idempotency_key', 'started_at', 'submitted_at']
+# Per-answer columns for multiple correct ("12,15") and numerical answer questions
+CSV_ANSWER_OPTIONAL_COLUMNS = ['selected_option_ids', 'numerical_answer']
+
+
+class BatchFormatError(ValueError):
+    """Raised when a batch file cannot be parsed at all (as opposed to a single bad attempt)."""
+
+
+def parse_jsonl(text):
+    """
+    One attempt per line: {"ref", "username", "test_id", "answers": [...],
+    optional "idempotency_key", "started_at", "submitted_at"}.
+    """
+    attempts = []
+    for line_num, line in enumerate(io.StringIO(text), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            attempt = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BatchFormatError(f"Line {line_num}: invalid JSON ({e}).")
+        if not isinstance(attempt, dict):
+            raise BatchFormatError(f"Line {line_num}: expected a JSON object.")
+        attempt.setdefault('ref', str(line_num))
+        attempts.append(attempt)
+    return attempts
+
+
+def parse_csv(text):
+    """Groups per-answer CSV rows into attempts, keeping first-seen order."""
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in CSV_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise BatchFormatError(f"Missing CSV column(s): {', '.join(missing)}.")
+
+    attempts = {}
+    for row in reader:
+        ref = row['attempt_ref']
+        attempt = attempts.get(ref)
+        if attempt is None:
+            attempt = attempts[ref] = {
+                'ref': ref, 'username': row['username'], 'test_id': row['test_id'], 'answers': [],
+            }
+            for column in CSV_OPTIONAL_COLUMNS:
+                if row.get(column):
+                    attempt[column] = row[column]
+        answer = {
+            'question_id': row['question_id'],
+            'selected_option_id': row['selected_option_id'],
+            'time_spent': row['time_spent'] or 0,
+        }
+        for column in CSV_ANSWER_OPTIONAL_COLUMNS:
+            if row.get(column):
+                answer[column] = row[column]
+        attempt['answers'].append(answer)
+    return list(attempts.values())
+
+
+def parse_batch(text, fmt):
+    if fmt == 'csv':
+        return parse_csv(text)
+    if fmt == 'jsonl':
+        return parse_jsonl(text)
+    raise BatchFormatError(f"Unsupported batch format '{fmt}'. Use 'jsonl' or 'csv'.")
+
+
+@transaction.atomic
+def submit_batch(attempts):
+    """
+    Grades and stores a batch of attempts. Returns one outcome per attempt, in input order:
+    {'ref', 'status': 'created' | 'duplicate' | 'error', 'result_id' or 'message'}.
+    """
+    outcomes = [{'ref': str(attempt.get('ref', i))} for i, attempt in enumerate(attempts, 1)]
+
+    # 1. Resolve users and tests for the whole batch in two queries
+    usernames = {str(a.get('username')) for a in attempts if a.get('username')}
+    users = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+    test_ids = set()
+    for attempt in attempts:
+        try:
+            test_ids.add(int(attempt.get('test_id')))
+        except (TypeError, ValueError):
+            pass
+    existing_test_ids = set(MockTest.objects.filter(pk__in=test_ids).values_list('pk', flat=True))
+    answer_keys = grading.load_answer_keys(existing_test_ids)
+
+    # 2. Validate and assign idempotency keys
+    pending = []  # (index, user_id, test_id, key, attempt)
+    for index, attempt in enumerate(attempts):
+        outcome = outcomes[index]
+        user_id = users.get(str(attempt.get('username')))
+        try:
+            test_id = int(attempt.get('test_id'))
+        except (TypeError, ValueError):
+            test_id = None
+        if user_id is None:
+            outcome.update(status='error', message=f"Unknown user '{attempt.get('username')}'.")
+        elif test_id not in existing_test_ids:
+            outcome.update(status='error', message=f"Unknown test '{attempt.get('test_id')}'.")
+        elif not isinstance(attempt.get('answers'), list):
+            outcome.update(status='error', message="'answers' must be a list.")
+        elif not all(isinstance(answer, dict) for answer in attempt['answers']):
+            outcome.update(status='error', message="Every entry in 'answers' must be an object.")
+        else:
+            key = str(attempt.get('idempotency_key') or _content_key(attempt))[:64]
+            pending.append((index, user_id, test_id, key, attempt))
+
+    # 3. Attempts already imported by an earlier (re)send of this batch
+    existing = {}
+    if pending:
+        rows = TestResult.objects.filter(
+            user_id__in={p[1] for p in pending}, idempotency_key__in={p[3] for p in pending},
+        ).values_list('user_id', 'idempotency_key', 'pk', 'mock_test_id')
+        existing = {(user_id, key): (pk, test_id) for user_id, key, pk, test_id in rows}
+
+    # 4. Grade everything in memory
+    results_to_create = []
+    graded_by_key = {}
+    seen_keys = set()
+    for index, user_id, test_id, key, attempt in pending:
+        outcome = outcomes[index]
+        if (user_id, key) in existing:
+            result_id, existing_test_id = existing[(user_id, key)]
+            if existing_test_id != test_id:
+                outcome.update(status='error', message=f"Idempotency key '{key}' was already used for another test.")
+            else:
+                outcome.update(status='duplicate', result_id=result_id)
+            continue
+        if (user_id, key) in seen_keys:
+            outcome.update(status='error', message=f"Duplicate idempotency key '{key}' in batch.")
+            continue
+        try:
+            graded = grading.grade(answer_keys[test_id], attempt['answers'])
+            start_time, end_time = _parse_times(attempt)
+        except (KeyError, TypeError, ValueError) as e:
+            outcome.update(status='error', message=f"Invalid attempt data: {e}.")
+            continue
+        seen_keys.add((user_id, key))
+        graded_by_key[(user_id, key)] = (index, test_id, graded, end_time)
+        results_to_create.append(TestResult(
+            user_id=user_id, mock_test_id=test_id, score=graded.score, max_marks=graded.max_marks,
+            correct_answers=graded.correct, incorrect_answers=graded.incorrect,
+            unattempted=graded.unattempted, start_time=start_time, end_time=end_time,
+            time_taken_seconds=graded.time_taken, idempotency_key=key,
+        ))
+
+    if not results_to_create:
+        return outcomes
+
+    # 5. Bulk insert results, then map keys back to PKs (MySQL's bulk_create does not return them)
+    TestResult.objects.bulk_create(results_to_create, batch_size=BULK_BATCH_SIZE)
+    created_ids = {
+        (user_id, key): pk for user_id, key, pk in TestResult.objects.filter(
+            user_id__in={k[0] for k in graded_by_key}, idempotency_key__in={k[1] for k in graded_by_key},
+        ).values_list('user_id', 'idempotency_key', 'pk')
+    }
+
+    answers_to_create = []
+    end_times = []
+    events = []
+    for (user_id, key), (index, test_id, graded, end_time) in graded_by_key.items():
+        result_id = created_ids[(user_id, key)]
+        outcomes[index].update(status='created', result_id=result_id)
+        end_times.append(TestResult(pk=result_id, end_time=end_time))
+        answers_to_create.extend(
+            UserAnswer(test_result_id=result_id, question_id=answer.question_id,
+                       selected_option_id=answer.selected_option_id, response=answer.response,
+                       time_spent=answer.time_spent, is_correct=answer.is_correct,
+                       marks_awarded=answer.marks_awarded)
+            for answer in graded.answers
+        )
+        events.append({'result_id': result_id, 'test_id': test_id, 'user_id': user_id})
+    UserAnswer.objects.bulk_create(answers_to_create, batch_size=BULK_BATCH_SIZE)
+    # end_time is auto_now_add (overwritten on insert), so restore the offline submission times
+    TestResult.objects.bulk_update(end_times, ['end_time'], batch_size=BULK_BATCH_SIZE)
+
+    # 6. Leaderboards, counters and other rollups run after commit, coalesced per test
+    outbox.publish_many(outbox.RESULT_SUBMITTED, events)
+    # Candidates may open their results right away; keep them off lagging replicas
+    user_ids = {event['user_id'] for event in events}
+    transaction.on_commit(lambda: replicas.pin_users(user_ids))
+    return outcomes
+
+
+def _content_key(attempt):
+    """Deterministic key for attempts sent without one, so an identical resend is a duplicate."""
+    canonical = json.dumps(
+        [attempt.get('username'), str(attempt.get('test_id')), attempt.get('submitted_at'), attempt.get('answers')],
+        sort_keys=True, default=str,
+    )
+    return f"sync:{hashlib.sha1(canonical.encode()).hexdigest()}"
+
+
+def _parse_times(attempt):
+    now = timezone.now()
+    start_time = _parse_time(attempt.get('started_at')) or now
+    end_time = _parse_time(attempt.get('submitted_at')) or now
+    return start_time, end_time
+
+
+def _parse_time(raw):
+    if not raw:
+        return None
+    value = parse_datetime(str(raw))
+    if value is None:
+        raise ValueError(f"invalid timestamp '{raw}'")
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
@@ -14,17 +14,24 @@ urlpatterns = [
     path('tests/<slug:category_slug>/', views.test_list_view, name='test_list'),
     path('test/<int:test_id>/instructions/', views.test_instructions_view, name='test_instructions'),
     path('test/start/<int:test_id>/', views.start_test_view, name='start_test'),
+    path('test/<int:test_id>/waiting-room/', views.waiting_room_view, name='waiting_room'),
+    path('test/<int:test_id>/waiting-room/status/', views.waiting_room_status_view, name='waiting_room_status'),
     
     # API-like endpoint for submission
     path('test/submit/<int:test_id>/', views.submit_test_view, name='submit_test'),
+    path('test/attempt/<int:session_id>/autosave/', views.autosave_attempt_view, name='autosave_attempt'),
+    path('api/sync/submissions/', views.sync_submissions_view, name='sync_submissions'),
+    path('staff/exports/results/', views.export_results_view, name='export_results'),
 
     # Result, Review, and Leaderboard pages
     path('test/results/<int:result_id>/', views.results_view, name='test_results'),
     path('test/review/<int:result_id>/', views.answer_review_view, name='answer_review'),
+    path('test/compare/<int:result_id>/<int:other_id>/', views.compare_attempts_view, name='compare_attempts'),
     path('test/<int:test_id>/leaderboard/', views.leaderboard_view, name='leaderboard'),
 
     # User-specific dashboard pages
     path('dashboard/', views.dashboard_view, name='dashboard'),
     path('dashboard/categories/', views.category_dashboard_view, name='category_dashboard'),
+    path('dashboard/progress/', views.progress_series_view, name='progress_series'),
 ]
 
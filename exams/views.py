@@ -2,42 +2,58 @@
 
 # Add this import at the top of your views.py file for the login form
 from django.contrib.auth.forms import AuthenticationForm
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required 
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, JsonResponse, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
 from django.utils import timezone
 # Import essential database tools for complex queries
-from django.db.models import Sum, OuterRef, Subquery, Count, Case, When, Value, IntegerField, FloatField
-from django.db import transaction # Ensures database operations are atomic
+from django.db.models import Sum, OuterRef, Subquery, Count, Case, When, Value, IntegerField, Q
+from django.db import transaction, IntegrityError # Ensures database operations are atomic
 from django.core.paginator import Paginator
+import asyncio
 import json
+from asgiref.sync import sync_to_async
 
-# Django Channels Imports (for real-time updates)
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-
-from .models import MockTest, Testimonial, ExamCategory, Question, TestResult, Option, UserAnswer, Subject
+from .models import MockTest, Testimonial, ExamCategory, Question, TestResult, Option, UserAnswer, Subject, AttemptSession
 from .forms import CustomUserCreationForm 
+from . import asyncdb, attempts, cohort, comparison, grading, idempotency, leaderboard, outbox, progress, recommendations, replicas, waitingroom, warmup
+from .asyncdb import arender
+from .pagecache import cache_anonymous_page
+from .replicas import read_replica
 
 # =========================================================================
 # 1. PUBLIC & AUTHENTICATION VIEWS
 # =========================================================================
 
-def home_view(request):
-    """Renders the homepage and prepares login/signup forms for the popup modal."""
-    all_categories = ExamCategory.objects.all().order_by('name')
-    featured_test = MockTest.objects.order_by('-created_at').first()
+@cache_anonymous_page
+@read_replica
+async def home_view(request):
+    """
+    Renders the homepage and prepares login/signup forms for the popup modal.
+    Anonymous hits are served from the page cache, so the forms are only built on a miss.
+    """
+    # Provide code with comments: Independent queries overlap on separate connections (see exams/asyncdb.py)
+    all_categories, featured_test, trending_tests = await asyncdb.gather(
+        lambda: list(ExamCategory.objects.all().order_by('name')),
+        lambda: MockTest.objects.order_by('-created_at').first(),
+        # Provide code with comments: Ranked by the time-decayed attempt counters (see exams/counters.py)
+        lambda: list(MockTest.objects.filter(trending_score__gt=0).select_related('category').order_by('-trending_score')[:5]),
+    )
     login_form = AuthenticationForm()
     signup_form = CustomUserCreationForm()
     context = {
         'page_title': 'Competition Cluster - Mock Tests for All Exams',
         'all_categories': all_categories,
         'featured_test': featured_test,
+        'trending_tests': trending_tests,
         'login_form': login_form,
         'signup_form': signup_form,
     }
     # Provide code with comments: This view is the entry point, rendering the modal
-    return render(request, 'exams/home.html', context)
+    return await arender(request, 'exams/home.html', context)
 
 def signup_view(request):
     """Handles new user registration."""
@@ -52,12 +68,14 @@ def signup_view(request):
     # Provide code with comments: Renders the custom signup form
     return render(request, 'exams/signup.html', context)
 
-def search_view(request):
+@cache_anonymous_page
+@read_replica
+async def search_view(request):
     """Handles the search query from the navbar."""
     query = request.GET.get('q', '')
     if query:
         # Provide code with comments: Performs case-insensitive title search
-        results = MockTest.objects.filter(title__icontains=query)
+        results = [test async for test in MockTest.objects.filter(title__icontains=query).select_related('category')]
     else:
         results = []
     context = {
@@ -66,75 +84,146 @@ def search_view(request):
         'results': results,
     }
     # Provide code with comments: Searches tests by title and displays results
-    return render(request, 'exams/search_results.html', context)
+    return await arender(request, 'exams/search_results.html', context)
 
-def category_detail_view(request, category_slug):
+@cache_anonymous_page
+@read_replica
+async def category_detail_view(request, category_slug):
     """Displays the detail page for a single category."""
-    category = get_object_or_404(ExamCategory, slug=category_slug)
+    category = await aget_object_or_404(ExamCategory, slug=category_slug)
     # Provide code with comments: Fetches the most recent test in the category
-    featured_test = MockTest.objects.filter(category=category).order_by('-created_at').first()
+    featured_test = await MockTest.objects.filter(category=category).order_by('-created_at').afirst()
     context = {
         'page_title': f"{category.name} Test Series",
         'category': category,
         'featured_test': featured_test,
     }
     # Provide code with comments: Loads category details and a featured test
-    return render(request, 'exams/category_detail.html', context)
+    return await arender(request, 'exams/category_detail.html', context)
 
-def test_list_view(request, category_slug):
+@cache_anonymous_page
+@read_replica
+async def test_list_view(request, category_slug):
     """Displays a paginated list of all mock tests for a specific category."""
-    category = get_object_or_404(ExamCategory, slug=category_slug)
-    all_tests_list = MockTest.objects.filter(category=category).order_by('-created_at')
-
-    if request.user.is_authenticated:
+    category = await aget_object_or_404(ExamCategory, slug=category_slug)
+    user = await request.auser()
+    sort = request.GET.get('sort')
+    # Provide code with comments: 'trending' orders by decayed recent attempts, default is newest first
+    ordering = ('-trending_score', '-created_at') if sort == 'trending' else ('-created_at',)
+    all_tests_list = MockTest.objects.filter(category=category).order_by(*ordering)
+
+    if user.is_authenticated:
         # Provide code with comments: Subquery to check if the user has completed the test (for 'Result' button display)
         user_results_subquery = TestResult.objects.filter(
-            mock_test=OuterRef('pk'), user=request.user
+            mock_test=OuterRef('pk'), user=user
         ).order_by('-end_time').values('pk')[:1]
         all_tests_list = all_tests_list.annotate(user_result_id=Subquery(user_results_subquery))
 
     paginator = Paginator(all_tests_list, 5) 
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = await sync_to_async(asyncdb.evaluated_page)(paginator, page_number)
     context = {
         'page_title': f'{category.name} Mock Tests',
         'category': category,
         'page_obj': page_obj,
+        'sort': sort if sort == 'trending' else '',
     }
     # Provide code with comments: Renders the list with pagination
-    return render(request, 'exams/test_list.html', context)
+    return await arender(request, 'exams/test_list.html', context)
 
 @login_required
 def test_instructions_view(request, test_id):
     """Displays instructions and a subject-wise breakdown for a test."""
-    mock_test = get_object_or_404(MockTest, pk=test_id)
-    # Provide code with comments: Aggregates question counts and total marks by subject
-    subject_breakdown = Question.objects.filter(mock_test=mock_test) \
-                                        .values('subject__name') \
-                                        .annotate(question_count=Count('id'), total_marks=Sum('marks')) \
-                                        .order_by('subject__name')
+    # Provide code with comments: Live exams are served from the pre-warmed cache (see exams/warmup.py)
+    mock_test = warmup.mock_test_or_404(test_id)
+    # Provide code with comments: Question counts and total marks by subject
+    subject_breakdown = warmup.subject_breakdown(mock_test.id)
     context = {
         'page_title': f"Instructions for {mock_test.title}",
         'mock_test': mock_test,
         'subject_breakdown': subject_breakdown,
+        'window_state': mock_test.window_state(timezone.now()),
     }
     # Provide code with comments: Renders test instructions
     return render(request, 'exams/test_instructions.html', context)
 
+def _resume_attempt_session(user, mock_test):
+    return attempts.compact(attempts.get_or_start_session(user, mock_test))
+
 @login_required 
-def start_test_view(request, test_id):
+async def start_test_view(request, test_id):
     """Renders the live test interface."""
-    # Provide code with comments: Prefetches options for performance
-    mock_test = get_object_or_404(MockTest.objects.prefetch_related('questions__options'), pk=test_id)
-    questions = mock_test.questions.all()
+    user = await request.auser()
+    mock_test = await sync_to_async(warmup.mock_test_or_404)(test_id)
+    # Provide code with comments: Scheduled exams can only be started inside their window
+    if mock_test.window_state(timezone.now()) != 'open':
+        return redirect('test_instructions', test_id=mock_test.id)
+    # Provide code with comments: Waiting-room exams load only with an admission token (see exams/waitingroom.py)
+    if mock_test.uses_waiting_room and not waitingroom.has_admission(request, mock_test, user.pk):
+        return redirect('waiting_room', test_id=mock_test.id)
+    # Provide code with comments: Resuming (or starting) the server-side attempt lets a reload restore saved answers.
+    # It writes, so it runs on the request's own connection; only the question payload read goes through gather()
+    (questions,), attempt_session = await asyncio.gather(
+        asyncdb.gather(lambda: warmup.questions(mock_test.id)),
+        sync_to_async(_resume_attempt_session)(user, mock_test),
+    )
     context = {
         'page_title': f'Live Test: {mock_test.title}', 
         'mock_test': mock_test, 
-        'questions': questions
+        'questions': questions,
+        'attempt_session': attempt_session,
+        'saved_answers': attempt_session.answers,
+        'elapsed_seconds': int((timezone.now() - attempt_session.started_at).total_seconds()),
     }
     # Provide code with comments: Loads questions and options for the live test page
-    return render(request, 'exams/live_test.html', context)
+    return await arender(request, 'exams/live_test.html', context)
+
+@login_required
+def waiting_room_view(request, test_id):
+    """Queues the candidate for a waiting-room exam and serves the standalone polling page."""
+    mock_test = warmup.mock_test_or_404(test_id)
+    if not mock_test.uses_waiting_room or waitingroom.has_admission(request, mock_test, request.user.pk):
+        return redirect('start_test', test_id=mock_test.id)
+    if mock_test.window_state(timezone.now()) == 'closed':
+        return redirect('test_instructions', test_id=mock_test.id)
+
+    # Provide code with comments: A reload keeps the candidate's place in the queue
+    ticket = waitingroom.read_ticket(request, mock_test)
+    new_ticket = None
+    if ticket is not None and ticket[0] == request.user.pk:
+        position = ticket[1]
+    else:
+        position, new_ticket = waitingroom.issue_ticket(mock_test, request.user.pk)
 
+    queue_status = waitingroom.status(mock_test, position)
+    if queue_status['admitted']:
+        response = waitingroom.admit(redirect('start_test', test_id=mock_test.id), mock_test, request.user.pk)
+    else:
+        # Provide code with comments: Rendered without the request: no context processors, no queries
+        response = HttpResponse(render_to_string('exams/waiting_room.html', {
+            'mock_test': mock_test, 'status': queue_status, 'poll_max_seconds': waitingroom.POLL_MAX_SECONDS,
+        }))
+    if new_ticket is not None:
+        waitingroom.set_ticket_cookie(response, mock_test, new_ticket)
+    patch_cache_control(response, no_store=True)
+    return response
+
+def waiting_room_status_view(request, test_id):
+    """
+    Polled by the waiting room page. Authenticated by the signed queue ticket rather than the
+    session, so a poll touches neither the session nor the user table.
+    """
+    mock_test = warmup.mock_test_or_404(test_id)
+    ticket = waitingroom.read_ticket(request, mock_test)
+    if ticket is None or not mock_test.uses_waiting_room:
+        return JsonResponse({'status': 'error', 'message': "No queue ticket for this test."}, status=403)
+    user_id, position = ticket
+    queue_status = waitingroom.status(mock_test, position)
+    response = JsonResponse(queue_status)
+    if queue_status['admitted']:
+        waitingroom.admit(response, mock_test, user_id)
+    patch_cache_control(response, no_store=True)
+    return response
 
 # =========================================================================
 # 2. CORE LOGIC VIEWS (FINAL FIXED SCORING LOGIC)
@@ -154,113 +243,94 @@ def submit_test_view(request, test_id):
         data = json.loads(request.body)
         user_answers_data = data.get('answers', [])
         
-        mock_test = get_object_or_404(MockTest, pk=test_id)
-        
-        # Provide code with comments: Fetch questions and max marks efficiently
-        questions_with_correct_option = Question.objects.filter(mock_test=mock_test) \
-            .select_related('correct_option')
+        mock_test = warmup.mock_test_or_404(test_id)
+
+        # Provide code with comments: With an attempt session, grade from the autosaved server-side state;
+        # the request only carries the last unsaved diff
+        attempt_session = None
+        idempotency_key = idempotency.key_from_request(request, data)
+        if data.get('session_id'):
+            idempotency_key = idempotency.key_for_session(data['session_id'])
+
+        # Provide code with comments: A repeated key returns the original result without regrading;
+        # a key already used for another test is rejected rather than answered with that test's result
+        try:
+            existing_result_id = idempotency.lookup(request.user.id, idempotency_key, mock_test.id)
+        except idempotency.KeyReuseError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=422)
+        if existing_result_id is not None:
+            return JsonResponse({'status': 'success', 'result_id': existing_result_id})
+
+        if data.get('session_id'):
+            # Provide code with comments: Row lock serializes concurrent retries of the same attempt
+            attempt_session = get_object_or_404(
+                AttemptSession.objects.select_for_update(), pk=data['session_id'],
+                user=request.user, mock_test=mock_test,
+            )
+            if attempt_session.status == AttemptSession.STATUS_SUBMITTED:
+                return JsonResponse({'status': 'success', 'result_id': attempt_session.test_result_id})
+            if data.get('changes'):
+                try:
+                    stored = attempts.append_diff(attempt_session, int(data.get('seq', 0)), data['changes'])
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    return JsonResponse({'status': 'error', 'message': "Malformed submission payload."}, status=400)
+                if not stored:
+                    # Provide code with comments: As in autosave: the final diff was not stored, so the client resends it
+                    return JsonResponse({
+                        'status': 'error', 'message': "Sequence number already used.",
+                        'last_seq': attempts.last_seq(attempt_session),
+                    }, status=409)
+            attempt_session = attempts.compact(attempt_session)
+            user_answers_data = attempts.session_answers(attempt_session)
         
-        total_correct, total_incorrect, final_score = 0, 0, 0
-        total_time_taken = 0
-        total_max_marks = questions_with_correct_option.aggregate(Sum('marks'))['marks__sum'] or 0
-        
-        # Provide code with comments: Build map using INTEGER keys for safe comparison
-        correct_answers_map = {}
-        for q in questions_with_correct_option:
-            # Provide code with comments: Ensure marks/negative_marks are floats for safe arithmetic
-            marks = float(q.marks if q.marks is not None else 0)
-            negative_marks = float(q.negative_marks if q.negative_marks is not None else 0)
-
-            correct_answers_map[int(q.id)] = { # Key is INT
-                'correct_option_id': q.correct_option_id, # Value is INT or None
-                'marks': marks,
-                'negative_marks': negative_marks
-            }
-
-        answered_q_ids = set()
-        answers_to_create = []
-        
-        for answer_data in user_answers_data:
-            q_id = int(answer_data.get('question_id')) # Convert incoming string Q_ID to INT
-            time_spent = answer_data.get('time_spent', 0)
-            
-            # --- CRITICAL CRASH FIX: Safely parse selected option ID ---
-            selected_id_raw = answer_data.get('selected_option_id')
-            
-            if selected_id_raw is None or str(selected_id_raw).lower() == 'null' or str(selected_id_raw) == '':
-                selected_option_id = None # Set to Python None if unattempted
-            else:
-                # Convert the selected ID to an integer for safe comparison
-                selected_option_id = int(selected_id_raw) 
-            # --- CRITICAL CRASH FIX END ---
-
-            total_time_taken += time_spent
-            is_correct = False
-            
-            if selected_option_id is not None: 
-                # Provide code with comments: Only proceed with scoring if an answer was selected
-                answered_q_ids.add(q_id)
-                
-                if q_id in correct_answers_map:
-                    q_data = correct_answers_map[q_id]
-                    
-                    # Provide code with comments: Scoring Logic with explicit check for None in DB data
-                    if q_data['correct_option_id'] is not None and selected_option_id == q_data['correct_option_id']:
-                        is_correct = True
-                        total_correct += 1
-                        final_score += q_data['marks']
-                    else:
-                        total_incorrect += 1
-                        final_score -= q_data['negative_marks']
-            
-            # Provide code with comments: Prepare UserAnswer for bulk creation
-            answers_to_create.append(UserAnswer(
-                test_result=None, 
-                question_id=q_id, 
-                selected_option_id=selected_option_id,
-                time_spent=time_spent,
-                is_correct=is_correct 
-            ))
-        
-        total_unattempted = questions_with_correct_option.count() - len(answered_q_ids)
-        final_score = max(0, final_score)
-
-        # Provide code with comments: Create the main TestResult record
-        result = TestResult.objects.create(
-            user=request.user, mock_test=mock_test, score=final_score,
-            max_marks=total_max_marks, correct_answers=total_correct,
-            incorrect_answers=total_incorrect, unattempted=total_unattempted,
-            start_time=timezone.now(), 
-            end_time=timezone.now(),
-            time_taken_seconds=total_time_taken,
-        )
+        # Provide code with comments: Grade against the answer key (see exams/grading.py)
+        graded = grading.grade(warmup.answer_key(mock_test.id), user_answers_data)
+
+        # Provide code with comments: Create the main TestResult record; the savepoint lets a concurrent
+        # retry that lost the race on the idempotency key return the winner's result instead
+        try:
+            with transaction.atomic():
+                result = TestResult.objects.create(
+                    user=request.user, mock_test=mock_test, score=graded.score,
+                    max_marks=graded.max_marks, correct_answers=graded.correct,
+                    incorrect_answers=graded.incorrect, unattempted=graded.unattempted,
+                    start_time=attempt_session.started_at if attempt_session else timezone.now(), 
+                    end_time=timezone.now(),
+                    time_taken_seconds=graded.time_taken,
+                    idempotency_key=idempotency_key,
+                )
+        except IntegrityError:
+            try:
+                existing_result_id = idempotency.lookup(request.user.id, idempotency_key, mock_test.id, locking=True)
+            except idempotency.KeyReuseError as e:
+                transaction.set_rollback(True)
+                return JsonResponse({'status': 'error', 'message': str(e)}, status=422)
+            if existing_result_id is None:
+                raise
+            return JsonResponse({'status': 'success', 'result_id': existing_result_id})
         
         # Provide code with comments: Bulk create UserAnswer objects
-        for answer in answers_to_create:
-            answer.test_result = result
-        UserAnswer.objects.bulk_create(answers_to_create)
+        UserAnswer.objects.bulk_create([
+            UserAnswer(test_result=result, question_id=answer.question_id, selected_option_id=answer.selected_option_id,
+                       response=answer.response, time_spent=answer.time_spent, is_correct=answer.is_correct,
+                       marks_awarded=answer.marks_awarded)
+            for answer in graded.answers
+        ])
+
+        if attempt_session is not None:
+            attempt_session.status = AttemptSession.STATUS_SUBMITTED
+            attempt_session.test_result = result
+            attempt_session.save(update_fields=['status', 'test_result'])
         
-        # Provide code with comments: Channels Integration (Real-time update broadcast)
-        channel_layer = get_channel_layer()
-        leaderboard_data = list(
-            TestResult.objects.filter(mock_test=mock_test)
-            .order_by('-score', 'time_taken_seconds')[:10]
-            .values('user__username', 'score', 'time_taken_seconds')
-        )
-        
-        final_leaderboard = []
-        for i, res in enumerate(leaderboard_data):
-            final_leaderboard.append({
-                'rank': i + 1,
-                'username': res['user__username'],
-                'score': float(res['score']),
-                'time_taken_seconds': res['time_taken_seconds']
-            })
-
-        async_to_sync(channel_layer.group_send)(
-            'leaderboard',  
-            {'type': 'leaderboard_update', 'text': json.dumps(final_leaderboard)}
-        )
+        # Provide code with comments: Leaderboard refresh and broadcast run from the outbox after commit,
+        # so no channel-layer I/O happens while this transaction holds its locks
+        outbox.publish(outbox.RESULT_SUBMITTED, {
+            'result_id': result.id, 'test_id': mock_test.id, 'user_id': request.user.id,
+        })
+
+        transaction.on_commit(lambda: idempotency.remember(request.user.id, idempotency_key, result.id, mock_test.id))
+        # Provide code with comments: Read-your-writes: the results page must not read a lagging replica
+        transaction.on_commit(lambda: replicas.pin_user(request.user.id))
 
         # Provide code with comments: Success response for frontend redirection to results page
         return JsonResponse({'status': 'success', 'result_id': result.id})
@@ -271,35 +341,140 @@ def submit_test_view(request, test_id):
         return JsonResponse({'status': 'error', 'message': "An internal error occurred during scoring."}, status=500)
 
 
+@login_required
+def autosave_attempt_view(request, session_id):
+    """
+    Appends a small batch of answer changes to an active attempt session.
+    Expects JSON: {"seq": <int>, "changes": [{"question_id", "selected_option_id", "time_spent"}]}.
+    """
+    if request.method != 'POST':
+        return HttpResponseBadRequest("Invalid request method.")
+    attempt_session = get_object_or_404(
+        AttemptSession, pk=session_id, user=request.user, status=AttemptSession.STATUS_ACTIVE
+    )
+    try:
+        data = json.loads(request.body)
+        seq = int(data['seq'])
+        changes = data.get('changes', [])
+        stored = attempts.append_diff(attempt_session, seq, changes)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'status': 'error', 'message': "Malformed autosave payload."}, status=400)
+    if not stored:
+        # Provide code with comments: Replayed or stale seq (e.g. a second tab) was not stored; report the last one
+        return JsonResponse({
+            'status': 'error', 'message': "Sequence number already used.",
+            'last_seq': attempts.last_seq(attempt_session),
+        }, status=409)
+    # Provide code with comments: Echo the sequence number so the client can drop acknowledged changes
+    return JsonResponse({'status': 'success', 'seq': seq})
+
+
+@staff_member_required
+def sync_submissions_view(request):
+    """
+    Bulk endpoint for offline exam centres. The body is JSON lines (default) or CSV
+    (`?format=csv` or a text/csv Content-Type); see exams/sync.py for both layouts.
+    Returns one outcome per attempt with its result ID or error.
+    """
+    # Lazy import: staff-only batch endpoint, kept out of worker start-up
+    from . import sync
+
+    if request.method != 'POST':
+        return HttpResponseBadRequest("Invalid request method.")
+    fmt = request.GET.get('format') or ('csv' if request.content_type == 'text/csv' else 'jsonl')
+    try:
+        batch = sync.parse_batch(request.body.decode('utf-8'), fmt)
+    except (sync.BatchFormatError, UnicodeDecodeError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    # Provide code with comments: Grades and stores the whole batch in one transaction
+    outcomes = sync.submit_batch(batch)
+    return JsonResponse({
+        'status': 'success',
+        'created': sum(1 for o in outcomes if o['status'] == 'created'),
+        'results': outcomes,
+    })
+
+
+@staff_member_required
+@read_replica
+def export_results_view(request):
+    """
+    Streams TestResult + UserAnswer rows for analysts. Query parameters: test (repeatable),
+    category, since, until, format=csv|jsonl, layout=long|wide, gzip=1.
+    """
+    # Lazy import: staff-only export, kept out of worker start-up
+    from . import exports
+
+    test_ids = [int(t) for t in request.GET.getlist('test') if t.isdigit()]
+    fmt = request.GET.get('format', 'csv')
+    layout = request.GET.get('layout', 'long')
+    compress = request.GET.get('gzip') == '1'
+    try:
+        queryset = exports.filter_results(
+            test_ids=test_ids, category_slug=request.GET.get('category'),
+            since=request.GET.get('since'), until=request.GET.get('until'),
+        )
+        stream = exports.stream_export(
+            queryset, fmt=fmt, layout=layout,
+            test_id=test_ids[0] if len(test_ids) == 1 else None, compress=compress,
+        )
+    except exports.ExportError as e:
+        return HttpResponseBadRequest(str(e))
+
+    # Provide code with comments: Rows are generated lazily, so memory stays flat for millions of rows
+    content_type = 'application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{exports.export_filename(fmt, layout, compress)}"'
+    return response
+
+
 # =========================================================================
 # 3. OTHER VIEWS (Fixed for consistency)
 # =========================================================================
 
 @login_required
-def results_view(request, result_id):
+@read_replica
+async def results_view(request, result_id):
     """Displays an advanced analysis of a user's test result."""
-    result = get_object_or_404(TestResult, pk=result_id, user=request.user)
-    user_answers = result.user_answers.select_related('question', 'selected_option')
+    user = await request.auser()
+    result = await aget_object_or_404(TestResult.objects.select_related('mock_test'), pk=result_id, user=user)
+    user_answers = UserAnswer.objects.filter(test_result_id=result.id)
+    # Provide code with comments: Multiple correct and numerical answers are stored in `response`, not selected_option
+    wrong = Q(is_correct=False) & (Q(selected_option__isnull=False) | ~Q(response=''))
     
     # Provide code with comments: Aggregate time spent on correct/incorrect answers
-    time_stats = user_answers.aggregate(
+    time_stats_query = lambda: user_answers.aggregate(
         total_time_spent=Sum('time_spent'),
         time_on_correct=Sum(Case(When(is_correct=True, then='time_spent'), default=Value(0), output_field=IntegerField())),
-        time_on_incorrect=Sum(Case(When(is_correct=False, selected_option__isnull=False, then='time_spent'), default=Value(0), output_field=IntegerField()))
+        time_on_incorrect=Sum(Case(When(wrong, then='time_spent'), default=Value(0), output_field=IntegerField()))
     )
     
-    # Provide code with comments: Calculate average times (avoiding division by zero)
-    time_stats['time_on_correct_avg'] = time_stats['time_on_correct'] / (result.correct_answers or 1)
-    time_stats['time_on_incorrect_avg'] = time_stats['time_on_incorrect'] / (result.incorrect_answers or 1)
-    
     # Provide code with comments: Aggregate analysis by subject
-    subject_analysis = user_answers.filter(question__subject__isnull=False) \
-                                   .values('question__subject__name') \
+    subject_analysis_query = lambda: list(user_answers.filter(question__subject__isnull=False) \
+                                   .values('question__subject__name', 'question__subject_id') \
                                    .annotate(
                                         total_in_subject=Count('id'),
                                         correct_in_subject=Count(Case(When(is_correct=True, then=1))),
-                                        incorrect_in_subject=Count(Case(When(is_correct=False, selected_option__isnull=False, then=1))),
-                                   ).order_by('question__subject__name')
+                                        incorrect_in_subject=Count(Case(When(wrong, then=1))),
+                                        score_in_subject=Sum('marks_awarded'),
+                                   ).order_by('question__subject__name'))
+
+    # Provide code with comments: The three reads are independent, so they run concurrently; "you vs average
+    # vs topper" comes from the precomputed cohort stats (one query)
+    time_stats, subject_analysis, cohort_comparison, previous_result_id = await asyncdb.gather(
+        time_stats_query, subject_analysis_query, lambda: cohort.comparison_for(result.mock_test_id),
+        # Provide code with comments: The attempt before this one, for the "Compare with previous attempt" link
+        lambda: TestResult.objects.filter(user=user, mock_test_id=result.mock_test_id, end_time__lt=result.end_time)
+                .order_by('-end_time').values_list('pk', flat=True).first(),
+    )
+
+    # Provide code with comments: Calculate average times (avoiding division by zero)
+    time_stats['time_on_correct_avg'] = (time_stats['time_on_correct'] or 0) / (result.correct_answers or 1)
+    time_stats['time_on_incorrect_avg'] = (time_stats['time_on_incorrect'] or 0) / (result.incorrect_answers or 1)
+
+    for subject in subject_analysis:
+        subject['cohort'] = cohort_comparison.get(subject['question__subject_id'])
     
     try:
         percentage = (result.score / result.max_marks) * 100 if result.max_marks > 0 else 0
@@ -312,72 +487,164 @@ def results_view(request, result_id):
         'percentage': round(percentage, 2),
         'time_stats': time_stats,
         'subject_analysis': subject_analysis,
+        'cohort_overall': cohort_comparison.get(cohort.OVERALL),
+        'previous_result_id': previous_result_id,
     }
     # Provide code with comments: Renders the detailed results page
-    return render(request, 'exams/results.html', context)
+    return await arender(request, 'exams/results.html', context)
 
 @login_required
-def answer_review_view(request, result_id):
+@read_replica
+async def answer_review_view(request, result_id):
     """Displays a question-by-question review of a completed test."""
-    result = get_object_or_404(TestResult, pk=result_id, user=request.user)
+    user = await request.auser()
+    result = await aget_object_or_404(TestResult.objects.select_related('mock_test'), pk=result_id, user=user)
     
-    # Provide code with comments: Fetch questions, options, and correct answer link efficiently
-    all_questions = Question.objects.filter(mock_test=result.mock_test) \
-        .prefetch_related('options').select_related('correct_option')
-        
-    user_answers = UserAnswer.objects.filter(test_result=result)
-    user_answers_map = {answer.question_id: answer.selected_option_id for answer in user_answers}
+    # Provide code with comments: Questions (with options and correct answer) and the user's answers load concurrently
+    all_questions, user_answers_map = await asyncdb.gather(
+        lambda: list(Question.objects.filter(mock_test_id=result.mock_test_id)
+                     .prefetch_related('options', 'correct_options').select_related('correct_option')),
+        lambda: {q_id: (selected_option_id, response) for q_id, selected_option_id, response in
+                 UserAnswer.objects.filter(test_result_id=result.id).values_list('question_id', 'selected_option_id', 'response')},
+    )
     
     review_data = []
     
     for question in all_questions:
-        # Provide code with comments: Fetches the correct option ID directly from the question
-        correct_option_id = question.correct_option_id
+        selected_option_id, response = user_answers_map.get(question.id, (None, ''))
+        # Provide code with comments: Correct and chosen options as sets, whatever the question type
+        if question.question_type == Question.TYPE_MULTI:
+            correct_option_ids = {option.id for option in question.correct_options.all()}
+            user_selected_option_ids = set(grading.parse_option_ids(response))
+        else:
+            correct_option_ids = {question.correct_option_id}
+            user_selected_option_ids = {selected_option_id}
         
         review_data.append({
-            'question_text': question.text,
+            'question_text': question.text_display,
+            'question_type': question.question_type,
             'options': question.options.all(),
-            'user_selected_option_id': user_answers_map.get(question.id),
-            'correct_option_id': correct_option_id,
-            'solution': question.solution,
+            'user_selected_option_ids': user_selected_option_ids,
+            'correct_option_ids': correct_option_ids,
+            'user_response': response,
+            'answer_min': question.answer_min,
+            'answer_max': question.answer_max,
+            'solution': question.solution_display,
         })
     context = {'page_title': f"Review for {result.mock_test.title}",'result': result, 'review_data': review_data}
     # Provide code with comments: Renders the answer review page
-    return render(request, 'exams/answer_review.html', context)
+    return await arender(request, 'exams/answer_review.html', context)
 
+@login_required
+@read_replica
+async def compare_attempts_view(request, result_id, other_id):
+    """Compares two of the user's attempts of the same test, question by question and by subject."""
+    user = await request.auser()
+    results = [result async for result in TestResult.objects.filter(pk__in=[result_id, other_id], user=user)
+               .select_related('mock_test').order_by('end_time', 'pk')]
+    if len(results) != 2 or results[0].mock_test_id != results[1].mock_test_id:
+        raise Http404("Both attempts must be yours and of the same test.")
+    older, newer = results
+    # Provide code with comments: Diffs two cached per-attempt answer vectors; the result is cached per pair
+    diff = await sync_to_async(comparison.compare)(older, newer)
+    context = {
+        'page_title': f"Attempt comparison for {older.mock_test.title}",
+        'mock_test': older.mock_test,
+        'older': older,
+        'newer': newer,
+        'diff': diff,
+    }
+    # Provide code with comments: Renders the attempt comparison page
+    return await arender(request, 'exams/compare_attempts.html', context)
 
 @login_required
-def leaderboard_view(request, test_id):
-    """Fetches and displays the top scores for a specific mock test."""
-    mock_test = get_object_or_404(MockTest, pk=test_id)
-    
-    # Provide code with comments: Fetches top 10 results for the leaderboard
-    top_scores = TestResult.objects.filter(mock_test=mock_test).order_by('-score', 'time_taken_seconds')[:10]
-    
+@read_replica
+async def leaderboard_view(request, test_id):
+    """
+    Full leaderboard for a mock test, paged with keyset cursors (?after= / ?before=).
+    ?me=1 jumps to the page containing the user's best attempt.
+    """
+    user = await request.auser()
+    mock_test = await sync_to_async(warmup.mock_test_or_404)(test_id)
+    my_result = await TestResult.objects.filter(mock_test=mock_test, user=user) \
+                                        .order_by('-score', 'time_taken_seconds', 'id').afirst()
+
+    # Provide code with comments: Each page is an index range scan, whatever its depth
+    if request.GET.get('me') and my_result is not None:
+        rows, prev_cursor, next_cursor = await sync_to_async(leaderboard.page_around)(my_result)
+    elif not request.GET.get('after') and not request.GET.get('before'):
+        # Provide code with comments: The first page of a live exam is shared by everyone, cached briefly
+        rows, prev_cursor, next_cursor = await sync_to_async(warmup.first_leaderboard_page)(mock_test.id)
+    else:
+        rows, prev_cursor, next_cursor = await sync_to_async(leaderboard.page)(
+            mock_test.id,
+            after=leaderboard.Cursor.parse(request.GET.get('after')),
+            before=leaderboard.Cursor.parse(request.GET.get('before')),
+        )
+
     context = {
         'page_title': f"Leaderboard for {mock_test.title}",
         'mock_test': mock_test,
-        'top_scores': top_scores,
+        'top_scores': rows,
+        'prev_cursor': prev_cursor,
+        'next_cursor': next_cursor,
+        'my_result_id': my_result.id if my_result else None,
     }
     # Provide code with comments: Renders the leaderboard page (real-time data fetched via WebSocket)
-    return render(request, 'exams/leaderboard.html', context)
-
+    return await arender(request, 'exams/leaderboard.html', context)
 
 @login_required 
-def dashboard_view(request):
+@read_replica
+async def dashboard_view(request):
     """Renders the personalized user dashboard."""
-    user_results = TestResult.objects.filter(user=request.user).order_by('-end_time')
-    tests_completed_count = user_results.values('mock_test').distinct().count()
+    user = await request.auser()
+    user_results = TestResult.objects.filter(user=user).order_by('-end_time')
+
+    def recommended():
+        # Precomputed after each submission; one cache hit plus one primary-key lookup here
+        recommended_ids = recommendations.for_user(user.pk)
+        recommended_by_id = MockTest.objects.select_related('category').in_bulk(recommended_ids)
+        return [recommended_by_id[test_id] for test_id in recommended_ids if test_id in recommended_by_id]
+
+    # Provide code with comments: History, completed count and recommendations are independent reads
+    test_results, tests_completed_count, recommended_tests = await asyncdb.gather(
+        lambda: list(user_results.select_related('mock_test')),
+        lambda: user_results.values('mock_test').distinct().count(),
+        recommended,
+    )
     context = {
-        'page_title': f'{request.user.username}\'s Dashboard',
-        'last_login': request.user.last_login,
+        'page_title': f'{user.username}\'s Dashboard',
+        'last_login': user.last_login,
         'tests_completed_count': tests_completed_count,
-        'test_results': user_results,
+        'test_results': test_results,
+        'recommended_tests': recommended_tests,
     }
     # Provide code with comments: Renders the user dashboard with key stats
-    return render(request, 'exams/dashboard.html', context)
+    return await arender(request, 'exams/dashboard.html', context)
+
+@login_required
+@read_replica
+def progress_series_view(request):
+    """
+    JSON score progression for the logged-in user: ?scope=overall|category|subject, ?id= the
+    category or subject ID, ?points= the maximum number of points (downsampled with LTTB).
+    """
+    scope = progress.SCOPES.get(request.GET.get('scope', 'overall'))
+    try:
+        key = int(request.GET.get('id', 0))
+        points = int(request.GET.get('points', progress.DEFAULT_POINTS))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': "id and points must be integers."}, status=400)
+    if scope is None or (scope != progress.OVERALL and key <= 0):
+        return JsonResponse({'status': 'error', 'message': "Unknown scope or missing id."}, status=400)
+    # Provide code with comments: One cache read, or one indexed range scan plus LTTB on a miss
+    data = progress.series(request.user.id, scope, key if scope != progress.OVERALL else 0, points)
+    response = JsonResponse(data)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 @login_required
+@read_replica
 def category_dashboard_view(request):
     """Demonstrates using a subquery to annotate each category."""
     # Provide code with comments: Uses Subquery to find the latest test title for each category
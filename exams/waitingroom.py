@@ -0,0 +1,171 @@
+# FILE: exams/waitingroom.py
+
+"""
+Waiting room for scheduled live exams.
+
+A test with live_starts_at and admission_rate set does not let candidates straight into the
+live test page. Instead:
+
+1. waiting_room_view gives each candidate a queue position (an atomic counter in the token
+   store) inside a signed ticket cookie, and serves a tiny standalone polling page.
+2. The page polls waiting_room_status_view. That view authenticates by the ticket alone, so
+   a poll costs a few cache reads: no session, user or test query.
+3. The admission gate advances at `admission_rate` positions per second from the start of
+   the window, and never more than `admission_burst` ahead of the last position handed
+   out. Once a candidate's position is behind the gate, the poll sets a signed admission
+   cookie and the page moves on to start_test_view.
+4. start_test_view only renders with a valid admission cookie for the logged-in user.
+
+The cold page loads per second are therefore capped at the admission rate whatever the
+size of the surge, and polling stays cheap. Admission tokens last for the test duration
+plus TOKEN_GRACE_SECONDS, so reloads during the test work.
+
+The token store is the Django cache named by EXAMS_WAITING_ROOM_CACHE. Across workers it
+must be a shared cache with an atomic incr (Redis, memcached). The default local-memory
+cache is the local stand-in: it is correct within one process, which is enough for
+development and tests.
+"""
+
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+
+CACHE_ALIAS = getattr(settings, 'EXAMS_WAITING_ROOM_CACHE', 'default')
+TOKEN_GRACE_SECONDS = 15 * 60
+# Queue state outlives any exam window
+STATE_SECONDS = 24 * 60 * 60
+# Bounds of the poll interval suggested to waiting clients
+POLL_MIN_SECONDS = 2
+POLL_MAX_SECONDS = 30
+# The gate is written back at most this often per worker's computation
+GATE_WRITE_SECONDS = 0.5
+
+_TICKET_SALT = 'exams.waitingroom.ticket'
+_ADMIT_SALT = 'exams.waitingroom.admit'
+
+
+def ticket_cookie(test_id):
+    return f"exams_wr_{test_id}"
+
+
+def admit_cookie(test_id):
+    return f"exams_admit_{test_id}"
+
+
+class CacheTokenStore:
+    """Queue counters and the admission gate, kept in a Django cache."""
+
+    def __init__(self, alias=CACHE_ALIAS):
+        self.cache = caches[alias]
+
+    def take_position(self, test_id):
+        key = f"exams:wr:{test_id}:issued"
+        self.cache.add(key, 0, STATE_SECONDS)
+        return self.cache.incr(key)
+
+    def issued(self, test_id):
+        return self.cache.get(f"exams:wr:{test_id}:issued", 0)
+
+    def gate(self, test_id):
+        return self.cache.get(f"exams:wr:{test_id}:gate")
+
+    def set_gate(self, test_id, through, at):
+        self.cache.set(f"exams:wr:{test_id}:gate", (through, at), STATE_SECONDS)
+
+
+def default_store():
+    return CacheTokenStore()
+
+
+# =========================================================================
+# ADMISSION GATE
+# =========================================================================
+
+def admitted_through(mock_test, store, now=None):
+    """
+    Highest queue position admitted so far. The gate advances at admission_rate from the
+    window start and is capped at `burst` positions past the last one issued. Every stored
+    (position, time) pair is reachable at that rate, so racing workers that overwrite each
+    other can only lose a little progress; they never admit extra candidates.
+    """
+    now = now or time.time()
+    start = mock_test.live_starts_at.timestamp()
+    if now < start:
+        return 0
+    burst = mock_test.admission_burst or mock_test.admission_rate
+    through, at = store.gate(mock_test.pk) or (float(burst), start)
+    advanced = min(through + mock_test.admission_rate * max(0.0, now - at), store.issued(mock_test.pk) + burst)
+    if now - at >= GATE_WRITE_SECONDS:
+        store.set_gate(mock_test.pk, advanced, now)
+    return advanced
+
+
+def status(mock_test, position, store=None, now=None):
+    """What the polling page needs: admitted?, candidates ahead, ETA and next poll interval."""
+    store = store or default_store()
+    now = now or time.time()
+    through = admitted_through(mock_test, store, now)
+    if position <= through:
+        return {'admitted': True, 'ahead': 0, 'eta_seconds': 0, 'poll_seconds': 0}
+    ahead = int(position - through)
+    # Before the window opens the whole wait until the start is added
+    eta = ahead / mock_test.admission_rate + max(0.0, mock_test.live_starts_at.timestamp() - now)
+    return {
+        'admitted': False,
+        'ahead': ahead,
+        'eta_seconds': int(eta),
+        'poll_seconds': int(min(POLL_MAX_SECONDS, max(POLL_MIN_SECONDS, eta / 4))),
+    }
+
+
+# =========================================================================
+# SIGNED TICKETS AND ADMISSION TOKENS
+# =========================================================================
+
+def issue_ticket(mock_test, user_id, store=None):
+    """Takes the next queue position; returns (position, signed ticket value)."""
+    store = store or default_store()
+    position = store.take_position(mock_test.pk)
+    return position, signing.dumps({'u': user_id, 't': mock_test.pk, 'p': position}, salt=_TICKET_SALT)
+
+
+def read_ticket(request, mock_test):
+    """(user_id, position) from the request's ticket cookie for this test, or None."""
+    try:
+        ticket = signing.loads(
+            request.COOKIES.get(ticket_cookie(mock_test.pk), ''), salt=_TICKET_SALT, max_age=STATE_SECONDS,
+        )
+    except signing.BadSignature:
+        return None
+    if ticket.get('t') != mock_test.pk:
+        return None
+    return ticket['u'], ticket['p']
+
+
+def set_ticket_cookie(response, mock_test, ticket):
+    response.set_cookie(ticket_cookie(mock_test.pk), ticket, max_age=STATE_SECONDS, httponly=True, samesite='Lax')
+
+
+def admit(response, mock_test, user_id):
+    """Sets the admission cookie that start_test_view requires."""
+    token = signing.dumps({'u': user_id, 't': mock_test.pk}, salt=_ADMIT_SALT)
+    response.set_cookie(
+        admit_cookie(mock_test.pk), token, max_age=_token_seconds(mock_test), httponly=True, samesite='Lax',
+    )
+    return response
+
+
+def has_admission(request, mock_test, user_id):
+    try:
+        token = signing.loads(
+            request.COOKIES.get(admit_cookie(mock_test.pk), ''), salt=_ADMIT_SALT, max_age=_token_seconds(mock_test),
+        )
+    except signing.BadSignature:
+        return False
+    return token.get('u') == user_id and token.get('t') == mock_test.pk
+
+
+def _token_seconds(mock_test):
+    return mock_test.time_minutes * 60 + TOKEN_GRACE_SECONDS
@@ -0,0 +1,251 @@
+# FILE: exams/warmup.py
+
+"""
+Pre-start cache warming for scheduled live exams.
+
+A live exam (MockTest with live_starts_at set) is hit by every candidate within the same
+minute. Minutes before the window opens, the `warm_live_exams` job builds everything those
+requests read:
+
+- the test itself (with its category) and the question payload with options prefetched
+- the subject breakdown for the instructions page
+- the answer key used by grading
+- the empty first leaderboard page
+
+These are written to the shared cache, and the keys are listed in a manifest. Each worker
+keeps a process-local copy: the first lookup after the manifest changes pulls every
+warmed entry in one get_many, and later lookups are plain dict reads. Once an exam is
+warmed, its instructions, start and submit requests run no queries for exam content.
+Tests that were never warmed fall through to the database as before; saving a test or
+one of its questions drops its warm entries until the next warm run.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from . import grading, hotcache, leaderboard
+from .models import MockTest, Option, Question
+
+# How far ahead of live_starts_at the job warms an exam
+WARM_AHEAD_MINUTES = getattr(settings, 'EXAMS_WARM_AHEAD_MINUTES', 15)
+# Warmed entries outlive the window by this much (late submissions, results browsing)
+KEEP_AFTER_END = timedelta(hours=2)
+# Seconds between a worker's manifest checks, and lifetime of local copies
+LOCAL_SYNC_SECONDS = 5
+LOCAL_SECONDS = 10 * 60
+# The first leaderboard page changes as results arrive; cache it only briefly once live,
+# and serve the previous page for up to LEADERBOARD_STALE_SECONDS while it is recomputed
+LEADERBOARD_SECONDS = 5
+LEADERBOARD_STALE_SECONDS = 60
+# Answer keys and question payloads of tests that are not warmed, in the shared cache only
+ANSWER_KEY_SECONDS = 10 * 60
+QUESTIONS_SECONDS = 60
+
+MANIFEST_KEY = 'exams:live:manifest'
+
+_local = {}  # key -> (expires_at monotonic, value)
+_local_lock = threading.Lock()
+_manifest_seen = [None, 0.0]  # manifest version, last check (monotonic)
+
+
+def _key(test_id, kind):
+    return f"exams:live:{test_id}:{kind}"
+
+
+# =========================================================================
+# TWO-LEVEL READS (process-local, then shared cache)
+# =========================================================================
+
+def _sync_local():
+    """Pulls every warmed entry into this process when the manifest has changed."""
+    now = time.monotonic()
+    if now - _manifest_seen[1] < LOCAL_SYNC_SECONDS:
+        return
+    _manifest_seen[1] = now
+    manifest = cache.get(MANIFEST_KEY)
+    if not manifest or manifest['version'] == _manifest_seen[0]:
+        return
+    values = cache.get_many(manifest['keys'])
+    expires = now + LOCAL_SECONDS
+    with _local_lock:
+        # Entries dropped from the manifest (forgotten tests) go too
+        _local.clear()
+        _local.update((key, (expires, value)) for key, value in values.items())
+    _manifest_seen[0] = manifest['version']
+
+
+def preload():
+    """Pulls the warmed entries into this process now (worker start-up, see exams/startup.py)."""
+    _manifest_seen[1] = 0.0
+    _sync_local()
+
+
+def _get(key):
+    _sync_local()
+    hit = _local.get(key)
+    if hit is not None and hit[0] > time.monotonic():
+        return hit[1]
+    value = cache.get(key)
+    if value is not None:
+        with _local_lock:
+            _local[key] = (time.monotonic() + LOCAL_SECONDS, value)
+    return value
+
+
+def mock_test_or_404(test_id):
+    """The MockTest with its category: warm copy, else get_object_or_404."""
+    cached = _get(_key(test_id, 'test'))
+    if cached is not None:
+        return cached
+    return get_object_or_404(MockTest.objects.select_related('category'), pk=test_id)
+
+
+def questions(test_id):
+    """Questions with options prefetched: warm copy, else one query plus the prefetch."""
+    cached = _get(_key(test_id, 'questions'))
+    if cached is not None:
+        return cached
+    return hotcache.get_or_compute(f"exams:questions:{test_id}", lambda: _load_questions(test_id),
+                                   QUESTIONS_SECONDS, QUESTIONS_SECONDS * 10)
+
+
+def subject_breakdown(test_id):
+    cached = _get(_key(test_id, 'breakdown'))
+    if cached is not None:
+        return cached
+    return _load_breakdown(test_id)
+
+
+def answer_key(test_id):
+    """The compiled answer key: warm copy, else the shared cache, else three queries."""
+    cached = _get(_key(test_id, 'answer_key'))
+    if cached is not None:
+        return cached
+    # Not process-local: a corrected key must reach every worker at once (forget() deletes it)
+    return hotcache.get_or_compute(f"exams:answer_key:{test_id}", lambda: grading.load_answer_key(test_id),
+                                   ANSWER_KEY_SECONDS, ANSWER_KEY_SECONDS * 6)
+
+
+def first_leaderboard_page(test_id):
+    """
+    leaderboard.page() for the first page. On live exams it is fresh for LEADERBOARD_SECONDS,
+    then refreshed in the background by one worker while the others serve the previous page.
+    """
+    if _get(_key(test_id, 'test')) is None:
+        # Only warmed (live) exams see a thundering herd on this page
+        return leaderboard.page(test_id)
+    return hotcache.get_or_compute(_key(test_id, 'board'), lambda: leaderboard.page(test_id),
+                                   LEADERBOARD_SECONDS, LEADERBOARD_STALE_SECONDS)
+
+
+def _load_questions(test_id):
+    return list(Question.objects.filter(mock_test_id=test_id).prefetch_related('options').order_by('pk'))
+
+
+def _load_breakdown(test_id):
+    return list(
+        Question.objects.filter(mock_test_id=test_id).values('subject__name')
+        .annotate(question_count=Count('id'), total_marks=Sum('marks')).order_by('subject__name')
+    )
+
+
+# =========================================================================
+# WARM-UP JOB
+# =========================================================================
+
+def due_for_warming(now=None, ahead_minutes=WARM_AHEAD_MINUTES):
+    """Scheduled tests that start within `ahead_minutes` or are currently running."""
+    now = now or timezone.now()
+    return MockTest.objects.filter(live_starts_at__isnull=False, live_starts_at__lte=now + timedelta(minutes=ahead_minutes)) \
+        .exclude(live_ends_at__lte=now).select_related('category').order_by('live_starts_at')
+
+
+def warm(tests, now=None):
+    """
+    Builds and stores the warm entries for the given tests, then publishes a new manifest
+    so every worker pulls them. Returns the number of keys written.
+    """
+    now = now or timezone.now()
+    tests = list(tests)
+    entries, timeouts = {}, {}
+    for test in tests:
+        ends = test.live_ends_at or (test.live_starts_at + timedelta(minutes=test.time_minutes))
+        timeout = max(60, int((ends + KEEP_AFTER_END - now).total_seconds()))
+        payload = {
+            'test': test,
+            'questions': _load_questions(test.pk),
+            'breakdown': _load_breakdown(test.pk),
+            'answer_key': grading.load_answer_key(test.pk),
+        }
+        for kind, value in payload.items():
+            entries[_key(test.pk, kind)] = value
+            timeouts[_key(test.pk, kind)] = timeout
+        # Nobody has submitted yet: an empty first page, valid until shortly after the start
+        board_timeout = max(LEADERBOARD_SECONDS, int((test.live_starts_at - now).total_seconds()) + LEADERBOARD_SECONDS)
+        hotcache.store(_key(test.pk, 'board'), leaderboard.page(test.pk), board_timeout,
+                       board_timeout + LEADERBOARD_STALE_SECONDS)
+
+    for timeout in set(timeouts.values()):
+        cache.set_many({key: value for key, value in entries.items() if timeouts[key] == timeout}, timeout)
+
+    # Keep keys of exams warmed by earlier runs that are still alive
+    previous = cache.get(MANIFEST_KEY) or {'keys': []}
+    _publish(set(cache.get_many(previous['keys'])) | set(entries))
+    return len(entries)
+
+
+def forget(test_id):
+    """Drops a test's warm entries everywhere (after it is edited); the next warm run rebuilds them."""
+    keys = [_key(test_id, kind) for kind in ('test', 'questions', 'breakdown', 'answer_key', 'board')]
+    cache.delete_many(keys + [f"exams:answer_key:{test_id}", f"exams:questions:{test_id}"])
+    with _local_lock:
+        for key in keys:
+            _local.pop(key, None)
+    # Other workers drop their copies at their next manifest check
+    manifest = cache.get(MANIFEST_KEY)
+    if manifest and any(key in manifest['keys'] for key in keys):
+        _publish(set(manifest['keys']) - set(keys))
+
+
+def _publish(keys):
+    cache.set(MANIFEST_KEY, {'version': time.time(), 'keys': sorted(keys)}, None)
+
+
+def forget_on_change(sender, instance, **kwargs):
+    forget(instance.pk)
+
+
+def forget_question_test(sender, instance, **kwargs):
+    # m2m_changed also fires from the Option side, where instance is an Option
+    if isinstance(instance, Question):
+        forget(instance.mock_test_id)
+
+
+def forget_option_test(sender, instance, **kwargs):
+    # Option text is part of the cached question payload
+    test_id = Question.objects.filter(pk=instance.question_id).values_list('mock_test_id', flat=True).first()
+    if test_id is not None:
+        forget(test_id)
+
+
+def connect_signals():
+    """
+    Called from ExamsConfig.ready(): editing or deleting a test or one of its questions or
+    options (including the correct options) drops the test's warm entries and cached answer key.
+    """
+    post_save.connect(forget_on_change, sender=MockTest, dispatch_uid='warmup_save_MockTest')
+    post_delete.connect(forget_on_change, sender=MockTest, dispatch_uid='warmup_delete_MockTest')
+    post_save.connect(forget_question_test, sender=Question, dispatch_uid='warmup_save_Question')
+    post_delete.connect(forget_question_test, sender=Question, dispatch_uid='warmup_delete_Question')
+    m2m_changed.connect(forget_question_test, sender=Question.correct_options.through,
+                        dispatch_uid='warmup_correct_options_Question')
+    post_save.connect(forget_option_test, sender=Option, dispatch_uid='warmup_save_Option')
+    post_delete.connect(forget_option_test, sender=Option, dispatch_uid='warmup_delete_Option')